@@ -0,0 +1,47 @@
+"""add time-series indexes on cctv_data and person_count
+
+Revision ID: 5b7e2c9d41af
+Revises: c1d9be19bac8
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2c9d41af'
+down_revision: Union[str, None] = 'c1d9be19bac8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (이름, 테이블, 컬럼, 인덱스 방식)
+INDEXES = [
+    # 카메라별 조회 / keyset 페이지네이션
+    ("ix_cctv_data_cctv_id_detected_time", "cctv_data", ["cctv_id", "detected_time"], "btree"),
+    ("ix_person_count_cctv_id_timestamp", "person_count", ["cctv_id", "timestamp"], "btree"),
+    # 시간 범위 스캔 (시간별 집계, 보관 기간 삭제). 삽입 순서 = 시간 순서라 BRIN이 작고 효과적
+    ("brin_cctv_data_detected_time", "cctv_data", ["detected_time"], "brin"),
+    ("brin_person_count_timestamp", "person_count", ["timestamp"], "brin"),
+]
+
+
+def upgrade() -> None:
+    # 운영 중인 테이블을 잠그지 않도록 CONCURRENTLY (트랜잭션 밖에서 실행해야 함)
+    with op.get_context().autocommit_block():
+        for name, table, columns, using in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_using=using,
+                postgresql_concurrently=True,
+                if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,103 @@
+"""partition cctv_data and person_count by month
+
+Revision ID: 7e1a4c2b9f30
+Revises: 5b7e2c9d41af
+Create Date: 2026-10-18 14:00:00.000000
+
+기존 테이블을 <table>_old로 바꾸고, 같은 컬럼의 PARTITION BY RANGE 부모 테이블 + 월 파티션
+(가장 오래된 데이터의 달 ~ 3개월 뒤) + default 파티션을 만든 뒤 데이터를 복사한다.
+복사하는 동안 두 테이블 쓰기가 막히므로 점검 시간에 실행할 것.
+- PK는 파티션 키를 포함해야 해서 (id, <time>) (id는 기존 시퀀스 그대로, ORM은 id만으로 식별)
+- 5b7e2c9d41af 인덱스는 부모 테이블에 다시 만든다 (파티션마다 자동 생성)
+이후 파티션 생성/삭제는 app.partitions (매일 clean_old_data)
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e1a4c2b9f30'
+down_revision: Union[str, None] = '5b7e2c9d41af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+# 테이블 -> 파티션 키
+TABLES = {
+    "cctv_data": "detected_time",
+    "person_count": "timestamp",
+}
+
+# (이름, 테이블, 컬럼, 인덱스 방식) - 5b7e2c9d41af와 같음
+INDEXES = [
+    ("ix_cctv_data_cctv_id_detected_time", "cctv_data", ["cctv_id", "detected_time"], "btree"),
+    ("ix_person_count_cctv_id_timestamp", "person_count", ["cctv_id", "timestamp"], "btree"),
+    ("brin_cctv_data_detected_time", "cctv_data", ["detected_time"], "brin"),
+    ("brin_person_count_timestamp", "person_count", ["timestamp"], "brin"),
+]
+
+
+def _add_months(month, months):
+    year, index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=index + 1)
+
+
+def _swap_out(table):
+    """table -> <table>_old (이름이 겹치는 pkey/인덱스도 비킨다)"""
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    for name, index_table, _, _ in INDEXES:
+        if index_table == table:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _finish(table, primary_key):
+    """데이터 복사 후 PK/FK/시퀀스/인덱스를 붙이고 <table>_old 삭제"""
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_old")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({primary_key})")
+    op.create_foreign_key(
+        f"{table}_cctv_id_fkey", table, "cctv_info", ["cctv_id"], ["id"], ondelete="CASCADE"
+    )
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.execute(f"DROP TABLE {table}_old")
+    for name, index_table, columns, using in INDEXES:
+        if index_table == table:
+            op.create_index(name, table, columns, postgresql_using=using)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    current = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    for table, column in TABLES.items():
+        _swap_out(table)
+        op.execute(
+            f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS) "
+            f'PARTITION BY RANGE ("{column}")'
+        )
+
+        oldest = conn.execute(sa.text(f'SELECT MIN("{column}") FROM {table}_old')).scalar()
+        month = current
+        if oldest is not None and oldest < current:
+            month = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month <= _add_months(current, MONTHS_AHEAD):
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+            )
+            month = _add_months(month, 1)
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+        _finish(table, f'id, "{column}"')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        _swap_out(table)
+        op.execute(f"CREATE TABLE {table} (LIKE {table}_old INCLUDING DEFAULTS)")
+        _finish(table, "id")
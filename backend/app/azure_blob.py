@@ -1,5 +1,8 @@
 from azure.storage.blob import BlobServiceClient
+from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+import asyncio
 import os
+import random
 import uuid
 
 AZURE_CONNECTION_STRING = os.environ.get("AZURE_CONNECTION_STRING", "")
@@ -9,17 +12,6 @@ blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_
 container_client = blob_service_client.get_container_client(CONTAINER_NAME)
 
 
-def upload_image_to_azure(file_bytes: bytes, cctv_id: int) -> str:
-    blob_name = f"cctv-{cctv_id}-{uuid.uuid4()}.jpg"
-    blob_client = container_client.get_blob_client(blob_name)
-
-    blob_client.upload_blob(file_bytes, overwrite=True)
-
-    # public container라면 blob_client.url 로 접근 가능
-    # private라면 SAS Token 필요
-    return f"{blob_client.url}?{AZURE_SAS_TOKEN}"
-
-
 def upload_video_to_azure(file_bytes: bytes, cctv_id: int) -> str:
     """
     cctv_id: DB내 고유 식별자
@@ -33,4 +25,116 @@ def upload_video_to_azure(file_bytes: bytes, cctv_id: int) -> str:
     blob_client.upload_blob(file_bytes, overwrite=True)
 
     # SAS가 필요한 경우
-    return f"{blob_client.url}?{AZURE_SAS_TOKEN}"
\ No newline at end of file
+    return f"{blob_client.url}?{AZURE_SAS_TOKEN}"
+
+
+# -----------------------------------------------------------
+# 비동기 이미지 업로드 파이프라인
+# -----------------------------------------------------------
+# 업로드가 끝나기 전 cctv_data.image_url 값 (조회 API에서는 null + image_pending으로 보임)
+PENDING_IMAGE_URL = "pending"
+
+BLOB_UPLOAD_CONCURRENCY = int(os.environ.get("BLOB_UPLOAD_CONCURRENCY", "8"))
+BLOB_UPLOAD_QUEUE_SIZE = int(os.environ.get("BLOB_UPLOAD_QUEUE_SIZE", "1000"))
+BLOB_UPLOAD_RETRIES = int(os.environ.get("BLOB_UPLOAD_RETRIES", "3"))
+
+
+def public_image_url(image_url):
+    """업로드 대기 중이면 None"""
+    return None if image_url == PENDING_IMAGE_URL else image_url
+
+
+class ImageUploadQueue:
+    """
+    cctv_data row를 image_url=PENDING_IMAGE_URL로 먼저 저장하고, 이미지는 여기서 나중에 올린다.
+    - 앱 수명 동안 async BlobServiceClient 하나를 공유 (커넥션 재사용)
+    - concurrency개의 워커가 큐에서 꺼내 업로드 -> 끝나면 해당 row의 image_url을 채운다
+    - 실패하면 지수 백오프로 retries번 재시도, 그래도 실패하면 image_url을 NULL로 (이미지 없음)
+    - 큐가 가득 차면 enqueue가 기다린다 (요청 쪽으로 backpressure)
+    """
+
+    def __init__(self, set_image_url, concurrency=8, queue_size=1000, retries=3):
+        # set_image_url(row_id, url or None): 동기 DB 업데이트 함수 (스레드에서 실행)
+        self.set_image_url = set_image_url
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.retries = retries
+        self._client = None
+        self._container = None
+        self._queue = None
+        self._workers = []
+
+        # metrics
+        self.enqueued = 0
+        self.uploaded = 0
+        self.failed = 0
+
+    def _start(self):
+        if self._workers:
+            return
+        self._client = AsyncBlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
+        self._container = self._client.get_container_client(CONTAINER_NAME)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def enqueue(self, row_id, file_bytes, cctv_id):
+        self._start()
+        await self._queue.put((row_id, file_bytes, cctv_id))
+        self.enqueued += 1
+
+    async def _upload(self, file_bytes, cctv_id):
+        blob_name = f"cctv-{cctv_id}-{uuid.uuid4()}.jpg"
+        blob_client = self._container.get_blob_client(blob_name)
+        await blob_client.upload_blob(file_bytes, overwrite=True)
+        return f"{blob_client.url}?{AZURE_SAS_TOKEN}"
+
+    async def _worker(self):
+        while True:
+            row_id, file_bytes, cctv_id = await self._queue.get()
+            try:
+                url = None
+                for attempt in range(self.retries + 1):
+                    try:
+                        url = await self._upload(file_bytes, cctv_id)
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        print(f"[ERROR] image upload (cctv_data {row_id}, attempt {attempt + 1}):", e)
+                        if attempt < self.retries:
+                            await asyncio.sleep(random.uniform(0, min(30.0, 0.5 * (2 ** attempt))))
+                if url:
+                    self.uploaded += 1
+                else:
+                    self.failed += 1
+                await asyncio.to_thread(self.set_image_url, row_id, url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] image_url update (cctv_data {row_id}):", e)
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, timeout=30.0):
+        """남은 업로드를 timeout초까지 기다린 뒤 종료"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[WARN] image upload queue stopped with {self._queue.qsize()} pending uploads")
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._client.close()
+        self._client = None
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "concurrency": self.concurrency,
+            "enqueued": self.enqueued,
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+        }
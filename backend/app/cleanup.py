@@ -1,20 +1,32 @@
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from .database import SessionLocal
+from .partitions import ensure_partitions, drop_expired_partitions
+
+import logging
+logger = logging.getLogger(__name__)
 
 def clean_old_data():
     db: Session = SessionLocal()
     try:
-        # cctv_data - 3개월
-        db.execute("""
-            DELETE FROM cctv_data
-            WHERE detected_time < NOW() - INTERVAL '3 months'
-        """)
+        # 다음 달들 파티션을 미리 만들어 둔다 (실패해도 보관 기간 정리는 계속)
+        try:
+            ensure_partitions(db)
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception("ensure_partitions failed")
+
+        # cctv_data - 3개월, person_count - 1년
+        # 행 단위 DELETE 대신 만료된 월 파티션을 통째로 DETACH + DROP (WAL/bloat/긴 잠금 없음)
+        drop_expired_partitions(db)
 
-        # person_count - 1년
-        db.execute("""
-            DELETE FROM person_count
-            WHERE timestamp < NOW() - INTERVAL '1 year'
-        """)
+        # 업로드 도중 프로세스가 내려가 image_url이 대기 상태로 남은 row는 이미지 없음으로
+        db.execute(text("""
+            UPDATE cctv_data SET image_url = NULL
+            WHERE image_url = 'pending'
+              AND created_at < NOW() - INTERVAL '1 hour'
+        """))
 
         db.commit()
     finally:
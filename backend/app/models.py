@@ -1,5 +1,5 @@
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, LargeBinary, func
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, LargeBinary, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy import LargeBinary
@@ -45,6 +45,14 @@ class CctvData(Base):
     image_url = Column(String(500), nullable=True) #url 방식으로 저장장
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # DB에서는 detected_time 기준 월 파티션 테이블 (마이그레이션 7e1a4c2b9f30, app.partitions)
+    # PK는 (id, detected_time)이지만 id가 시퀀스로 유일하므로 ORM은 id만으로 식별한다
+    # 인덱스: 마이그레이션 5b7e2c9d41af (autogenerate가 지우지 않도록 모델에도 선언)
+    __table_args__ = (
+        Index("ix_cctv_data_cctv_id_detected_time", "cctv_id", "detected_time"),
+        Index("brin_cctv_data_detected_time", "detected_time", postgresql_using="brin"),
+    )
+
 class PersonCount(Base):
     __tablename__ = "person_count"
     id = Column(Integer, primary_key=True)
@@ -57,6 +65,12 @@ class PersonCount(Base):
     male_minor = Column(Integer, nullable=False, default=0)
     female_minor = Column(Integer, nullable=False, default=0)
 
+    # timestamp 기준 월 파티션 테이블 (CctvData와 같음)
+    __table_args__ = (
+        Index("ix_person_count_cctv_id_timestamp", "cctv_id", "timestamp"),
+        Index("brin_person_count_timestamp", "timestamp", postgresql_using="brin"),
+    )
+
 class Auth(Base):
     __tablename__ = "auth"
     id = Column(Integer, primary_key=True)
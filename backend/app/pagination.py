@@ -0,0 +1,96 @@
+import base64
+import json
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import tuple_
+
+from .database import SessionLocal
+
+# 조회 API 페이지 크기 (limit 미지정 시 기본값 / 최대값)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "1000"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "10000"))
+# NDJSON 스트리밍 시 서버 측 커서에서 한 번에 가져오는 행 수
+STREAM_YIELD_PER = int(os.getenv("STREAM_YIELD_PER", "1000"))
+
+
+def encode_cursor(time_value: datetime, row_id: int) -> str:
+    raw = json.dumps([time_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        time_str, row_id = json.loads(raw)
+        return datetime.fromisoformat(time_str), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(query, time_col, id_col, start=None, end=None, cursor=None, order="asc"):
+    """
+    (time_col, id) 기준 keyset 페이지네이션 조건 + 정렬
+    - start <= time_col < end
+    - cursor: 이전 페이지 마지막 행의 (time, id) -> 그 다음 행부터
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if start is not None:
+        query = query.filter(time_col >= start)
+    if end is not None:
+        query = query.filter(time_col < end)
+    if cursor:
+        key = tuple_(time_col, id_col)
+        after = tuple_(*decode_cursor(cursor))
+        query = query.filter(key > after if order == "asc" else key < after)
+    if order == "asc":
+        return query.order_by(time_col.asc(), id_col.asc())
+    return query.order_by(time_col.desc(), id_col.desc())
+
+
+def paginated_response(db, query, time_attr, to_dict, limit=None, fmt="json", empty_status=None):
+    """
+    fmt=json  : limit(기본 PAGE_SIZE_DEFAULT, 최대 PAGE_SIZE_MAX)개의 JSON 배열 (limit이 없어도 전체를 읽지 않음).
+                뒤에 행이 더 있으면 X-Next-Cursor 헤더에 다음 페이지 cursor (없으면 헤더 없음 = 마지막 페이지)
+    fmt=ndjson: 한 줄에 한 행씩 스트리밍 (서버 측 커서 + yield_per, limit 미지정 시 전체 범위)
+                요청 세션은 응답 전에 닫히므로 스트리밍은 자체 세션으로 읽는다
+    empty_status: json 첫 페이지가 비어 있을 때 돌려줄 상태 코드 (기존 404 동작 유지용)
+    """
+    if limit is not None and not 1 <= limit <= PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {PAGE_SIZE_MAX}")
+
+    if fmt == "ndjson":
+        statement = query.statement
+        if limit is not None:
+            statement = statement.limit(limit)
+
+        def stream():
+            session = SessionLocal()
+            try:
+                result = session.execute(
+                    statement, execution_options={"stream_results": True, "yield_per": STREAM_YIELD_PER}
+                )
+                for row in result.scalars():
+                    yield json.dumps(jsonable_encoder(to_dict(row))) + "\n"
+            finally:
+                session.close()
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    if fmt != "json":
+        raise HTTPException(status_code=400, detail="format must be json or ndjson")
+
+    limit = limit or PAGE_SIZE_DEFAULT
+    rows = query.limit(limit + 1).all()
+    if not rows and empty_status:
+        raise HTTPException(status_code=empty_status, detail="No records found")
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(getattr(last, time_attr), last.id)
+    return JSONResponse(jsonable_encoder([to_dict(r) for r in rows]), headers=headers)
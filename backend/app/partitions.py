@@ -0,0 +1,155 @@
+"""
+cctv_data / person_count 월 단위 range 파티션 관리 (마이그레이션 7e1a4c2b9f30에서 파티션 테이블로 전환)
+
+- ensure_partitions: 이번 달부터 PARTITION_MONTHS_AHEAD개월 뒤까지 파티션을 미리 만든다
+  (default 파티션에 이미 그 달 행이 있으면 새 파티션으로 옮긴다)
+- partition_horizon: 미리 만든 파티션의 끝. API는 이보다 늦은 감지 시각을 받지 않는다
+- drop_expired_partitions: 보관 기간이 완전히 지난 달의 파티션을 DETACH 후 DROP (행 단위 DELETE 없음)
+파티션 이름은 <table>_pYYYY_MM, 범위 밖의 행은 <table>_default 파티션으로 들어간다.
+"""
+import logging
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# 미리 만들어 둘 파티션 개월 수 (매일 실행되므로 정리 작업이 며칠 실패해도 여유가 있다)
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# DETACH가 부모 테이블 잠금을 오래 기다리며 INSERT를 막지 않도록 (실패하면 다음 날 다시 시도)
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+
+# 테이블 -> (파티션 키, 보관 개월 수)
+PARTITIONED_TABLES = {
+    "cctv_data": ("detected_time", int(os.getenv("CCTV_DATA_RETENTION_MONTHS", "3"))),
+    "person_count": ("timestamp", int(os.getenv("PERSON_COUNT_RETENTION_MONTHS", "12"))),
+}
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    year, index = divmod(month.month - 1 + months, 12)
+    return month.replace(year=month.year + year, month=index + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_horizon(now: datetime = None) -> datetime:
+    """ensure_partitions가 만들어 두는 마지막 파티션의 끝 시각"""
+    return add_months(month_start(now or datetime.now()), PARTITION_MONTHS_AHEAD + 1)
+
+
+def beyond_partition_horizon(value: datetime) -> bool:
+    """value가 미리 만든 파티션 범위보다 늦으면 True (default 파티션에 쌓이지 않도록 API에서 거부)"""
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value >= partition_horizon()
+
+
+def create_partition(db, table: str, month: datetime):
+    """
+    (commit 하지 않음) 월 파티션 생성.
+    default 파티션에 그 달 행이 있으면 CREATE가 실패하므로 같은 트랜잭션에서 임시 테이블로 뺐다가 다시 넣는다
+    """
+    column = PARTITIONED_TABLES[table][0]
+    bounds = {"start": month, "end": add_months(month, 1)}
+    db.execute(text(f"CREATE TEMP TABLE partition_moving (LIKE {table}) ON COMMIT DROP"))
+    moved = db.execute(text(
+        f"WITH moved AS (DELETE FROM {table}_default "
+        f'WHERE "{column}" >= :start AND "{column}" < :end RETURNING *) '
+        f"INSERT INTO partition_moving SELECT * FROM moved"
+    ), bounds).rowcount
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+    ))
+    if moved:
+        db.execute(text(f"INSERT INTO {table} SELECT * FROM partition_moving"))
+        logger.info("Moved %d rows from %s_default to %s", moved, table, partition_name(table, month))
+
+
+def list_partitions(db, table: str) -> dict:
+    """{월 시작 시각: 파티션 이름} (default 파티션 제외)"""
+    pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass)"
+    ), {"table": table}).scalars()
+    partitions = {}
+    for name in rows:
+        match = pattern.match(name)
+        if match:
+            partitions[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def ensure_partitions(db, now: datetime = None) -> list:
+    """
+    이번 달 ~ PARTITION_MONTHS_AHEAD개월 뒤 파티션 생성. returns: 새로 만든 파티션 이름
+    파티션 하나가 실패해도 (잠금 대기 등) 로그만 남기고 나머지를 계속 만든다 (다음 실행 때 다시 시도)
+    """
+    current = month_start(now or datetime.now())
+    created = []
+    for table in PARTITIONED_TABLES:
+        existing = list_partitions(db, table)
+        db.commit()
+        for offset in range(PARTITION_MONTHS_AHEAD + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            try:
+                db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                create_partition(db, table, month)
+                db.commit()
+                created.append(partition_name(table, month))
+            except SQLAlchemyError as e:
+                db.rollback()
+                logger.error("Could not create partition %s: %s", partition_name(table, month), e)
+    if created:
+        logger.info("Created partitions: %s", ", ".join(created))
+    return created
+
+
+def drop_expired_partitions(db, now: datetime = None) -> list:
+    """
+    모든 행이 보관 기간(now - N개월)보다 오래된 월 파티션을 DETACH + DROP.
+    보관 기간 경계가 걸친 달은 통째로 만료될 때까지 남는다 (최대 한 달 더 보관).
+    default 파티션에 들어간 범위 밖 행만 예전처럼 DELETE 한다 (평소에는 비어 있음).
+    returns: 삭제한 파티션 이름
+    """
+    now = (now or datetime.now()).replace(tzinfo=None)
+    dropped = []
+    for table, (column, retention_months) in PARTITIONED_TABLES.items():
+        # 한 테이블이 실패해도 (잠금 대기, 권한 등) 로그만 남기고 다음 테이블로 (다음 실행 때 다시 시도)
+        try:
+            for month, name in sorted(list_partitions(db, table).items()):
+                if add_months(month, retention_months + 1) > now:
+                    break
+                db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+                db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+                db.commit()
+                dropped.append(name)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Could not drop expired partitions of %s (will retry next run): %s", table, e)
+
+        try:
+            db.execute(text(
+                f'DELETE FROM {table}_default WHERE "{column}" < NOW() - make_interval(months => :months)'
+            ), {"months": retention_months})
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Could not clean %s_default: %s", table, e)
+    if dropped:
+        logger.info("Dropped expired partitions: %s", ", ".join(dropped))
+    return dropped
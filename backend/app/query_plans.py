@@ -0,0 +1,98 @@
+"""
+주요 조회/집계 쿼리의 실행 계획(EXPLAIN)을 확인해 시간 인덱스를 쓰는지 검사한다.
+
+    python -m app.query_plans [--cctv-id 1] [--usable]
+
+--usable: enable_seqscan=off로 실행 (데이터가 적은 개발 DB에서는 planner가 seq scan을 고르므로
+          인덱스를 "쓸 수 있는지"만 확인). EXPLAIN만 하고 실제로 실행하지 않으며, 끝나면 rollback.
+기대한 인덱스를 하나도 쓰지 않는 쿼리가 있으면 exit code 1.
+파티션 테이블은 파티션별 인덱스 이름이 plan에 나오므로 부모 인덱스 이름으로 바꿔 비교한다.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+
+from .database import SessionLocal
+from .models import CctvData, PersonCount
+from .pagination import keyset_filter, PAGE_SIZE_DEFAULT
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def parent_indexes(db):
+    """{파티션 인덱스 이름: 부모(파티션 테이블) 인덱스 이름}"""
+    rows = db.execute(text(
+        "SELECT c.relname, p.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE c.relkind = 'i'"
+    ))
+    return dict(rows.all())
+
+
+def explain(db, statement):
+    """ORM/Core statement -> EXPLAIN (FORMAT JSON) 최상위 plan"""
+    compiled = statement.compile(dialect=db.bind.dialect)
+    row = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).fetchone()
+    return row[0][0]["Plan"]
+
+
+def hot_queries(db, cctv_id):
+    """(이름, statement, 기대 인덱스 목록) - 실제 라우트/태스크와 같은 조건"""
+    now = datetime.now()
+    cctv_data_page = keyset_filter(
+        db.query(CctvData).filter(CctvData.cctv_id == cctv_id),
+        CctvData.detected_time, CctvData.id, start=now - timedelta(days=1), order="desc"
+    ).limit(PAGE_SIZE_DEFAULT + 1)
+    person_count_page = keyset_filter(
+        db.query(PersonCount).filter(PersonCount.cctv_id == cctv_id),
+        PersonCount.timestamp, PersonCount.id, start=now - timedelta(days=30)
+    ).limit(PAGE_SIZE_DEFAULT + 1)
+    # aggregate_person_data의 시간별 집계
+    hourly_aggregate = (
+        db.query(CctvData.cctv_id, CctvData.gender, CctvData.age, func.count(CctvData.id))
+        .filter(CctvData.detected_time >= now - timedelta(hours=1), CctvData.detected_time < now)
+        .group_by(CctvData.cctv_id, CctvData.gender, CctvData.age)
+    )
+    cctv_data_indexes = ["ix_cctv_data_cctv_id_detected_time", "brin_cctv_data_detected_time"]
+    return [
+        ("get_cctv_data (keyset page)", cctv_data_page.statement, ["ix_cctv_data_cctv_id_detected_time"]),
+        ("get_person_count_by_cctv_id", person_count_page.statement, ["ix_person_count_cctv_id_timestamp"]),
+        ("aggregate_person_data (hourly)", hourly_aggregate.statement, cctv_data_indexes),
+    ]
+
+
+def check(cctv_id=1, usable=False):
+    db = SessionLocal()
+    ok = True
+    try:
+        if usable:
+            db.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+        parents = parent_indexes(db)
+        for name, statement, expected in hot_queries(db, cctv_id):
+            plan = explain(db, statement)
+            nodes = list(plan_nodes(plan))
+            used = sorted({parents.get(n["Index Name"], n["Index Name"]) for n in nodes if "Index Name" in n})
+            passed = any(index in used for index in expected)
+            ok = ok and passed
+            scans = ", ".join(sorted({n["Node Type"] for n in nodes if "Scan" in n["Node Type"]}))
+            print(f"[{'OK' if passed else 'FAIL'}] {name}: cost={plan['Total Cost']} scans=({scans}) indexes={used}")
+            if not passed:
+                print(f"       expected one of {expected}")
+    finally:
+        db.rollback()
+        db.close()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cctv-id", type=int, default=1)
+    parser.add_argument("--usable", action="store_true", help="enable_seqscan=off로 인덱스 사용 가능 여부만 확인")
+    args = parser.parse_args()
+    sys.exit(0 if check(args.cctv_id, args.usable) else 1)
@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, status, Body, File
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, status, Body, File, Request
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime
 import io
+import json
 from fastapi.responses import StreamingResponse
 from .deps import get_db
+from .pagination import keyset_filter, paginated_response
+from .partitions import beyond_partition_horizon
+from .database import SessionLocal
 from .models import (
     Member, CctvInfo, CctvData,
     PersonCount, Auth, Withdrawal, Report
 )
-from pydantic import BaseModel
-from .azure_blob import upload_image_to_azure, upload_video_to_azure
+from pydantic import BaseModel, Field, ValidationError
+from .azure_blob import (
+    upload_video_to_azure, ImageUploadQueue, PENDING_IMAGE_URL, public_image_url,
+    BLOB_UPLOAD_CONCURRENCY, BLOB_UPLOAD_QUEUE_SIZE, BLOB_UPLOAD_RETRIES
+)
 from .hashing import get_password_hash, verify_password # 해싱 함수
 from .jwt_utils import create_jwt_token # 토큰 발급 함수
 import os
@@ -24,6 +33,9 @@ router = APIRouter()
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 REFRESH_SECRET = os.getenv("REFRESH_SECRET")
 
+# cctv_data bulk 업로드: 요청당 최대 항목 수
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
 # -----------------------------
 # Security Dependency
 # -----------------------------
@@ -351,6 +363,32 @@ def list_my_cctvs(current_user: Member = Depends(get_current_user), db: Session
 # 3) cctv_data 테이블 관련
 # -----------------------------------------------------------
 
+def set_cctv_image_url(row_id: int, image_url: Optional[str]):
+    """이미지 업로드가 끝나면 (실패면 None) 대기 중인 image_url을 채운다"""
+    db = SessionLocal()
+    try:
+        db.query(CctvData).filter(
+            CctvData.id == row_id, CctvData.image_url == PENDING_IMAGE_URL
+        ).update({CctvData.image_url: image_url}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+# row는 먼저 저장하고 이미지는 백그라운드에서 Azure로 (요청이 Blob Storage를 기다리지 않음)
+image_uploads = ImageUploadQueue(
+    set_cctv_image_url,
+    concurrency=BLOB_UPLOAD_CONCURRENCY,
+    queue_size=BLOB_UPLOAD_QUEUE_SIZE,
+    retries=BLOB_UPLOAD_RETRIES
+)
+
+
+@router.on_event("shutdown")
+async def stop_image_uploads():
+    await image_uploads.stop()
+
+
 @router.post("/cctv_data", response_model=dict)
 async def create_cctv_data(
     cctv_id: int = Form(...),
@@ -361,11 +399,9 @@ async def create_cctv_data(
     image_file: UploadFile = File(None),
     db: Session = Depends(get_db)
 ):
-    image_url = None
-    if image_file:
-        file_bytes = await image_file.read()
-        # Azure 업로드
-        image_url = upload_image_to_azure(file_bytes, cctv_id)
+    if beyond_partition_horizon(detected_time):
+        raise HTTPException(status_code=400, detail="detected_time is too far in the future")
+    file_bytes = await image_file.read() if image_file else None
 
     new_data = CctvData(
         cctv_id=cctv_id,
@@ -373,52 +409,210 @@ async def create_cctv_data(
         person_label=person_label,
         gender=gender,
         age=age,
-        image_url=image_url
+        image_url=PENDING_IMAGE_URL if file_bytes else None
     )
     db.add(new_data)
+    db.flush()  # INSERT ... RETURNING id (commit 후 refresh 왕복 없음)
+    new_id = new_data.id
     db.commit()
-    db.refresh(new_data)
+
+    # Azure 업로드는 백그라운드에서, 끝나면 image_url이 채워진다
+    if file_bytes:
+        await image_uploads.enqueue(new_id, file_bytes, cctv_id)
     return {
         "message": "cctv_data created",
-        "id": new_data.id,
-        "image_url": new_data.image_url
+        "id": new_id,
+        "image_url": None,
+        "image_pending": bool(file_bytes)
     }
 
-@router.get("/cctv_data/{cctv_id}", response_model=List[dict])
-def get_cctv_data(cctv_id: int, db: Session = Depends(get_db)):
-    rows = db.query(CctvData).filter(CctvData.cctv_id == cctv_id).all()
+class CctvDataItem(BaseModel):
+    cctv_id: int
+    detected_time: datetime
+    person_label: Optional[str] = Field(None, max_length=50)
+    gender: Optional[str] = Field(None, max_length=10)
+    age: Optional[str] = Field(None, max_length=20)
+    image_part: Optional[str] = None  # multipart일 때 이미지 파일 파트 이름
 
-    if not rows:
-        return []
-    
-    results = []
-    for r in rows:
-        results.append({
-            "id": r.id,
-            "cctv_id": r.cctv_id,
-            "detected_time": r.detected_time,
-            "person_label": r.person_label,
-            "gender": r.gender,
-            "age": r.age,
-            "image_url": r.image_url
-        })
-    return results
+
+async def parse_bulk_items(request: Request):
+    """
+    요청 본문 -> (raw item 리스트, {파트 이름: 이미지 bytes})
+    - application/json: [ {...}, ... ] 또는 { "items": [ ... ] }
+    - application/x-ndjson: 한 줄에 항목 하나
+    - multipart/form-data: 'items' 필드(JSON 배열) + 항목의 image_part가 가리키는 파일 파트
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    images = {}
+    try:
+        if content_type == "multipart/form-data":
+            form = await request.form()
+            items = json.loads(form.get("items") or "[]")
+            for name, value in form.multi_items():
+                if name != "items" and hasattr(value, "read"):
+                    images[name] = await value.read()
+        elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+            body = (await request.body()).decode("utf-8")
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(await request.body() or b"[]")
+            if isinstance(items, dict):
+                items = items.get("items", [])
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="items must be a JSON array")
+    return items, images
+
+
+def validate_bulk_item(raw):
+    """returns: (CctvDataItem, None) / (None, 에러 메시지)"""
+    if not isinstance(raw, dict):
+        return None, "item must be an object"
+    raw = {
+        k: (str(v) if k in ("person_label", "gender", "age") and v is not None and not isinstance(v, str) else v)
+        for k, v in raw.items()
+    }
+    try:
+        item = CctvDataItem(**raw)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+    if beyond_partition_horizon(item.detected_time):
+        return None, "detected_time: too far in the future"
+    return item, None
+
+
+@router.post("/cctv_data/bulk", response_model=dict)
+async def create_cctv_data_bulk(request: Request, db: Session = Depends(get_db)):
+    """
+    여러 감지 결과를 한 번에 저장 (JSON / NDJSON / multipart + 이미지 파트).
+    - 항목별로 검증하고, 통과한 항목만 multi-row INSERT ... RETURNING 으로 한 트랜잭션에 저장
+    - 이미지가 있는 항목은 image_url 대기 상태로 저장하고, Azure 업로드는 백그라운드 큐에서
+    returns: {
+        ids: 요청 순서대로 생성된 id (실패한 항목은 null),
+        errors: [{index, error}], created, image_pending
+    }
+    """
+    raw_items, images = await parse_bulk_items(request)
+    if len(raw_items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {BULK_MAX_ITEMS})")
+
+    ids = [None] * len(raw_items)
+    errors = []
+    valid = []  # (index, CctvDataItem)
+    for i, raw in enumerate(raw_items):
+        item, error = validate_bulk_item(raw)
+        if error:
+            errors.append({"index": i, "error": error})
+        elif item.image_part and item.image_part not in images:
+            errors.append({"index": i, "error": f"image part not found: {item.image_part}"})
+        else:
+            valid.append((i, item))
+
+    # 없는 cctv_id는 FK 오류로 배치 전체가 실패하지 않도록 미리 걸러낸다
+    cctv_ids = {item.cctv_id for _, item in valid}
+    if cctv_ids:
+        known = {row[0] for row in db.query(CctvInfo.id).filter(CctvInfo.id.in_(cctv_ids)).all()}
+        for i, item in valid:
+            if item.cctv_id not in known:
+                errors.append({"index": i, "error": f"unknown cctv_id: {item.cctv_id}"})
+        valid = [(i, item) for i, item in valid if item.cctv_id in known]
+
+    def image_of(item):
+        return images.get(item.image_part) if item.image_part else None
+
+    if valid:
+        rows = [
+            {
+                "cctv_id": item.cctv_id,
+                "detected_time": item.detected_time,
+                "person_label": item.person_label,
+                "gender": item.gender,
+                "age": item.age,
+                "image_url": PENDING_IMAGE_URL if image_of(item) else None,
+            }
+            for i, item in valid
+        ]
+        try:
+            result = db.execute(
+                insert(CctvData).returning(CctvData.id, sort_by_parameter_order=True),
+                rows
+            )
+            new_ids = [row[0] for row in result]
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=f"Bulk insert failed: {e.__class__.__name__}")
+        for (i, _), new_id in zip(valid, new_ids):
+            ids[i] = new_id
+
+    pending = 0
+    for i, item in valid:
+        if image_of(item):
+            await image_uploads.enqueue(ids[i], image_of(item), item.cctv_id)
+            pending += 1
+
+    errors.sort(key=lambda e: e["index"])
+    return {
+        "message": "cctv_data bulk created",
+        "created": len(valid),
+        "ids": ids,
+        "errors": errors,
+        "image_pending": pending,
+    }
+
+def cctv_data_to_dict(r: CctvData) -> dict:
+    return {
+        "id": r.id,
+        "cctv_id": r.cctv_id,
+        "detected_time": r.detected_time,
+        "person_label": r.person_label,
+        "gender": r.gender,
+        "age": r.age,
+        "image_url": public_image_url(r.image_url),
+        "image_pending": r.image_url == PENDING_IMAGE_URL
+    }
+
+
+@router.get("/cctv_data/{cctv_id}", response_model=List[dict])
+def get_cctv_data(
+    cctv_id: int,
+    start: Optional[datetime] = None,       # detected_time >= start
+    end: Optional[datetime] = None,         # detected_time < end
+    cursor: Optional[str] = None,           # 이전 응답의 X-Next-Cursor
+    limit: Optional[int] = None,
+    order: str = "asc",                     # asc | desc (최신순)
+    format: str = "json",                   # json | ndjson
+    db: Session = Depends(get_db)
+):
+    """
+    (detected_time, id) keyset 페이지네이션.
+    json: limit개씩 (기본 PAGE_SIZE_DEFAULT). limit을 주지 않아도 한 페이지만 돌려주므로
+          범위 전체가 필요하면 X-Next-Cursor 헤더가 없을 때까지 cursor로 이어 받거나 ndjson을 쓸 것
+    ndjson: 범위 전체를 스트리밍
+    """
+    query = keyset_filter(
+        db.query(CctvData).filter(CctvData.cctv_id == cctv_id),
+        CctvData.detected_time, CctvData.id, start, end, cursor, order
+    )
+    return paginated_response(db, query, "detected_time", cctv_data_to_dict, limit, format)
 
 @router.get("/cctv_data", response_model=List[dict])
-def list_cctv_data(db: Session = Depends(get_db)):
-    rows = db.query(CctvData).all()
-    return [
-        {
-            "id": r.id,
-            "cctv_id": r.cctv_id,
-            "detected_time": r.detected_time,
-            "person_label": r.person_label,
-            "gender": r.gender,
-            "age": r.age,
-            "image_url": r.image_url
-        }
-        for r in rows
-    ]
+def list_cctv_data(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    order: str = "asc",
+    format: str = "json",                   # json | ndjson
+    db: Session = Depends(get_db)
+):
+    """전체 cctv_data (get_cctv_data와 같은 페이지네이션/스트리밍 파라미터)"""
+    query = keyset_filter(db.query(CctvData), CctvData.detected_time, CctvData.id, start, end, cursor, order)
+    return paginated_response(db, query, "detected_time", cctv_data_to_dict, limit, format)
 
 # -----------------------------------------------------------
 # 4) person_count 테이블 관련
@@ -436,6 +630,8 @@ class PersonCountCreate(BaseModel):
 
 @router.post("/person_count", response_model=dict)
 def create_person_count(data: PersonCountCreate, db: Session = Depends(get_db)):
+    if beyond_partition_horizon(data.timestamp):
+        raise HTTPException(status_code=400, detail="timestamp is too far in the future")
     new_count = PersonCount(
         cctv_id=data.cctv_id,
         timestamp=data.timestamp,
@@ -452,36 +648,44 @@ def create_person_count(data: PersonCountCreate, db: Session = Depends(get_db)):
     return {"message": "person_count created", "id": new_count.id}
 
 
+def person_count_to_dict(pc: PersonCount) -> dict:
+    return {
+        "id": pc.id,
+        "cctv_id": pc.cctv_id,
+        "timestamp": pc.timestamp,
+        "male_young_adult": pc.male_young_adult,
+        "female_young_adult": pc.female_young_adult,
+        "male_middle_aged": pc.male_middle_aged,
+        "female_middle_aged": pc.female_middle_aged,
+        "male_minor": pc.male_minor,
+        "female_minor": pc.female_minor
+    }
+
+
 @router.get("/person_count/{cctv_id}", response_model=List[dict])
-def get_person_count_by_cctv_id(cctv_id: int, db: Session = Depends(get_db)):
+def get_person_count_by_cctv_id(
+    cctv_id: int,
+    start: Optional[datetime] = None,       # timestamp >= start
+    end: Optional[datetime] = None,         # timestamp < end
+    cursor: Optional[str] = None,           # 이전 응답의 X-Next-Cursor
+    limit: Optional[int] = None,
+    order: str = "asc",
+    format: str = "json",                   # json | ndjson
+    db: Session = Depends(get_db)
+):
     """
-    cctv_id로 person_count 테이블을 조회,
-    cctv_id가 일치하는 모든 레코드 반환.
+    cctv_id로 person_count 테이블을 조회 ((timestamp, id) keyset 페이지네이션).
+    json: limit개씩 (기본 PAGE_SIZE_DEFAULT, limit이 없어도 한 페이지만). 이어지는 페이지는 X-Next-Cursor.
+    json 첫 페이지에 레코드가 없으면 404 (기존 동작), ndjson은 범위 전체를 스트리밍.
     """
-
-    records = db.query(PersonCount).filter(PersonCount.cctv_id == cctv_id).all()
-
-    if not records:
-        # CCTV ID가 존재하지 않거나, 아직 데이터가 없을 수 있음
-        # 필요 시 에러 대신 빈 리스트 반환 가능
-        raise HTTPException(status_code=404, detail="No records found for this cctv_id")
-
-    # 여러 행을 각각 dict 형태로 변환
-    results = []
-    for pc in records:
-        results.append({
-            "id": pc.id,
-            "cctv_id": pc.cctv_id,
-            "timestamp": pc.timestamp,
-            "male_young_adult": pc.male_young_adult,
-            "female_young_adult": pc.female_young_adult,
-            "male_middle_aged": pc.male_middle_aged,
-            "female_middle_aged": pc.female_middle_aged,
-            "male_minor": pc.male_minor,
-            "female_minor": pc.female_minor
-        })
-
-    return results
+    query = keyset_filter(
+        db.query(PersonCount).filter(PersonCount.cctv_id == cctv_id),
+        PersonCount.timestamp, PersonCount.id, start, end, cursor, order
+    )
+    return paginated_response(
+        db, query, "timestamp", person_count_to_dict, limit, format,
+        empty_status=None if cursor else 404
+    )
 
 # -----------------------------------------------------------
 # 5) auth 테이블 (OAuth 정보)
@@ -12,7 +12,7 @@ def setup_periodic_tasks(sender, **kwargs):
         name='aggregate every hour'
     )
 
-    # 2) 매일 새벽 4시 오래된 데이터 삭제
+    # 2) 매일 새벽 4시 다음 달 파티션 생성 + 보관 기간 지난 파티션 삭제
     sender.add_periodic_task(
         crontab(hour=4, minute=0),
         clean_db_data.s(),
@@ -69,7 +69,8 @@ function CCTVMonitoring() {
   // ------------------------------------------------------------
   const fetchLogs = useCallback(async () => {
     try {
-      const response = await fetch(`/api/cctv_data/${cctvId}`);
+      // 최신 50건만 (감지 시각 내림차순)
+      const response = await fetch(`/api/cctv_data/${cctvId}?order=desc&limit=50`);
       if (!response.ok) {
         throw new Error(`Failed to fetch logs for cctvId=${cctvId}`);
       }
@@ -114,7 +114,8 @@ function Dashboard() {
     try {
       // 백엔드 라우트: /person_count/{cctv_id}
       // ex) /person_count/1
-      const response = await fetch(`api/person_count/${cctvId}`);
+      // 전체 기간은 NDJSON 스트리밍으로 (JSON 배열은 페이지 크기 제한이 있음)
+      const response = await fetch(`api/person_count/${cctvId}?format=ndjson`);
   
       // 404 처리 (no records found)
       if (response.status === 404) {
@@ -126,7 +127,11 @@ function Dashboard() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
   
-      const data = await response.json();
+      const text = await response.text();
+      const data = text.split("\n").filter((line) => line.trim()).map((line) => JSON.parse(line));
+      if (data.length === 0) {
+        console.warn(`No records found for cctv_id=${cctvId}`);
+      }
       console.log("PersonCount 목록:", data);
       return data;
     } catch (error) {
@@ -0,0 +1,124 @@
+# /home/azureuser/FootTrafficReport/people-detection/benchmarks/mock_servers.py
+
+import asyncio
+import json
+import random
+import socket
+import threading
+
+from aiohttp import web
+
+
+# ---------------------------------------------------------
+# 벤치마크용 로컬 대역: Azure Custom Vision + 백엔드 /api/cctv_data
+# ---------------------------------------------------------
+class MockServers:
+    """
+    별도 스레드의 이벤트 루프에서 aiohttp 서버를 띄운다 (측정 대상 루프와 분리).
+    - POST /azure/predict        : Custom Vision 응답 형식 (azure_latency_ms 지연, throttle_ratio 확률로 429)
+    - POST /api/cctv_data        : 단건 업로드 (multipart, image_file)
+    - POST /api/cctv_data/bulk   : bulk 업로드 (multipart, items JSON + image_{i})
+    """
+
+    def __init__(self, azure_latency_ms=50.0, backend_latency_ms=5.0, throttle_ratio=0.0, seed=0):
+        self.azure_latency = azure_latency_ms / 1000.0
+        self.backend_latency = backend_latency_ms / 1000.0
+        self.throttle_ratio = throttle_ratio
+        self._random = random.Random(seed)
+        self.port = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+        self.reset()
+
+    def reset(self):
+        self.counters = {
+            "azure_requests": 0,
+            "azure_throttled": 0,
+            "backend_requests": 0,
+            "backend_items": 0,
+            "backend_images": 0,
+        }
+
+    @property
+    def azure_url(self):
+        return f"http://127.0.0.1:{self.port}/azure/predict"
+
+    @property
+    def backend_url(self):
+        return f"http://127.0.0.1:{self.port}/api/cctv_data"
+
+    # ---- handlers ----
+    async def _azure(self, request):
+        await request.read()
+        self.counters["azure_requests"] += 1
+        await asyncio.sleep(self.azure_latency)
+        if self.throttle_ratio and self._random.random() < self.throttle_ratio:
+            self.counters["azure_throttled"] += 1
+            return web.json_response({"error": "throttled"}, status=429)
+        male = self._random.random()
+        ages = [self._random.random() for _ in range(3)]
+        predictions = [
+            {"tagName": "Male", "probability": male},
+            {"tagName": "Female", "probability": 1.0 - male},
+            {"tagName": "Age18to60", "probability": ages[0]},
+            {"tagName": "AgeOver60", "probability": ages[1]},
+            {"tagName": "AgeLess18", "probability": ages[2]},
+        ]
+        return web.json_response({"predictions": predictions})
+
+    async def _cctv_data(self, request):
+        form = await request.post()
+        await asyncio.sleep(self.backend_latency)
+        self.counters["backend_requests"] += 1
+        self.counters["backend_items"] += 1
+        if "image_file" in form:
+            self.counters["backend_images"] += 1
+        return web.json_response({"id": self.counters["backend_items"]}, status=201)
+
+    async def _cctv_data_bulk(self, request):
+        form = await request.post()
+        await asyncio.sleep(self.backend_latency)
+        items = json.loads(form.get("items") or "[]")
+        self.counters["backend_requests"] += 1
+        start = self.counters["backend_items"]
+        self.counters["backend_items"] += len(items)
+        self.counters["backend_images"] += sum(1 for it in items if it.get("image_part") in form)
+        return web.json_response({"ids": list(range(start + 1, start + len(items) + 1))}, status=201)
+
+    # ---- lifecycle ----
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/azure/predict", self._azure)
+        app.router.add_post("/api/cctv_data", self._cctv_data)
+        app.router.add_post("/api/cctv_data/bulk", self._cctv_data_bulk)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        self._loop.run_until_complete(site.start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name="bench-mock-servers", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout=10):
+            raise RuntimeError("mock servers failed to start")
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+            self._loop = None
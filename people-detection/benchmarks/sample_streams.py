@@ -0,0 +1,74 @@
+# /home/azureuser/FootTrafficReport/people-detection/benchmarks/sample_streams.py
+"""
+카메라 직접 수집(camera_ingest) 테스트용 로컬 스트림 서버 (ffmpeg 필요)
+
+    python -m benchmarks.sample_streams sample.mp4 --rtsp-port 8554 --http-port 8090 --count 2
+
+- rtsp://127.0.0.1:{rtsp_port + i}/cam{i} : ffmpeg RTSP 서버 모드 (-rtsp_flags listen, 클라이언트 1개,
+  ffmpeg 하나가 포트 하나를 쓰므로 스트림마다 포트가 다름)
+- http://127.0.0.1:{http_port + i}/cam.ts : MPEG-TS over HTTP (-listen 1)
+영상은 -re로 실시간 속도로, 끝나면 반복 재생한다. 클라이언트가 끊기면 ffmpeg를 다시 띄워
+재연결 동작도 확인할 수 있다. 출력된 URL을 POST /cameras 또는 CAMERA_SOURCES에 넣으면 된다.
+"""
+
+import argparse
+import shutil
+import subprocess
+import time
+
+
+def ffmpeg_command(source, output, fmt, extra):
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-re", "-stream_loop", "-1", "-i", source,
+        "-an", "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-g", "25",
+        *extra, "-f", fmt, output,
+    ]
+
+
+def stream_specs(args):
+    specs = []
+    for i in range(1, args.count + 1):
+        if args.rtsp_port:
+            url = f"rtsp://127.0.0.1:{args.rtsp_port + i - 1}/cam{i}"
+            specs.append((url, ffmpeg_command(args.source, url, "rtsp", ["-rtsp_flags", "listen"])))
+        if args.http_port:
+            url = f"http://127.0.0.1:{args.http_port + i - 1}/cam.ts"
+            specs.append((url, ffmpeg_command(args.source, url, "mpegts", ["-listen", "1"])))
+    return specs
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="serve a sample video as local RTSP/HTTP camera streams")
+    parser.add_argument("source", help="sample video file")
+    parser.add_argument("--rtsp-port", type=int, default=8554, help="0 to disable")
+    parser.add_argument("--http-port", type=int, default=8090, help="0 to disable")
+    parser.add_argument("--count", type=int, default=1, help="number of streams per protocol")
+    args = parser.parse_args(argv)
+
+    if shutil.which("ffmpeg") is None:
+        raise SystemExit("ffmpeg not found in PATH")
+
+    specs = stream_specs(args)
+    procs = {url: subprocess.Popen(cmd) for url, cmd in specs}
+    for url in procs:
+        print(f"[INFO] serving {url}")
+    try:
+        while True:
+            time.sleep(1.0)
+            # listen 모드 ffmpeg는 클라이언트가 끊기면 종료되므로 다시 띄운다
+            for url, cmd in specs:
+                if procs[url].poll() is not None:
+                    print(f"[INFO] restarting {url}")
+                    procs[url] = subprocess.Popen(cmd)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            p.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,366 @@
+# /home/azureuser/FootTrafficReport/people-detection/benchmarks/throughput.py
+"""
+PersonTracker.process_single_frame 처리량/지연시간 벤치마크
+
+people-detection/ 디렉터리에서 실행:
+    python -m benchmarks.throughput --batch-sizes 1,4,8 --concurrency 1,4 \
+        --image-sizes 640x360,1280x720 --densities 0,4,16 --output bench.json
+    python -m benchmarks.throughput ... --compare bench_prev.json
+
+- detector=synthetic: 합성 장면(마젠타색 사람 실루엣)을 색 분할로 찾는 로컬 대역 검출기.
+  YOLO 없이 추적/blur/분류/전송 경로를 사람 밀도별로 측정한다.
+- detector=yolo: 실제 포즈 모델(--model). --frames-dir/--video로 녹화 프레임 사용 가능
+- Azure Custom Vision과 백엔드 /api/cctv_data는 로컬 mock 서버로 대체
+- 전송 스풀은 설정마다 새 임시 파일을 쓰고 끝나면 지운다 (남은 항목이 다음 측정에 재전송되지 않도록)
+- 결과는 git 커밋/환경 정보와 함께 JSON으로 저장 (--compare로 이전 결과와 비교)
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from .mock_servers import MockServers
+
+
+MARKER_BGR = (255, 0, 255)
+
+# COCO 17 keypoint의 박스 내 상대 위치 (x, y)
+KEYPOINT_LAYOUT = np.array([
+    [0.50, 0.08],                # nose
+    [0.44, 0.06], [0.56, 0.06],  # eyes
+    [0.38, 0.08], [0.62, 0.08],  # ears
+    [0.25, 0.22], [0.75, 0.22],  # shoulders
+    [0.20, 0.38], [0.80, 0.38],  # elbows
+    [0.20, 0.52], [0.80, 0.52],  # wrists
+    [0.35, 0.55], [0.65, 0.55],  # hips
+    [0.35, 0.75], [0.65, 0.75],  # knees
+    [0.35, 0.95], [0.65, 0.95],  # ankles
+], dtype=np.float32)
+
+
+# ---------------------------------------------------------
+# 합성 장면 + 로컬 대역 검출기
+# ---------------------------------------------------------
+class SyntheticScene:
+    """
+    질감 있는 배경 위를 people명이 일정 속도로 움직이는 프레임 시퀀스.
+    앞뒤로 왕복 재생(ping-pong)해 순환해도 움직임이 끊기지 않는다.
+    """
+
+    def __init__(self, width, height, people, frames=48, seed=0):
+        rng = np.random.default_rng(seed)
+        gradient = np.linspace(60, 180, width, dtype=np.float32)[None, :, None]
+        noise = rng.normal(0, 12, (height, width, 1)).astype(np.float32)
+        background = np.clip(gradient + noise, 0, 230).astype(np.uint8).repeat(3, axis=2)
+
+        person_h = rng.uniform(0.25, 0.45, people) * height
+        person_w = person_h * 0.4
+        pos = np.stack([rng.uniform(0, width - person_w), rng.uniform(0, height - person_h)], axis=1)
+        vel = rng.uniform(-1, 1, (people, 2)) * np.array([width, height]) * 0.01
+
+        self.frames = []
+        for _ in range(max(2, int(frames))):
+            frame = background.copy()
+            for (x, y), w, h in zip(pos, person_w, person_h):
+                x1, y1 = int(x), int(y)
+                cv2.rectangle(frame, (x1, y1 + int(h * 0.18)), (int(x + w), int(y + h)), MARKER_BGR, -1)
+                cv2.circle(frame, (int(x + w / 2), y1 + int(h * 0.09)), int(h * 0.09), MARKER_BGR, -1)
+            self.frames.append(frame)
+            pos += vel
+            lo = np.zeros_like(pos)
+            hi = np.stack([width - person_w, height - person_h], axis=1)
+            bounce = (pos < lo) | (pos > hi)
+            vel[bounce] *= -1
+            pos = np.clip(pos, lo, hi)
+        self.frames += self.frames[-2:0:-1]
+
+    def frame(self, index):
+        return self.frames[index % len(self.frames)]
+
+
+class RecordedScene:
+    """--frames-dir 이미지들 또는 --video 앞부분을 image_size로 맞춰 순환 재생"""
+
+    def __init__(self, width, height, frames_dir=None, video=None, frames=48):
+        raw = []
+        if frames_dir:
+            names = sorted(n for n in os.listdir(frames_dir)
+                           if n.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")))
+            for name in names[:frames]:
+                img = cv2.imread(os.path.join(frames_dir, name), cv2.IMREAD_COLOR)
+                if img is not None:
+                    raw.append(img)
+        elif video:
+            cap = cv2.VideoCapture(video)
+            while len(raw) < frames:
+                ok, img = cap.read()
+                if not ok:
+                    break
+                raw.append(img)
+            cap.release()
+        if not raw:
+            raise RuntimeError("no recorded frames could be read")
+        self.frames = [cv2.resize(f, (width, height), interpolation=cv2.INTER_AREA) for f in raw]
+
+    def frame(self, index):
+        return self.frames[index % len(self.frames)]
+
+
+class SyntheticDetector:
+    """
+    마젠타 실루엣을 색 분할(inRange + contour)로 찾아 PersonTracker detections 형태로 반환.
+    겹친 사람은 하나로 합쳐진다 (가림과 비슷한 효과).
+    """
+
+    def __init__(self, min_area=64):
+        self.min_area = min_area
+
+    def detect(self, frame):
+        mask = cv2.inRange(frame, MARKER_BGR, MARKER_BGR)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rects = np.array([cv2.boundingRect(c) for c in contours if cv2.contourArea(c) >= self.min_area],
+                         dtype=np.float32).reshape(-1, 4)
+        boxes = np.concatenate([rects[:, :2], rects[:, :2] + rects[:, 2:]], axis=1)
+        keypoints = np.ones((len(boxes), 17, 3), dtype=np.float32) * 0.9
+        keypoints[:, :, :2] = boxes[:, None, :2] + KEYPOINT_LAYOUT[None] * rects[:, None, 2:]
+        return {
+            "boxes": boxes,
+            "scores": np.full((len(boxes),), 0.9, dtype=np.float32),
+            "keypoints": keypoints,
+        }
+
+    def predict_batch(self, frames):
+        return [self.detect(f) for f in frames]
+
+
+# ---------------------------------------------------------
+# 측정
+# ---------------------------------------------------------
+def parse_list(text, cast=int):
+    return [cast(v.strip()) for v in text.split(",") if v.strip()]
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    arr = np.asarray(latencies) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"mean": float(arr.mean()), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(arr.max())}
+
+
+def git_info():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", ".."], cwd=here,
+                                    capture_output=True, text=True, timeout=30).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty}
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+async def run_stream(tracker, scene, cctv_id, start, count, latencies):
+    for i in range(start, start + count):
+        # 파이프라인이 프레임에 직접 그리므로 복사본 전달 (디코딩된 새 프레임에 해당)
+        frame = scene.frame(i + cctv_id * 7).copy()
+        t0 = time.perf_counter()
+        await tracker.process_single_frame(frame, cctv_id)
+        if latencies is not None:
+            latencies.append(time.perf_counter() - t0)
+
+
+async def run_config(main, args, config, scene, detector, mocks):
+    from src.metrics import StageTimer
+
+    # 설정마다 빈 스풀에서 시작 (PersonTracker가 생성 시점에 main.SPOOL_PATH를 연다)
+    spool_dir = tempfile.mkdtemp(prefix="bench-spool-")
+    main.SPOOL_PATH = os.path.join(spool_dir, "detections.db")
+    stage_timer = StageTimer(enabled=True)
+    tracker = main.PersonTracker(main.model_registry, metrics=stage_timer)
+    tracker.batcher.max_batch_size = config["batch_size"]
+    tracker.motion_gate.enabled = config["motion_gate"]
+    if detector is not None:
+        tracker.batcher.predict_fn = detector.predict_batch
+
+    mocks.reset()
+    await tracker.batcher.start()
+    await tracker.sink.start()
+    await tracker.classifier.start()
+    streams = range(1, config["concurrency"] + 1)
+    try:
+        await asyncio.gather(*[run_stream(tracker, scene, cid, 0, args.warmup, None) for cid in streams])
+        # 워밍업 구간 지표는 버린다
+        stage_timer = tracker.metrics = tracker.sink.metrics = StageTimer(enabled=True)
+        batches0, frames0 = tracker.batcher.total_batches, tracker.batcher.total_frames
+
+        latencies = []
+        t0 = time.perf_counter()
+        await asyncio.gather(*[run_stream(tracker, scene, cid, args.warmup, args.frames, latencies)
+                               for cid in streams])
+        wall = time.perf_counter() - t0
+        batches = tracker.batcher.total_batches - batches0
+        inferred = tracker.batcher.total_frames - frames0
+    finally:
+        await tracker.batcher.stop()
+        await tracker.sink.stop()
+        await tracker.classifier.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+    gate = tracker.motion_gate.stats()
+    classifier = tracker.classifier.stats()
+    sink = tracker.sink.stats()
+    return {
+        "config": config,
+        "frames": len(latencies),
+        "wall_seconds": wall,
+        "fps": len(latencies) / wall if wall else 0.0,
+        "latency_ms": percentiles(latencies),
+        "inferred_frames": inferred,
+        "avg_batch_size": (inferred / batches) if batches else 0.0,
+        "motion_skip_ratio": gate["skip_ratio"],
+        "stages": stage_timer.summary(),
+        "quality_gate": tracker.quality_gate.stats(),
+        "classifier": {k: classifier.get(k) for k in ("requests", "failures", "throttled", "avg_latency_ms")},
+        "sink": {k: sink.get(k) for k in ("submitted", "delivered", "failed", "rejected", "dropped", "batches")},
+        "mock": dict(mocks.counters),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {config_key(r["config"]): r for r in json.load(f)["results"]}
+    print(f"\n== compare with {baseline_path}")
+    print(f"{'config':<70} {'fps old':>9} {'fps new':>9} {'fps %':>7} {'p95 old':>9} {'p95 new':>9}")
+    for r in results:
+        old = baseline.get(config_key(r["config"]))
+        if old is None:
+            continue
+        delta = ((r["fps"] / old["fps"]) - 1.0) * 100.0 if old["fps"] else 0.0
+        label = ",".join(f"{k}={v}" for k, v in r["config"].items())
+        print(f"{label:<70} {old['fps']:>9.1f} {r['fps']:>9.1f} {delta:>+6.1f}% "
+              f"{old['latency_ms']['p95']:>9.1f} {r['latency_ms']['p95']:>9.1f}")
+
+
+async def run(args):
+    mocks = MockServers(
+        azure_latency_ms=args.azure_latency_ms,
+        backend_latency_ms=args.backend_latency_ms,
+        throttle_ratio=args.throttle_ratio,
+        seed=args.seed
+    ).start()
+
+    # main 모듈은 import 시점에 환경 변수를 읽으므로 mock URL을 먼저 설정
+    os.environ["AZURE_API_URL"] = mocks.azure_url
+    os.environ["AZURE_PREDICTION_KEY"] = "bench"
+    os.environ["ATTR_CLASSIFIER"] = "azure"
+    os.environ["BACKEND_URL"] = mocks.backend_url
+    os.environ["BACKEND_BULK_URL"] = mocks.backend_url + "/bulk"
+    from src import main
+
+    detector = None
+    if args.detector == "yolo":
+        main.model_registry.register(main.POSE_MODEL_NAME, args.model or main.POSE_MODEL_PATH)
+        await asyncio.to_thread(main.model_registry.load, main.POSE_MODEL_NAME)
+    else:
+        detector = SyntheticDetector()
+
+    recorded = bool(args.frames_dir or args.video)
+    densities = ["recorded"] if recorded else parse_list(args.densities)
+    results = []
+    try:
+        for size_text, density in itertools.product(args.image_sizes.split(","), densities):
+            width, height = parse_size(size_text)
+            if recorded:
+                scene = RecordedScene(width, height, args.frames_dir, args.video, args.scene_frames)
+            else:
+                scene = SyntheticScene(width, height, density, args.scene_frames, args.seed)
+            for batch_size, concurrency in itertools.product(parse_list(args.batch_sizes),
+                                                             parse_list(args.concurrency)):
+                config = {
+                    "detector": args.detector,
+                    "image_size": f"{width}x{height}",
+                    "density": density,
+                    "batch_size": batch_size,
+                    "concurrency": concurrency,
+                    "motion_gate": not args.no_motion_gate,
+                }
+                result = await run_config(main, args, config, scene, detector, mocks)
+                results.append(result)
+                lat = result["latency_ms"]
+                print(f"[BENCH] {config['image_size']:>9} density={density!s:<8} batch={batch_size:<3} "
+                      f"conc={concurrency:<3} fps={result['fps']:8.1f} p50={lat['p50']:7.1f}ms "
+                      f"p95={lat['p95']:7.1f}ms avg_batch={result['avg_batch_size']:.2f}")
+    finally:
+        mocks.stop()
+
+    meta = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_info(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "device": main.model_registry.device,
+        "args": vars(args),
+        "env": {k: v for k, v in sorted(os.environ.items())
+                if k.startswith(("BATCH_", "TRACK_", "ATTR_", "AZURE_RATE", "AZURE_MAX", "MOTION_", "SINK_", "SPOOL_"))},
+    }
+    return {"meta": meta, "results": results}
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="people-detection throughput benchmark")
+    parser.add_argument("--detector", choices=["synthetic", "yolo"], default="synthetic")
+    parser.add_argument("--model", help="YOLO pose model path (detector=yolo)")
+    parser.add_argument("--frames-dir", help="recorded frames directory (instead of synthetic scenes)")
+    parser.add_argument("--video", help="recorded video file (instead of synthetic scenes)")
+    parser.add_argument("--densities", default="0,4,16", help="people per synthetic frame")
+    parser.add_argument("--image-sizes", default="640x360,1280x720")
+    parser.add_argument("--batch-sizes", default="1,8")
+    parser.add_argument("--concurrency", default="1,4", help="concurrent camera streams")
+    parser.add_argument("--frames", type=int, default=200, help="measured frames per stream")
+    parser.add_argument("--warmup", type=int, default=20, help="warmup frames per stream")
+    parser.add_argument("--scene-frames", type=int, default=48)
+    parser.add_argument("--azure-latency-ms", type=float, default=50.0)
+    parser.add_argument("--backend-latency-ms", type=float, default=5.0)
+    parser.add_argument("--throttle-ratio", type=float, default=0.0)
+    parser.add_argument("--no-motion-gate", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] results written to {args.output}")
+    if args.compare:
+        compare(report["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main_cli()
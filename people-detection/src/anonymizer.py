@@ -0,0 +1,111 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/anonymizer.py
+
+import math
+
+import cv2
+import numpy as np
+
+
+FACE_KEYPOINTS = [0, 1, 2, 3, 4]  # nose, eyes, ears
+
+
+def estimate_face_areas(keypoints, boxes, conf_thr=0.3, expand_vertical=3.0, expand_side=0.2):
+    """
+    전체 keypoint 텐서에서 사람별 얼굴 영역을 한 번에 계산한다.
+    keypoints: (N,17,3) 또는 (N,17,2), boxes: (N,4) xyxy
+    returns: (areas (N,4) int xyxy, valid (N,) bool)
+    - 보이는 얼굴 keypoint의 외접 박스를 위아래로 expand_vertical배, 좌우로 expand_side배 확장
+    - 사람 박스 안으로 clamp, 영역이 없으면 valid=False
+    """
+    n = min(len(keypoints), len(boxes))
+    areas = np.zeros((n, 4), dtype=np.int64)
+    if n == 0:
+        return areas, np.zeros((0,), dtype=bool)
+
+    kpts = np.asarray(keypoints[:n, FACE_KEYPOINTS], dtype=np.float32)
+    box = np.asarray(boxes[:n], dtype=np.float32).astype(np.int64)
+    if kpts.shape[2] == 3:
+        visible = kpts[:, :, 2] > conf_thr
+    else:
+        visible = np.ones(kpts.shape[:2], dtype=bool)
+    any_visible = visible.any(axis=1)
+
+    xy = kpts[:, :, :2]
+    mask = visible[:, :, None]
+    lo = np.where(mask, xy, np.inf).min(axis=1)
+    hi = np.where(mask, xy, -np.inf).max(axis=1)
+    lo = np.where(any_visible[:, None], lo, 0).astype(np.int64)
+    hi = np.where(any_visible[:, None], hi, 0).astype(np.int64)
+
+    # 박스 범위 안으로 clamp
+    lo = np.maximum(lo, box[:, :2])
+    hi = np.minimum(hi, box[:, 2:])
+    valid = any_visible & (hi > lo).all(axis=1)
+
+    size = hi - lo
+    expand_x = (size[:, 0] * expand_side).astype(np.int64)
+    expand_y = (size[:, 1] * expand_vertical).astype(np.int64)
+    lo = np.maximum(lo - np.stack([expand_x, expand_y], axis=1), box[:, :2])
+    hi = np.minimum(hi + np.stack([expand_x, expand_y], axis=1), box[:, 2:])
+    valid &= (hi > lo).all(axis=1)
+
+    areas[:, :2] = lo
+    areas[:, 2:] = hi
+    return areas, valid
+
+
+# ---------------------------------------------------------
+# 얼굴 익명화 (blur / pixelate)
+# ---------------------------------------------------------
+class FaceAnonymizer:
+    """
+    mode:
+      - 'blur'     : ROI를 downscale배 줄여서 GaussianBlur 후 다시 키움 (원본 kernel과 같은 번짐 정도)
+      - 'pixelate' : ROI를 블록 단위로 줄였다가 INTER_NEAREST로 키움 (가장 저렴)
+                     블록 크기는 pixel_size 이상, 얼굴 긴 변이 max_blocks칸 이하가 되도록 키운다
+      - 'gaussian' : 원본 해상도에서 kernel x kernel GaussianBlur (기존 동작)
+    """
+    MODES = ("blur", "pixelate", "gaussian")
+
+    def __init__(self, mode="blur", kernel=45, downscale=4, pixel_size=12, max_blocks=8):
+        mode = (mode or "blur").lower()
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown face anonymizer mode: {mode}")
+        self.mode = mode
+        self.kernel = int(kernel) | 1
+        self.downscale = max(1, int(downscale))
+        self.pixel_size = max(1, int(pixel_size))
+        self.max_blocks = max(1, int(max_blocks))
+        # 축소 해상도 blur kernel (홀수)
+        self.small_kernel = max(3, (self.kernel // self.downscale) | 1)
+
+    def _blur(self, roi):
+        h, w = roi.shape[:2]
+        sw, sh = max(1, w // self.downscale), max(1, h // self.downscale)
+        if sw < 2 or sh < 2:
+            return cv2.GaussianBlur(roi, (self.kernel, self.kernel), 0)
+        small = cv2.resize(roi, (sw, sh), interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (self.small_kernel, self.small_kernel), 0)
+        return cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+
+    def _pixelate(self, roi):
+        h, w = roi.shape[:2]
+        block = max(self.pixel_size, math.ceil(max(w, h) / self.max_blocks))
+        small = cv2.resize(roi, (max(1, w // block), max(1, h // block)), interpolation=cv2.INTER_AREA)
+        return cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST)
+
+    def apply(self, frame, areas, valid=None):
+        """areas: (N,4) xyxy (valid=False인 행은 건너뜀). frame을 직접 수정해서 반환"""
+        for i, (x1, y1, x2, y2) in enumerate(areas):
+            if valid is not None and not valid[i]:
+                continue
+            roi = frame[y1:y2, x1:x2]
+            if roi.size == 0:
+                continue
+            if self.mode == "pixelate":
+                frame[y1:y2, x1:x2] = self._pixelate(roi)
+            elif self.mode == "blur":
+                frame[y1:y2, x1:x2] = self._blur(roi)
+            else:
+                frame[y1:y2, x1:x2] = cv2.GaussianBlur(roi, (self.kernel, self.kernel), 0)
+        return frame
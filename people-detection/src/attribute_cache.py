@@ -0,0 +1,134 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/attribute_cache.py
+
+import time
+from collections import OrderedDict
+
+
+# ---------------------------------------------------------
+# track별 성별/연령 캐시: 한 사람은 몇 번만 분류하고 결과를 재사용
+# ---------------------------------------------------------
+class AttributeCache:
+    """
+    key = (cctv_id, track_id)
+    - 최대 max_samples 번만 분류하고, 이전보다 품질이 좋은 crop일 때만 추가 분류
+    - 여러 번의 예측은 태그별 평균으로 합친다
+    - max_samples를 채우거나 첫 분류 후 settle_seconds가 지나면 final (더 이상 분류 안 함)
+    - ttl_seconds 동안 접근이 없으면 만료, max_entries 초과 시 LRU로 제거
+    """
+
+    def __init__(self, max_samples=3, settle_seconds=3.0, min_quality_gain=1.2,
+                 ttl_seconds=600.0, max_entries=5000):
+        self.max_samples = max(1, int(max_samples))
+        self.settle_seconds = settle_seconds
+        self.min_quality_gain = min_quality_gain
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+        # metrics
+        self.classifications = 0
+        self.reused = 0
+        self.evictions = 0
+
+    def _new_entry(self, now):
+        return {
+            "samples": [],
+            "attempts": 0,
+            "best_quality": 0.0,
+            "best_crop": None,
+            "pending": False,
+            "uploaded": False,
+            "first_sample_at": None,
+            "touched": now,
+        }
+
+    def _evict(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry["touched"] > self.ttl_seconds or len(self._entries) > self.max_entries:
+                del self._entries[key]
+                self.evictions += 1
+            else:
+                break
+
+    def get(self, key, now=None):
+        """엔트리를 가져오고(없으면 생성) LRU 순서를 갱신"""
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._new_entry(now)
+            self._entries[key] = entry
+        else:
+            self._entries.move_to_end(key)
+        entry["touched"] = now
+        self._evict(now)
+        return entry
+
+    def is_final(self, key, now=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if entry["attempts"] >= self.max_samples:
+            return True
+        if entry["first_sample_at"] is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - entry["first_sample_at"] >= self.settle_seconds
+
+    def wants_sample(self, key, quality, now=None):
+        """이번 crop을 분류할 가치가 있는지 (아니면 캐시 결과 재사용)"""
+        entry = self.get(key, now)
+        if entry["pending"] or entry["uploaded"] or self.is_final(key, now):
+            self.reused += 1
+            return False
+        if entry["samples"] and quality < entry["best_quality"] * self.min_quality_gain:
+            self.reused += 1
+            return False
+        return True
+
+    def begin_sample(self, key):
+        self.get(key)["pending"] = True
+
+    def add_sample(self, key, preds, quality, crop, now=None):
+        now = time.monotonic() if now is None else now
+        entry = self.get(key, now)
+        entry["pending"] = False
+        entry["attempts"] += 1
+        self.classifications += 1
+        if preds:
+            entry["samples"].append(preds)
+            if entry["first_sample_at"] is None:
+                entry["first_sample_at"] = now
+        if quality >= entry["best_quality"]:
+            entry["best_quality"] = quality
+            entry["best_crop"] = crop
+
+    def cancel_sample(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["pending"] = False
+
+    def result(self, key):
+        """태그별 평균 예측 { 'Male': .., 'Female': .., 'Age18to60': .., ... }"""
+        entry = self._entries.get(key)
+        if entry is None or not entry["samples"]:
+            return {}
+        totals = {}
+        for preds in entry["samples"]:
+            for tag, value in preds.items():
+                totals[tag] = totals.get(tag, 0.0) + value
+        n = len(entry["samples"])
+        return {tag: value / n for tag, value in totals.items()}
+
+    def pop(self, key):
+        return self._entries.pop(key, None)
+
+    def stats(self):
+        total = self.classifications + self.reused
+        return {
+            "entries": len(self._entries),
+            "classifications": self.classifications,
+            "reused": self.reused,
+            "evictions": self.evictions,
+            "reuse_ratio": (self.reused / total) if total else 0.0,
+        }
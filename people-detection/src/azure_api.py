@@ -0,0 +1,179 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/azure_api.py
+
+import asyncio
+import os
+import time
+
+import aiohttp
+from dotenv import load_dotenv
+
+from .classifiers import AttributeClassifier, normalize_predictions
+from .spool import CircuitBreaker
+
+
+# ---------------------------------------------------------
+# 토큰 버킷: Custom Vision 티어의 초당 호출 한도에 맞춰 요청 속도 제한
+# ---------------------------------------------------------
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """토큰이 생길 때까지 기다린다. returns: 기다린 시간(초)"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+# ---------------------------------------------------------
+# (A) Azure Custom Vision API 클래스
+# ---------------------------------------------------------
+class AzureAPI(AttributeClassifier):
+    """
+    앱 수명 동안 하나의 aiohttp 세션(커넥션 풀)을 공유한다.
+    - max_concurrency: 동시에 진행 중인 분류 요청 수 제한 (semaphore)
+    - rate_limit/rate_burst: 토큰 버킷 (초당 요청 수, 0이면 제한 없음)
+    - timeout: 요청당 타임아웃(초)
+    - breaker_threshold/breaker_reset: 연속 실패(타임아웃/5xx/429/네트워크)가 threshold번이면
+      breaker_reset초 동안 요청하지 않고 바로 빈 dict 반환 (감지 경로가 장애난 API를 기다리지 않도록)
+    """
+    name = "azure"
+
+    def __init__(self, max_concurrency=8, rate_limit=10.0, rate_burst=10, timeout=5.0,
+                 breaker_threshold=5, breaker_reset=30.0):
+        load_dotenv()  # .env 파일 로드 (AZURE_API_URL, AZURE_PREDICTION_KEY)
+        self.url = os.getenv("AZURE_API_URL")
+        self.headers = {
+            "Prediction-Key": os.getenv("AZURE_PREDICTION_KEY", ""),
+            "Content-Type": "application/octet-stream"
+        }
+        self.session = None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rate_limit, rate_burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+        # metrics
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+        self.timeouts = 0
+        self.inflight = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.rate_wait_total = 0.0
+        self.short_circuited = 0
+
+    async def start(self):
+        if not self.session:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def analyze_image(self, image_data: bytes):
+        """
+        JPEG 인코딩된 이미지 바이트를 Azure Custom Vision으로 전송해
+        성별(Male/Female), 연령(Age18to60 등) 확률을 얻는다.
+        실패/타임아웃/429는 빈 dict 반환 (카운터에 기록)
+        """
+        if not self.url:
+            # API URL이 없으면 빈 dict 반환
+            return {}
+
+        if not self.session:
+            await self.start()
+
+        if not image_data:
+            return {}
+
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            return {}
+
+        async with self._semaphore:
+            self.rate_wait_total += await self._bucket.acquire()
+            self.requests += 1
+            self.inflight += 1
+            t0 = time.perf_counter()
+            try:
+                async with self.session.post(self.url, headers=self.headers, data=image_data) as response:
+                    if response.status == 429:
+                        self.throttled += 1
+                        self.breaker.record_failure()
+                        return {}
+                    if response.status != 200:
+                        self.failures += 1
+                        if response.status >= 500:
+                            self.breaker.record_failure()
+                        else:
+                            self.breaker.release_trial()
+                        return {}
+                    result = await response.json()
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.failures += 1
+                self.breaker.record_failure()
+                return {}
+            except aiohttp.ClientError as e:
+                print("[ERROR] analyze_image:", e)
+                self.failures += 1
+                self.breaker.record_failure()
+                return {}
+            finally:
+                latency = time.perf_counter() - t0
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                self.inflight -= 1
+
+        self.successes += 1
+        self.breaker.record_success()
+        return self.normalize_predictions(result.get('predictions', []))
+
+    async def classify_batch(self, items):
+        """Custom Vision은 배치 API가 없으므로 crop마다 동시에 요청"""
+        return await asyncio.gather(*[self.analyze_image(it.get("image")) for it in items])
+
+    def normalize_predictions(self, predictions: list):
+        return normalize_predictions(predictions)
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+            "inflight": self.inflight,
+            "max_concurrency": self.max_concurrency,
+            "rate_limit": self._bucket.rate,
+            "avg_latency_ms": (self.latency_total / self.requests * 1000.0) if self.requests else 0.0,
+            "max_latency_ms": self.latency_max * 1000.0,
+            "total_rate_wait_ms": self.rate_wait_total * 1000.0,
+            "short_circuited": self.short_circuited,
+            "breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,152 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/batcher.py
+
+import asyncio
+import time
+
+
+# ---------------------------------------------------------
+# 동적 마이크로 배칭: 동시 요청의 프레임을 모아 한 번의 predict로 처리
+# ---------------------------------------------------------
+class InferenceBatcher:
+    """
+    submit(frame) -> 해당 프레임의 결과를 돌려준다.
+    - 첫 프레임이 들어오면 max_wait_ms 동안(또는 max_batch_size가 찰 때까지) 추가 프레임을 모은다
+    - predict_fn(frames)는 스레드에서 실행되어 이벤트 루프를 막지 않는다
+    - predict_fn은 frames와 같은 순서/길이의 결과 리스트를 반환해야 한다
+    - max_inflight: 동시에 실행할 배치 수 (멀티 프로세스 워커 풀이면 워커 수만큼)
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10, max_inflight=1):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_inflight = max(1, int(max_inflight))
+
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._inflight = set()
+
+        # metrics
+        self.total_frames = 0
+        self.total_batches = 0
+        self.total_errors = 0
+        self.batch_size_counts = {}
+        self.total_queue_wait = 0.0
+        self.total_predict_seconds = 0.0
+        self.last_batch_size = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_inflight)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        # 남은 요청은 실패 처리
+        while self._queue is not None and not self._queue.empty():
+            _, fut, _ = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, frame):
+        if self._worker is None:
+            await self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((frame, fut, time.perf_counter()))
+        return await fut
+
+    async def _collect(self):
+        """첫 항목을 기다린 뒤 크기/시간 제한 안에서 배치를 채운다"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # 시간이 다 됐어도 이미 쌓인 프레임은 함께 처리
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # 실행 슬롯이 빈 뒤에 모아야 predict 중에 쌓인 프레임이 한 배치로 묶인다
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # 클라이언트가 끊겨 취소된 요청은 제외
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._predict(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _predict(self, batch):
+        try:
+            frames = [item[0] for item in batch]
+            now = time.perf_counter()
+            self.total_queue_wait += sum(now - item[2] for item in batch)
+
+            try:
+                t0 = time.perf_counter()
+                results = await asyncio.to_thread(self.predict_fn, frames)
+                self.total_predict_seconds += time.perf_counter() - t0
+                if len(results) != len(frames):
+                    raise RuntimeError(f"predict returned {len(results)} results for {len(frames)} frames")
+            except Exception as e:
+                self.total_errors += 1
+                print("[ERROR] batch predict:", e)
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+
+            size = len(frames)
+            self.total_frames += size
+            self.total_batches += 1
+            self.last_batch_size = size
+            self.batch_size_counts[size] = self.batch_size_counts.get(size, 0) + 1
+
+            for (_, fut, _), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_inflight": self.max_inflight,
+            "inflight_batches": len(self._inflight),
+            "total_frames": self.total_frames,
+            "total_batches": self.total_batches,
+            "total_errors": self.total_errors,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": (self.total_frames / self.total_batches) if self.total_batches else 0.0,
+            "avg_queue_wait_ms": (self.total_queue_wait / self.total_frames * 1000.0) if self.total_frames else 0.0,
+            "avg_predict_ms": (self.total_predict_seconds / self.total_batches * 1000.0) if self.total_batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+        }
@@ -0,0 +1,374 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/camera_ingest.py
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+import cv2
+
+# RTSP는 UDP 패킷 손실로 프레임이 깨지기 쉬우므로 TCP 사용 (이미 설정돼 있으면 유지)
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "rtsp_transport;tcp")
+
+LIVE_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "rtp://", "udp://", "srt://")
+# API로 추가할 수 있는 카메라 URL scheme (그 밖의 FFmpeg 프로토콜/로컬 장치는 거부)
+API_SCHEMES = ("rtsp", "rtsps", "http", "https")
+
+
+def is_live_source(url):
+    """실시간 스트림인지 (아니면 파일/HTTP 영상으로 보고 원래 속도로 재생)"""
+    lowered = url.lower()
+    if lowered.startswith(LIVE_SCHEMES):
+        return True
+    # HTTP라도 확장자가 영상 파일이 아니면 라이브(MJPEG/HLS/MPEG-TS)로 본다
+    if lowered.startswith(("http://", "https://")):
+        path = lowered.split("?")[0]
+        return not path.endswith((".mp4", ".avi", ".mov", ".mkv", ".webm"))
+    return False
+
+
+def resolve_camera_source(url, file_dir=""):
+    """
+    API로 받은 카메라 source 중 허용하는 것만 돌려준다 (아니면 ValueError)
+    - rtsp(s):// / http(s):// URL
+    - file_dir 기준 상대 파일 이름 -> 실제 경로 (절대 경로, '..', 디렉터리 밖은 거부)
+    """
+    if "://" in url:
+        if urlparse(url).scheme.lower() not in API_SCHEMES:
+            raise ValueError("url must be rtsp://, rtsps://, http:// or https://")
+        return url
+
+    if not file_dir:
+        raise ValueError("File sources are disabled (CAMERA_FILE_DIR not set)")
+    if os.path.isabs(url) or ".." in url.replace("\\", "/").split("/"):
+        raise ValueError("url must be a file name relative to CAMERA_FILE_DIR")
+    root = os.path.realpath(file_dir)
+    path = os.path.realpath(os.path.join(root, url))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError("file not found in CAMERA_FILE_DIR")
+    return path
+
+
+def redact_url(url):
+    """SAS 토큰(query)과 URL 안의 계정 정보(user:pass@)는 노출하지 않는다"""
+    return re.sub(r"//[^/@]*@", "//***@", url.split("?")[0])
+
+
+# ---------------------------------------------------------
+# 카메라 한 대: 디코딩 스레드 + 재연결 + 프레임 예산
+# ---------------------------------------------------------
+class CameraSource:
+    """
+    OpenCV(FFmpeg)로 RTSP/HTTP/파일을 직접 읽는다.
+    - 라이브 소스는 계속 grab()해서 버퍼를 비우고, target_fps 예산에 맞는 프레임만 retrieve()
+    - 파일 소스는 원래 FPS 속도로 재생하고 끝나면 처음부터 반복 (loop_files)
+    - 열기/읽기 실패 시 full-jitter 지수 백오프로 재연결
+    - 디코딩된 프레임은 크기 제한 큐(queue_size)로 넘기고, 가득 차면 가장 오래된 프레임을 버린다
+    """
+
+    def __init__(self, cctv_id, url, loop, target_fps=5.0, queue_size=2, open_timeout=10.0,
+                 read_timeout=10.0, reconnect_base=1.0, reconnect_max=30.0, loop_files=True):
+        self.cctv_id = cctv_id
+        self.url = url
+        self.live = is_live_source(url)
+        self.target_fps = float(target_fps)
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.reconnect_base = reconnect_base
+        self.reconnect_max = reconnect_max
+        self.loop_files = loop_files
+
+        self._loop = loop
+        self.queue = asyncio.Queue(maxsize=max(1, int(queue_size)))
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.state = "idle"  # idle -> connecting -> streaming -> reconnecting -> stopped (| ended)
+        self.error = None
+        self.source_fps = None
+        self.connects = 0
+        self.reconnects = 0
+        self.frames_read = 0
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.last_frame_at = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"camera-{self.cctv_id}", daemon=True)
+            self._thread.start()
+
+    def request_stop(self):
+        """논블로킹 정지 요청 (디코딩 스레드는 현재 grab이 끝나면 종료)"""
+        self._stop.set()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.state = "stopped"
+
+    # ---- 디코딩 스레드 ----
+    def _open(self):
+        params = []
+        if hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+                      cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000)]
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG, params)
+        if not cap.isOpened():
+            cap.release()
+            raise RuntimeError("Failed to open camera source")
+        return cap
+
+    def _put(self, frame):
+        """(이벤트 루프에서 실행) 큐가 가득 차면 가장 오래된 프레임을 버린다"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+        self.queue.put_nowait((frame, time.time()))
+
+    def _stream(self, cap):
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.source_fps = fps if fps and 0 < fps < 240 else None
+        interval = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+        frame_period = 1.0 / (self.source_fps or 25.0)
+        next_emit = time.monotonic()
+        next_frame = time.monotonic()
+
+        while not self._stop.is_set():
+            if not self.live:
+                # 파일은 원래 재생 속도로
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame += frame_period
+
+            if not cap.grab():
+                if not self.live and self.loop_files and self.frames_read > 0:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if cap.grab():
+                        self.frames_read += 1
+                        continue
+                return "end of stream"
+            self.frames_read += 1
+            self.state = "streaming"
+
+            now = time.monotonic()
+            if now < next_emit:
+                continue
+            # 예산보다 늦게 도착한 경우 누적하지 않고 다음 슬롯부터 다시 센다
+            next_emit = max(next_emit + interval, now)
+            ok, frame = cap.retrieve()
+            if not ok or frame is None:
+                continue
+            self.frames_decoded += 1
+            self.last_frame_at = time.time()
+            try:
+                self._loop.call_soon_threadsafe(self._put, frame)
+            except RuntimeError:
+                return None  # 이벤트 루프 종료
+        return None
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            self.state = "connecting" if self.connects == 0 and self.reconnects == 0 else "reconnecting"
+            cap = None
+            try:
+                cap = self._open()
+                self.connects += 1
+                self.error = None
+                frames_before = self.frames_read
+                reason = self._stream(cap)
+                if reason:
+                    self.error = reason
+                    if not self.live and not self.loop_files:
+                        self.state = "ended"
+                        return
+                # 프레임이 들어왔으면 백오프 초기화
+                if self.frames_read > frames_before:
+                    attempt = 0
+            except Exception as e:
+                self.error = str(e)
+            finally:
+                if cap is not None:
+                    cap.release()
+
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            delay = random.uniform(0, min(self.reconnect_max, self.reconnect_base * (2 ** attempt)))
+            attempt += 1
+            print(f"[WARN] camera {self.cctv_id} disconnected ({self.error}), reconnecting in {delay:.1f}s")
+            self._stop.wait(delay)
+
+    def stats(self):
+        return {
+            "cctv_id": self.cctv_id,
+            "url": redact_url(self.url),
+            "live": self.live,
+            "state": self.state,
+            "error": self.error,
+            "target_fps": self.target_fps,
+            "source_fps": self.source_fps,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "frames_read": self.frames_read,
+            "frames_decoded": self.frames_decoded,
+            "frames_dropped": self.frames_dropped,
+            "queue_depth": self.queue.qsize(),
+            "last_frame_age": (time.time() - self.last_frame_at) if self.last_frame_at else None,
+        }
+
+
+# ---------------------------------------------------------
+# 카메라 목록 관리 + 분석 루프
+# ---------------------------------------------------------
+class CameraIngestManager:
+    """
+    cctv_id -> CameraSource. 카메라마다 소비 태스크가 큐에서 프레임을 꺼내
+    tracker.process_single_frame(draw=False)로 흘려보낸다 (브라우저 없이 서버에서 분석).
+    - scheduler(FrameScheduler)가 있으면 프레임을 스케줄러에 넘겨 카메라 간 공정하게 처리한다
+    - sync_urls: cctv 목록 JSON([{id, api_url}, ...])을 주는 URL들 (예: 백엔드 /api/cctvs/{member_id})
+      sync_interval초마다 다시 읽어 추가/변경/삭제를 반영한다
+      (삭제는 sync로 추가된 카메라에만 적용, 정적 설정/API로 추가한 카메라는 유지)
+    """
+
+    def __init__(self, tracker, target_fps=5.0, queue_size=2, reconnect_max=30.0,
+                 sync_urls=None, sync_interval=60.0, scheduler=None):
+        self.tracker = tracker
+        self.scheduler = scheduler
+        self.target_fps = target_fps
+        self.queue_size = queue_size
+        self.reconnect_max = reconnect_max
+        self.sync_urls = list(sync_urls or [])
+        self.sync_interval = sync_interval
+        self.cameras = {}
+        self._consumers = {}
+        self._sync_task = None
+        self._synced = set()
+        self.frames_processed = {}
+        self.errors = 0
+
+    def add(self, cctv_id, url, target_fps=None, synced=False):
+        """같은 cctv_id가 있으면 URL/FPS가 바뀐 경우에만 교체"""
+        current = self.cameras.get(cctv_id)
+        fps = float(target_fps or self.target_fps)
+        if current is not None and (current.url != url or current.target_fps != fps):
+            self.remove(cctv_id)  # remove()가 _synced에서 빼므로 표시는 교체 뒤에
+            current = None
+        if synced:
+            self._synced.add(cctv_id)
+        else:
+            self._synced.discard(cctv_id)
+        if current is not None:
+            return current
+
+        source = CameraSource(
+            cctv_id, url, asyncio.get_running_loop(),
+            target_fps=fps,
+            queue_size=self.queue_size,
+            reconnect_max=self.reconnect_max
+        )
+        self.cameras[cctv_id] = source
+        self.frames_processed.setdefault(cctv_id, 0)
+        if self.scheduler is not None:
+            self.scheduler.configure(cctv_id, target_fps=fps)
+        source.start()
+        self._consumers[cctv_id] = asyncio.create_task(self._consume(source))
+        print(f"[INFO] camera {cctv_id} added ({'live' if source.live else 'file'})")
+        return source
+
+    def remove(self, cctv_id):
+        self._synced.discard(cctv_id)
+        source = self.cameras.pop(cctv_id, None)
+        task = self._consumers.pop(cctv_id, None)
+        if task is not None:
+            task.cancel()
+        if source is not None:
+            source.request_stop()
+            if self.scheduler is not None:
+                self.scheduler.remove(cctv_id)
+        return source
+
+    def _on_scheduled(self, cctv_id, fut):
+        if fut.cancelled():
+            return
+        if fut.exception() is not None:
+            self.errors += 1
+            print(f"[ERROR] camera {cctv_id} frame:", fut.exception())
+        elif fut.result() is not None:
+            self.frames_processed[cctv_id] = self.frames_processed.get(cctv_id, 0) + 1
+
+    async def _consume(self, source):
+        while True:
+            frame, captured_at = await source.queue.get()
+            if self.scheduler is not None:
+                # 처리 완료를 기다리지 않고 넘긴다 (밀리면 스케줄러가 오래된 프레임부터 버림)
+                fut = self.scheduler.submit(source.cctv_id, frame, captured_at=captured_at, draw=False)
+                fut.add_done_callback(lambda f, cid=source.cctv_id: self._on_scheduled(cid, f))
+                continue
+            try:
+                await self.tracker.process_single_frame(frame, source.cctv_id, draw=False)
+                self.frames_processed[source.cctv_id] = self.frames_processed.get(source.cctv_id, 0) + 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print(f"[ERROR] camera {source.cctv_id} frame:", e)
+
+    async def sync(self):
+        """sync_urls의 cctv 목록과 실행 중인 카메라를 맞춘다 (api_url이 없는 cctv는 제외)"""
+        wanted = {}
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+            for url in self.sync_urls:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    for cctv in await response.json():
+                        if cctv.get("api_url"):
+                            wanted[int(cctv["id"])] = cctv["api_url"]
+        for cctv_id in [c for c in self._synced if c not in wanted]:
+            self.remove(cctv_id)
+        for cctv_id, url in wanted.items():
+            if cctv_id in self.cameras and cctv_id not in self._synced:
+                continue  # 직접 추가한 설정이 우선
+            self.add(cctv_id, url, synced=True)
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                print("[ERROR] camera sync:", e)
+            await asyncio.sleep(self.sync_interval)
+
+    async def start(self, sources=None):
+        """sources: {cctv_id: url} (정적 설정)"""
+        for cctv_id, url in (sources or {}).items():
+            self.add(int(cctv_id), url)
+        if self.sync_urls and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            self._sync_task = None
+        self._synced = set()
+        sources = [self.remove(cctv_id) for cctv_id in list(self.cameras)]
+        await asyncio.gather(*[asyncio.to_thread(s.stop) for s in sources if s is not None])
+
+    def stats(self):
+        return {
+            "cameras": [
+                {**source.stats(), "frames_processed": self.frames_processed.get(cctv_id, 0),
+                 "synced": cctv_id in self._synced}
+                for cctv_id, source in self.cameras.items()
+            ],
+            "errors": self.errors,
+            "sync_urls": len(self.sync_urls),
+        }
@@ -0,0 +1,173 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/classifiers.py
+
+import asyncio
+import time
+
+import cv2
+import numpy as np
+
+
+GENDER_TAGS = ['Male', 'Female']
+AGE_TAGS = ['Age18to60', 'AgeOver60', 'AgeLess18']
+
+
+def normalize_predictions(predictions: list):
+    """
+    예측값 중 성별(Male/Female), 연령(Age18to60 등)을
+    { 'Male':30, 'Female':70, 'Age18to60':80, ... } 형태로 정규화
+    predictions: [{ 'tagName': .., 'probability': 0~1 }, ...]
+    """
+    gender_preds = {
+        p['tagName']: p['probability'] * 100
+        for p in predictions if p['tagName'] in GENDER_TAGS
+    }
+    age_preds = {
+        p['tagName']: p['probability'] * 100
+        for p in predictions if p['tagName'] in AGE_TAGS
+    }
+
+    def normalize_group(group_preds):
+        total = sum(group_preds.values())
+        if total > 0:
+            return {k: (v / total) * 100 for k, v in group_preds.items()}
+        return group_preds
+
+    return {
+        **normalize_group(gender_preds),
+        **normalize_group(age_preds)
+    }
+
+
+# ---------------------------------------------------------
+# 성별/연령 분류기 인터페이스
+# ---------------------------------------------------------
+class AttributeClassifier:
+    """
+    classify_batch(items) -> items와 같은 순서의 정규화된 dict 리스트
+    items: [{ 'image': JPEG bytes, 'crop': BGR ndarray }, ...]
+    실패한 항목은 빈 dict
+    """
+    name = "base"
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def classify_batch(self, items):
+        raise NotImplementedError
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+# ---------------------------------------------------------
+# 로컬 CPU 분류기 (ONNX Runtime)
+# ---------------------------------------------------------
+class LocalOnnxClassifier(AttributeClassifier):
+    """
+    한 프레임의 crop들을 (N,3,H,W) 배치 하나로 묶어 ONNX Runtime으로 추론한다.
+    - 모델 출력(여러 개면 마지막 축으로 이어붙임)은 labels 순서의 logit으로 본다
+    - 성별/연령 그룹별로 softmax 후 normalize_predictions로 Azure와 같은 형태로 반환
+    """
+    name = "onnx"
+
+    def __init__(self, model_path, labels=None, input_size=224, num_threads=0,
+                 mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("onnxruntime is required for the local attribute classifier") from e
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = int(num_threads)
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.model_path = model_path
+        self.labels = labels or (GENDER_TAGS + ['AgeLess18', 'Age18to60', 'AgeOver60'])
+        self.input_size = int(input_size)
+        self.mean = np.array(mean, dtype=np.float32).reshape(1, 1, 3)
+        self.std = np.array(std, dtype=np.float32).reshape(1, 1, 3)
+
+        # metrics
+        self.batches = 0
+        self.images = 0
+        self.failures = 0
+        self.infer_seconds = 0.0
+
+    def _preprocess(self, crop_bgr):
+        img = cv2.resize(crop_bgr, (self.input_size, self.input_size), interpolation=cv2.INTER_LINEAR)
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+        img = (img - self.mean) / self.std
+        return img.transpose(2, 0, 1)
+
+    def _run(self, crops):
+        batch = np.stack([self._preprocess(c) for c in crops]).astype(np.float32)
+        outputs = self.session.run(None, {self.input_name: batch})
+        logits = np.concatenate([o.reshape(len(crops), -1) for o in outputs], axis=1)
+        return logits[:, :len(self.labels)]
+
+    @staticmethod
+    def _softmax(x):
+        e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+        return e / np.sum(e, axis=-1, keepdims=True)
+
+    def _to_predictions(self, row):
+        predictions = []
+        for group in (GENDER_TAGS, AGE_TAGS):
+            idx = [i for i, tag in enumerate(self.labels) if tag in group]
+            if not idx:
+                continue
+            probs = self._softmax(row[idx])
+            predictions += [
+                {"tagName": self.labels[i], "probability": float(p)}
+                for i, p in zip(idx, probs)
+            ]
+        return normalize_predictions(predictions)
+
+    async def classify_batch(self, items):
+        valid = [i for i, it in enumerate(items) if it.get("crop") is not None and it["crop"].size > 0]
+        results = [{} for _ in items]
+        if not valid:
+            return results
+
+        t0 = time.perf_counter()
+        try:
+            logits = await asyncio.to_thread(self._run, [items[i]["crop"] for i in valid])
+        except Exception as e:
+            print("[ERROR] onnx classify:", e)
+            self.failures += 1
+            return results
+        self.infer_seconds += time.perf_counter() - t0
+        self.batches += 1
+        self.images += len(valid)
+
+        for i, row in zip(valid, logits):
+            results[i] = self._to_predictions(row)
+        return results
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "model_path": self.model_path,
+            "batches": self.batches,
+            "images": self.images,
+            "failures": self.failures,
+            "avg_batch_ms": (self.infer_seconds / self.batches * 1000.0) if self.batches else 0.0,
+        }
+
+
+def create_classifier(backend, **kwargs):
+    """
+    backend: 'azure' (기본) | 'onnx'
+    kwargs는 각 구현의 생성자 인자
+    """
+    backend = (backend or "azure").lower()
+    if backend == "onnx":
+        return LocalOnnxClassifier(**kwargs)
+    if backend == "azure":
+        from .azure_api import AzureAPI
+        return AzureAPI(**kwargs)
+    raise ValueError(f"Unknown attribute classifier backend: {backend}")
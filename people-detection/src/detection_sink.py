@@ -0,0 +1,410 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/detection_sink.py
+
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+
+# ---------------------------------------------------------
+# 감지 결과 전송: 버퍼 + 배치 + 커넥션 풀 + 재시도
+# ---------------------------------------------------------
+class DetectionSink:
+    """
+    submit(item)은 큐에 넣고 바로 반환한다 (이벤트 루프를 막지 않음).
+    백그라운드 워커가 batch_size개 또는 flush_interval초마다 묶어서
+    bulk_url로 전송하고, 실패하면 jitter가 들어간 지수 백오프로 재시도한다.
+
+    item: {
+        'cctv_id', 'detected_time'(ISO), 'person_label', 'gender', 'age',
+        'image': JPEG bytes or None
+    }
+
+    bulk 요청 형식 (multipart/form-data):
+      - items: JSON 배열 (각 항목에 image가 있으면 'image_part': 'image_{i}')
+      - image_{i}: JPEG 파일 파트
+    bulk 응답의 ids(요청 순서, 거부된 항목은 null)로 항목별 결과를 정한다 (거부된 항목은 rejected).
+    bulk 엔드포인트가 없으면(404/405) 항목별 POST(url)로 전환한다.
+
+    spool(DetectionSpool)이 있으면 메모리 큐 대신 디스크에 먼저 기록하고,
+    드레이너가 스풀에서 배치를 꺼내 한 번씩만 보낸다 (재시도는 스풀의 백오프로, 재시작해도 유지).
+    - breaker(CircuitBreaker): 백엔드가 연속으로 실패하면 reset_timeout 동안 스풀을 꺼내지 않음
+    - classify_fn: 'classify'가 표시된 항목(분류기 장애로 라벨이 없는 항목)을 전송 전에 다시 분류
+      async (images) -> [(gender, age) 또는 None, ...]. max_classify_attempts번 실패하면 Unknown으로 전송
+    """
+
+    def __init__(self, url, bulk_url=None, batch_size=50, flush_interval=1.0,
+                 max_concurrency=4, max_retries=5, backoff_base=0.5, backoff_max=30.0,
+                 queue_size=10000, timeout=10.0, metrics=None, spool=None, breaker=None,
+                 classify_fn=None, max_classify_attempts=5, lease_seconds=120.0):
+        self.url = url
+        self.bulk_url = bulk_url
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.metrics = metrics
+        self.spool = spool
+        self.breaker = breaker
+        self.classify_fn = classify_fn
+        self.max_classify_attempts = max_classify_attempts
+        self.lease_seconds = lease_seconds
+
+        self.session = None
+        self._queue = None
+        self._worker = None
+        self._semaphore = None
+        self._inflight = set()
+        self._collecting = []
+
+        # metrics
+        self.submitted = 0
+        self.delivered = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.retries = 0
+        self.batches = 0
+        self.reclassified = 0
+
+    async def start(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency * 2, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._worker = asyncio.create_task(self._drain() if self.spool is not None else self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        if self.spool is not None:
+            # 보내지 못한 항목은 스풀에 남아 다음 실행 때 전송
+            if self._inflight:
+                await asyncio.gather(*self._inflight, return_exceptions=True)
+            await asyncio.to_thread(self.spool.close)
+            if self.session:
+                await self.session.close()
+                self.session = None
+            return
+
+        # 남은 항목은 마지막으로 한 번 전송
+        remaining, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for i in range(0, len(remaining), self.batch_size):
+            self._spawn(remaining[i:i + self.batch_size])
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def submit(self, item):
+        """논블로킹. 큐가 가득 차면 가장 오래된 항목을 버린다."""
+        if not self.url and not self.bulk_url:
+            return
+        if self.spool is not None:
+            self.spool.append(item)
+            self.submitted += 1
+            return
+        if self._queue is None:
+            raise RuntimeError("DetectionSink is not started")
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+        self.submitted += 1
+
+    async def _run(self):
+        while True:
+            # 모으는 중인 배치는 stop()에서도 보낼 수 있도록 보관
+            self._collecting = batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._semaphore.acquire()
+            self._collecting = []
+            self._spawn(batch, acquired=True)
+
+    def _spawn(self, batch, acquired=False):
+        task = asyncio.create_task(self._deliver(batch, acquired))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, batch, acquired):
+        if not acquired:
+            await self._semaphore.acquire()
+        t0 = time.perf_counter()
+        try:
+            self.batches += 1
+            if self.bulk_url:
+                outcomes = await self._with_retries(self._attempt_bulk, batch)
+                if outcomes[0] != "missing":
+                    self._account(outcomes)
+                    return
+                # bulk 엔드포인트 없음 -> 항목별 전송으로 전환
+                print("[WARN] bulk endpoint unavailable, falling back to per-item upload")
+                self.bulk_url = None
+            results = await asyncio.gather(*[self._with_retries(self._attempt_single, item) for item in batch])
+            self._account([outcome for outcomes in results for outcome in outcomes])
+        finally:
+            self._semaphore.release()
+            if self.metrics is not None:
+                self.metrics.observe("backend_upload", None, time.perf_counter() - t0)
+
+    def _account(self, outcomes):
+        for outcome in outcomes:
+            if outcome == "ok":
+                self.delivered += 1
+            elif outcome == "rejected":
+                self.rejected += 1
+            else:
+                self.failed += 1
+
+    def _backoff(self, attempt):
+        """full-jitter 지수 백오프(초)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _attempt(self, fn, payload):
+        """
+        한 번 전송. returns: (outcome, 응답 본문)
+        'ok': 성공, 'missing': bulk 엔드포인트 없음(404/405), 'rejected': 다른 4xx (재시도해도 실패),
+        'retry': 5xx/429/네트워크 오류
+        """
+        try:
+            status, text = await fn(payload)
+            if status in (200, 201):
+                return "ok", text
+            if status in (404, 405) and fn == self._post_bulk:
+                return "missing", text
+            if status != 429 and status < 500:
+                print("[WARN] Upload failed:", status, text[:200])
+                return "rejected", text
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print("[ERROR] send_data_to_backend:", e)
+        return "retry", ""
+
+    async def _attempt_single(self, item):
+        outcome, _ = await self._attempt(self._post_single, item)
+        return [outcome]
+
+    async def _attempt_bulk(self, batch):
+        """bulk 한 번 전송 -> 항목별 outcome 목록 (요청 자체가 실패하면 모두 같은 outcome)"""
+        outcome, text = await self._attempt(self._post_bulk, batch)
+        if outcome != "ok":
+            return [outcome] * len(batch)
+        return self._bulk_item_outcomes(text, len(batch))
+
+    @staticmethod
+    def _bulk_item_outcomes(text, n):
+        """200/201 bulk 응답의 ids로 항목별 결과 (null = 백엔드가 거부한 항목)"""
+        try:
+            body = json.loads(text)
+            ids = body.get("ids")
+        except (ValueError, AttributeError):
+            ids = None
+        if not isinstance(ids, list) or len(ids) != n:
+            return ["ok"] * n  # 항목별 결과가 없는 응답은 전체 성공으로 본다
+        outcomes = ["ok" if row_id is not None else "rejected" for row_id in ids]
+        rejected = outcomes.count("rejected")
+        if rejected:
+            print(f"[WARN] bulk upload: {rejected}/{n} items rejected:", (body.get("errors") or [])[:5])
+        return outcomes
+
+    async def _with_retries(self, attempt_fn, payload):
+        """
+        attempt_fn(payload) -> 항목별 outcome 목록 ('missing'이면 엔드포인트 없음)
+        요청이 5xx/429/네트워크 오류('retry')면 full-jitter 지수 백오프로 다시 보낸다
+        """
+        for attempt in range(self.max_retries + 1):
+            outcomes = await attempt_fn(payload)
+            if "retry" not in outcomes or attempt == self.max_retries:
+                return outcomes
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+    # ---- 스풀 드레이너 ----
+    async def _drain(self):
+        while True:
+            if self.breaker is not None and not self.breaker.allow():
+                await asyncio.sleep(max(self.flush_interval, min(self.breaker.retry_after(), 5.0)))
+                continue
+            await self._semaphore.acquire()
+            try:
+                leased = await asyncio.to_thread(self.spool.lease, self.batch_size, self.lease_seconds)
+            except Exception:
+                self._semaphore.release()
+                raise
+            if not leased:
+                self._semaphore.release()
+                if self.breaker is not None and self.breaker.state == "half_open":
+                    self.breaker.record_success()  # 시험할 항목이 없으면 닫힌 상태로
+                await asyncio.sleep(self.flush_interval)
+                continue
+            task = asyncio.create_task(self._deliver_spooled(leased))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            if len(leased) < self.batch_size:
+                # 배치가 덜 찼으면 flush_interval 동안 더 모이게 둔다
+                await asyncio.sleep(self.flush_interval)
+
+    async def _reclassify(self, leased):
+        """'classify' 표시 항목을 다시 분류. returns: 이번에는 보내지 않고 미룰 항목 id 목록"""
+        targets = [(row_id, attempts, item) for row_id, attempts, item in leased
+                   if item.get("classify") and item.get("image")]
+        if not targets or self.classify_fn is None:
+            return []
+        try:
+            labels = await self.classify_fn([item["image"] for _, _, item in targets])
+        except Exception as e:
+            print("[ERROR] spool reclassify:", e)
+            labels = [None] * len(targets)
+
+        deferred = []
+        for (row_id, attempts, item), label in zip(targets, labels):
+            if label is not None:
+                item["gender"], item["age"] = label
+                item.pop("classify", None)
+                self.reclassified += 1
+                await asyncio.to_thread(self.spool.update, row_id, item)
+            elif attempts + 1 < self.max_classify_attempts:
+                deferred.append(row_id)
+            else:
+                item.pop("classify", None)  # 포기하고 Unknown으로 전송
+        return deferred
+
+    async def _deliver_spooled(self, leased):
+        t0 = time.perf_counter()
+        try:
+            deferred = await self._reclassify(leased)
+            if deferred:
+                attempts = {row_id: a for row_id, a, _ in leased}
+                for row_id in deferred:
+                    await asyncio.to_thread(self.spool.nack, [row_id], self._backoff(attempts[row_id]))
+                deferred = set(deferred)
+                leased = [row for row in leased if row[0] not in deferred]
+            if not leased:
+                return
+
+            self.batches += 1
+            ids = [row_id for row_id, _, _ in leased]
+            items = [item for _, _, item in leased]
+            if self.bulk_url:
+                outcomes = await self._attempt_bulk(items)
+                if outcomes[0] != "missing":
+                    await self._settle(leased, outcomes)
+                    return
+                print("[WARN] bulk endpoint unavailable, falling back to per-item upload")
+                self.bulk_url = None
+            results = await asyncio.gather(*[self._attempt_single(item) for item in items])
+            await self._settle(leased, [outcome for outcomes in results for outcome in outcomes])
+        finally:
+            if self.breaker is not None:
+                self.breaker.release_trial()
+            self._semaphore.release()
+            if self.metrics is not None:
+                self.metrics.observe("backend_upload", None, time.perf_counter() - t0)
+
+    async def _settle(self, leased, outcomes):
+        """전송 결과를 스풀/브레이커에 반영 (rejected는 재시도해도 소용없으므로 삭제)"""
+        done, retry = [], []
+        for (row_id, attempts, _), outcome in zip(leased, outcomes):
+            if outcome == "retry":
+                retry.append((row_id, attempts))
+            else:
+                done.append(row_id)
+                self._account([outcome])
+        await asyncio.to_thread(self.spool.ack, done)
+        for row_id, attempts in retry:
+            self.retries += 1
+            await asyncio.to_thread(self.spool.nack, [row_id], self._backoff(attempts))
+        if self.breaker is not None:
+            if retry and not any(o == "ok" for o in outcomes):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+    @staticmethod
+    def _form_fields(item):
+        return {
+            "cctv_id": str(item["cctv_id"]),
+            "detected_time": item["detected_time"],
+            "person_label": str(item.get("person_label", "")),
+            "gender": item.get("gender") or "Unknown",
+            "age": item.get("age") or "Unknown",
+        }
+
+    async def _post_single(self, item):
+        form = aiohttp.FormData()
+        for k, v in self._form_fields(item).items():
+            form.add_field(k, v)
+        if item.get("image"):
+            form.add_field(
+                "image_file", item["image"],
+                filename=f"cctv_{item['cctv_id']}_{item.get('person_label', '')}.jpg",
+                content_type="image/jpeg"
+            )
+        async with self.session.post(self.url, data=form) as response:
+            return response.status, await response.text()
+
+    async def _post_bulk(self, batch):
+        form = aiohttp.FormData()
+        items = []
+        for i, item in enumerate(batch):
+            fields = self._form_fields(item)
+            if item.get("image"):
+                fields["image_part"] = f"image_{i}"
+                form.add_field(
+                    f"image_{i}", item["image"],
+                    filename=f"image_{i}.jpg",
+                    content_type="image/jpeg"
+                )
+            items.append(fields)
+        form.add_field("items", json.dumps(items), content_type="application/json")
+        async with self.session.post(self.bulk_url, data=form) as response:
+            return response.status, await response.text()
+
+    def stats(self):
+        if self.spool is not None:
+            queue_depth = self.spool.pending
+        else:
+            queue_depth = self._queue.qsize() if self._queue is not None else 0
+        return {
+            "queue_depth": queue_depth,
+            "inflight_batches": len(self._inflight),
+            "bulk_enabled": bool(self.bulk_url),
+            "submitted": self.submitted,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "batches": self.batches,
+            "reclassified": self.reclassified,
+            "spool": self.spool.stats() if self.spool is not None else None,
+            "breaker": self.breaker.stats() if self.breaker is not None else None,
+        }
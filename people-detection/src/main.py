@@ -1,95 +1,159 @@
 # /home/azureuser/FootTrafficReport/people-detection/src/main.py
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import Response
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, WebSocket, WebSocketDisconnect
+from fastapi import Request, Depends, Header
+from fastapi.responses import Response, JSONResponse, PlainTextResponse
 from typing import Optional
 from datetime import datetime
 import os
 import cv2
-import torch
 import random
 import numpy as np
 import asyncio
+import json
+import time
+import hmac
 
-from ultralytics import YOLO
-from dotenv import load_dotenv
-import aiohttp
-import requests
+from .classifiers import create_classifier
+from .model_registry import ModelRegistry, to_detections
+from .batcher import InferenceBatcher
+from .tracking import TrackerPool
+from .attribute_cache import AttributeCache
+from .detection_sink import DetectionSink
+from .spool import DetectionSpool, CircuitBreaker
+from .motion_gate import MotionGate
+from .video_job import VideoJobManager, resolve_video_source
+from .metrics import StageTimer, request_timings
+from .worker_pool import InferenceWorkerPool
+from .anonymizer import FaceAnonymizer, estimate_face_areas
+from .quality_gate import CropQualityGate
+from .camera_ingest import CameraIngestManager, resolve_camera_source
+from .scheduler import FrameScheduler
 
 app = FastAPI()
 
+# 기본 포즈 모델 (워커당 한 번만 로드)
+POSE_MODEL_NAME = "pose"
+POSE_MODEL_PATH = os.getenv("YOLO_MODEL_PATH", "FootTrafficReport/people-detection/model/yolo11n-pose.pt")
+WARMUP_RUNS = int(os.getenv("YOLO_WARMUP_RUNS", "2"))
+# 재로드 시 model_path는 이 디렉터리 안의 상대 경로만 허용
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.dirname(POSE_MODEL_PATH))
+MODEL_EXTENSIONS = (".pt", ".onnx")
 
-# ---------------------------------------------------------
-# (A) Azure Custom Vision API 클래스
-# ---------------------------------------------------------
-class AzureAPI:
-    def __init__(self):
-        load_dotenv()  # .env 파일 로드 (AZURE_API_URL, AZURE_PREDICTION_KEY)
-        self.url = os.getenv("AZURE_API_URL")
-        self.headers = {
-            "Prediction-Key": os.getenv("AZURE_PREDICTION_KEY"),
-            "Content-Type": "application/octet-stream"
-        }
-        self.session = None
+# 관리용 API (모델 재로드 등) 토큰: "Authorization: Bearer <ADMIN_TOKEN>". 비어 있으면 관리 API 비활성
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-    async def start(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+# 멀티 프로세스 추론 (0이면 API 프로세스 안에서 추론)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "0"))  # 0: 코어 수 / 워커 수
+INFERENCE_SHM_SLOT_BYTES = int(os.getenv("INFERENCE_SHM_SLOT_BYTES", str(1920 * 1080 * 3)))
+INFERENCE_TASK_TIMEOUT = float(os.getenv("INFERENCE_TASK_TIMEOUT", "30"))
 
-    async def close(self):
-        if self.session:
-            await self.session.close()
+# 마이크로 배칭 (동시 요청 프레임을 모아서 한 번에 predict)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
 
-    async def analyze_image(self, image_path: str):
-        """
-        로컬 이미지 파일을 Azure Custom Vision으로 전송해
-        성별(Male/Female), 연령(Age18to60 등) 확률을 얻는다.
-        """
-        if not self.url:
-            # API URL이 없으면 빈 dict 반환
-            return {}
+# 다중 객체 추적 (cctv_id별 track_id 유지)
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))
+TRACK_MIN_HITS = int(os.getenv("TRACK_MIN_HITS", "3"))
+TRACK_MAX_IDLE_SECONDS = float(os.getenv("TRACK_MAX_IDLE_SECONDS", "2.0"))
 
-        if not self.session:
-            await self.start()
+# track별 성별/연령 캐시 (track당 최대 N번만 분류)
+ATTR_MAX_SAMPLES = int(os.getenv("ATTR_MAX_SAMPLES", "3"))
+ATTR_SETTLE_SECONDS = float(os.getenv("ATTR_SETTLE_SECONDS", "3.0"))
+ATTR_CACHE_TTL_SECONDS = float(os.getenv("ATTR_CACHE_TTL_SECONDS", "600"))
+ATTR_CACHE_MAX_ENTRIES = int(os.getenv("ATTR_CACHE_MAX_ENTRIES", "5000"))
+# 프레임 처리와 분리된 분류 작업 최대 개수 (가득 차면 이번 프레임 crop은 샘플링하지 않음)
+CLASSIFY_MAX_INFLIGHT = int(os.getenv("CLASSIFY_MAX_INFLIGHT", "16"))
 
-        if not os.path.exists(image_path):
-            return {}
+# crop 품질 게이트 (너무 작거나/가려졌거나/흐린 crop은 분류·업로드 안 함)
+QUALITY_GATE_ENABLED = os.getenv("QUALITY_GATE_ENABLED", "1") == "1"
+QUALITY_MIN_WIDTH = int(os.getenv("QUALITY_MIN_WIDTH", "24"))
+QUALITY_MIN_HEIGHT = int(os.getenv("QUALITY_MIN_HEIGHT", "48"))
+QUALITY_MIN_ASPECT = float(os.getenv("QUALITY_MIN_ASPECT", "1.0"))  # 세로/가로
+QUALITY_MAX_ASPECT = float(os.getenv("QUALITY_MAX_ASPECT", "5.0"))
+QUALITY_MIN_KEYPOINTS = int(os.getenv("QUALITY_MIN_KEYPOINTS", "5"))  # conf > 0.3 인 keypoint 수
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "15"))  # Laplacian 분산
 
-        # 이미지 읽어서 POST
-        with open(image_path, "rb") as f:
-            image_data = f.read()
+# crop JPEG 품질 (메모리에서 한 번만 인코딩해 분류/업로드에 공유)
+CROP_JPEG_QUALITY = int(os.getenv("CROP_JPEG_QUALITY", "90"))
 
-        async with self.session.post(self.url, headers=self.headers, data=image_data) as response:
-            if response.status != 200:
-                return {}
-            result = await response.json()
+# 얼굴 익명화: blur (축소 해상도 blur) | pixelate (블록 모자이크) | gaussian (원본 해상도 45x45)
+FACE_ANONYMIZER = os.getenv("FACE_ANONYMIZER", "blur")
+FACE_BLUR_KERNEL = int(os.getenv("FACE_BLUR_KERNEL", "45"))
+FACE_BLUR_DOWNSCALE = int(os.getenv("FACE_BLUR_DOWNSCALE", "4"))
+FACE_PIXEL_SIZE = int(os.getenv("FACE_PIXEL_SIZE", "12"))
+FACE_PIXEL_MAX_BLOCKS = int(os.getenv("FACE_PIXEL_MAX_BLOCKS", "8"))
 
-        return self.normalize_predictions(result.get('predictions', []))
+# 백엔드 전송 (버퍼링 후 bulk 전송, 커넥션 풀 재사용)
+SINK_BATCH_SIZE = int(os.getenv("SINK_BATCH_SIZE", "50"))
+SINK_FLUSH_INTERVAL = float(os.getenv("SINK_FLUSH_INTERVAL", "1.0"))
+SINK_MAX_CONCURRENCY = int(os.getenv("SINK_MAX_CONCURRENCY", "4"))
+SINK_MAX_RETRIES = int(os.getenv("SINK_MAX_RETRIES", "5"))
 
-    def normalize_predictions(self, predictions: list):
-        """
-        Azure 예측값 중 성별(Male/Female), 연령(Age18to60 등)을
-        { 'Male':30, 'Female':70, 'Age18to60':80, ... } 형태로 정규화
-        """
-        gender_preds = {
-            p['tagName']: p['probability'] * 100
-            for p in predictions if p['tagName'] in ['Male', 'Female']
-        }
-        age_preds = {
-            p['tagName']: p['probability'] * 100
-            for p in predictions if p['tagName'] in ['Age18to60', 'AgeOver60', 'AgeLess18']
-        }
+# 디스크 스풀 (전송 전에 SQLite에 기록 -> 백엔드/분류기가 느리거나 죽어도 유실 없이 나중에 재전송)
+SPOOL_ENABLED = os.getenv("SPOOL_ENABLED", "1") == "1"
+SPOOL_PATH = os.getenv("SPOOL_PATH", "spool/detections.db")
+SPOOL_MAX_MB = float(os.getenv("SPOOL_MAX_MB", "1024"))  # 넘으면 가장 오래된 항목부터 버림
+SPOOL_CLASSIFY_ATTEMPTS = int(os.getenv("SPOOL_CLASSIFY_ATTEMPTS", "5"))  # 재분류 시도 후 Unknown으로 전송
+BACKEND_BREAKER_THRESHOLD = int(os.getenv("BACKEND_BREAKER_THRESHOLD", "5"))  # 연속 실패 횟수
+BACKEND_BREAKER_RESET = float(os.getenv("BACKEND_BREAKER_RESET", "30"))  # 초
 
-        def normalize_group(group_preds):
-            total = sum(group_preds.values())
-            if total > 0:
-                return {k: (v / total) * 100 for k, v in group_preds.items()}
-            return group_preds
+# 모션 게이트 (정지 화면이면 YOLO 생략)
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "1") == "1"
+MOTION_SENSITIVITY = float(os.getenv("MOTION_SENSITIVITY", "0.005"))  # 변화 픽셀 비율
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+MOTION_DOWNSCALE_WIDTH = int(os.getenv("MOTION_DOWNSCALE_WIDTH", "160"))
+MOTION_REFRESH_EVERY = int(os.getenv("MOTION_REFRESH_EVERY", "30"))  # N 프레임마다 강제 추론
 
-        return {
-            **normalize_group(gender_preds),
-            **normalize_group(age_preds)
-        }
+# 서버 측 영상 파일 분석
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "2"))
+VIDEO_MAX_JOBS = int(os.getenv("VIDEO_MAX_JOBS", "1"))
+# 작업 source 허용 범위: 이 스토리지 계정/컨테이너의 Blob URL 또는 VIDEO_UPLOAD_DIR 안의 파일 (둘 다 비어 있으면 불가)
+VIDEO_BLOB_ACCOUNT = os.getenv("VIDEO_BLOB_ACCOUNT", "")
+VIDEO_BLOB_CONTAINER = os.getenv("VIDEO_BLOB_CONTAINER", "foottraffic-images")
+VIDEO_UPLOAD_DIR = os.getenv("VIDEO_UPLOAD_DIR", "")
+
+# 카메라 직접 수집 (RTSP/HTTP/파일을 서버에서 바로 디코딩)
+CAMERA_SOURCES = os.getenv("CAMERA_SOURCES", "")  # JSON: {"1": "rtsp://...", ...}
+CAMERA_SYNC_URLS = [u.strip() for u in os.getenv("CAMERA_SYNC_URLS", "").split(",") if u.strip()]
+CAMERA_SYNC_INTERVAL = float(os.getenv("CAMERA_SYNC_INTERVAL", "60"))
+CAMERA_TARGET_FPS = float(os.getenv("CAMERA_TARGET_FPS", "5"))
+CAMERA_QUEUE_SIZE = int(os.getenv("CAMERA_QUEUE_SIZE", "2"))
+# POST /cameras 로 파일 source를 줄 때 허용하는 디렉터리 (비어 있으면 rtsp/http(s) URL만)
+CAMERA_FILE_DIR = os.getenv("CAMERA_FILE_DIR", "")
+CAMERA_RECONNECT_MAX = float(os.getenv("CAMERA_RECONNECT_MAX", "30"))
+
+# 멀티 카메라 프레임 스케줄러 (cctv_id별 큐 + round robin/weight + 카메라별 FPS 예산)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", str(BATCH_MAX_SIZE * max(1, INFERENCE_WORKERS))))
+SCHEDULER_POLICY = os.getenv("SCHEDULER_POLICY", "round_robin")  # round_robin | weighted
+SCHEDULER_DEFAULT_FPS = float(os.getenv("SCHEDULER_DEFAULT_FPS", "0"))  # 0이면 FPS 예산 없음 (브라우저 스트림)
+SCHEDULER_QUEUE_SIZE = int(os.getenv("SCHEDULER_QUEUE_SIZE", "2"))  # 카메라별 대기 프레임 수
+SCHEDULER_MAX_LAG = float(os.getenv("SCHEDULER_MAX_LAG", "2"))  # 초, 이보다 오래 기다린 프레임은 버림
+SCHEDULER_CAMERA_FPS = os.getenv("SCHEDULER_CAMERA_FPS", "")  # JSON: {"1": 10, ...}
+SCHEDULER_CAMERA_WEIGHTS = os.getenv("SCHEDULER_CAMERA_WEIGHTS", "")  # JSON: {"1": 2, ...}
+
+# stage별 지연시간 지표 (/metrics) + 응답별 Server-Timing 헤더
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# 히스토그램에 따로 라벨을 붙일 최대 cctv_id 수 (나머지는 cctv_id="other")
+METRICS_MAX_CAMERAS = int(os.getenv("METRICS_MAX_CAMERAS", "64"))
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "0") == "1"
+
+# Azure Custom Vision 클라이언트 (앱 수명 동안 하나의 세션 공유)
+AZURE_MAX_CONCURRENCY = int(os.getenv("AZURE_MAX_CONCURRENCY", "8"))
+AZURE_RATE_LIMIT = float(os.getenv("AZURE_RATE_LIMIT", "10"))  # 초당 요청 수 (S0 티어 기준)
+AZURE_RATE_BURST = int(os.getenv("AZURE_RATE_BURST", "10"))
+AZURE_TIMEOUT_SECONDS = float(os.getenv("AZURE_TIMEOUT_SECONDS", "5"))
+AZURE_BREAKER_THRESHOLD = int(os.getenv("AZURE_BREAKER_THRESHOLD", "5"))  # 연속 실패 횟수
+AZURE_BREAKER_RESET = float(os.getenv("AZURE_BREAKER_RESET", "30"))  # 초
+
+# 성별/연령 분류기 선택: azure (Custom Vision) | onnx (로컬 CPU)
+ATTR_CLASSIFIER = os.getenv("ATTR_CLASSIFIER", "azure")
+ONNX_ATTR_MODEL_PATH = os.getenv("ONNX_ATTR_MODEL_PATH", "FootTrafficReport/people-detection/model/attributes.onnx")
+ONNX_ATTR_LABELS = os.getenv("ONNX_ATTR_LABELS", "Male,Female,AgeLess18,Age18to60,AgeOver60")
+ONNX_ATTR_INPUT_SIZE = int(os.getenv("ONNX_ATTR_INPUT_SIZE", "224"))
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))
 
 
 # ---------------------------------------------------------
@@ -98,21 +162,117 @@ class AzureAPI:
 class PersonTracker:
     def __init__(
         self,
-        model_path="FootTrafficReport/people-detection/model/yolo11n-pose.pt",
+        registry,
+        model_name=POSE_MODEL_NAME,
         conf=0.5,
         iou=0.5,
-        device=None
+        device=None,
+        metrics=None
     ):
-        self.device = device if device else ('cuda:0' if torch.cuda.is_available() else 'cpu')
-        self.model = YOLO(model_path)
+        # 모델은 레지스트리가 소유 (요청마다 YOLO()를 새로 만들지 않음)
+        self.registry = registry
+        # stage별 지연시간 (기본: 비활성)
+        self.metrics = metrics if metrics is not None else StageTimer(enabled=False)
+        self.model_name = model_name
+        self.device = device if device else registry.device
         self.conf = conf
         self.iou = iou
 
+        # INFERENCE_WORKERS > 0이면 워커 프로세스들이 각자 YOLO를 들고 추론 (공유 메모리로 프레임 전달)
+        self.inference_pool = None
+        if INFERENCE_WORKERS > 0:
+            self.inference_pool = InferenceWorkerPool(
+                registry.status()[model_name]["path"],
+                workers=INFERENCE_WORKERS,
+                threads_per_worker=INFERENCE_WORKER_THREADS or None,
+                device=self.device,
+                conf=conf,
+                iou=iou,
+                slots_per_worker=BATCH_MAX_SIZE * 2,
+                slot_bytes=INFERENCE_SHM_SLOT_BYTES,
+                warmup_runs=WARMUP_RUNS,
+                task_timeout=INFERENCE_TASK_TIMEOUT
+            )
+
+        # 동시 요청 프레임을 배치로 묶어 predict (워커 풀이면 워커 수만큼 배치를 동시에 보냄)
+        self.batcher = InferenceBatcher(
+            self.inference_pool.predict_batch if self.inference_pool else self._predict_batch,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            max_inflight=self.inference_pool.workers if self.inference_pool else 1
+        )
+
+        # cctv_id별 추적 상태 (프레임 간 같은 사람 = 같은 track_id)
+        self.trackers = TrackerPool(
+            iou_threshold=TRACK_IOU_THRESHOLD,
+            min_hits=TRACK_MIN_HITS,
+            max_idle_seconds=TRACK_MAX_IDLE_SECONDS
+        )
+
+        # cctv_id별 모션 게이트
+        self.motion_gate = MotionGate(
+            sensitivity=MOTION_SENSITIVITY,
+            pixel_threshold=MOTION_PIXEL_THRESHOLD,
+            downscale_width=MOTION_DOWNSCALE_WIDTH,
+            refresh_every=MOTION_REFRESH_EVERY,
+            enabled=MOTION_GATE_ENABLED
+        )
+
+        # track별 분류 결과 캐시 (best-quality crop으로 몇 번만 분류 후 평균)
+        self.attribute_cache = AttributeCache(
+            max_samples=ATTR_MAX_SAMPLES,
+            settle_seconds=ATTR_SETTLE_SECONDS,
+            ttl_seconds=ATTR_CACHE_TTL_SECONDS,
+            max_entries=ATTR_CACHE_MAX_ENTRIES
+        )
+
+        # 분류 전 crop 품질 검사
+        self.quality_gate = CropQualityGate(
+            min_width=QUALITY_MIN_WIDTH,
+            min_height=QUALITY_MIN_HEIGHT,
+            min_aspect=QUALITY_MIN_ASPECT,
+            max_aspect=QUALITY_MAX_ASPECT,
+            min_visible_keypoints=QUALITY_MIN_KEYPOINTS,
+            min_sharpness=QUALITY_MIN_SHARPNESS,
+            enabled=QUALITY_GATE_ENABLED
+        )
+
+        # 얼굴 익명화 (프레임의 모든 얼굴 영역을 한 번에 처리)
+        self.anonymizer = FaceAnonymizer(
+            mode=FACE_ANONYMIZER,
+            kernel=FACE_BLUR_KERNEL,
+            downscale=FACE_BLUR_DOWNSCALE,
+            pixel_size=FACE_PIXEL_SIZE,
+            max_blocks=FACE_PIXEL_MAX_BLOCKS
+        )
+
         self.color_map = {}
-        self.azure_api = AzureAPI()
+        self.classifier = self.build_classifier()
+        # 프레임 경로에서 기다리지 않는 분류 작업 (참조를 잡아 두어야 GC되지 않는다)
+        self.classify_tasks = set()
+        self.classify_skipped = 0
 
         # 백엔드 API URL(예: .env에서 BACKEND_URL 설정, 없으면 아래 디폴트)
         self.backend_url = os.getenv("BACKEND_URL", "https://msteam5iseeu.ddns.net/api/cctv_data")
+        # bulk 엔드포인트 (기본값: BACKEND_URL + /bulk)
+        self.backend_bulk_url = os.getenv(
+            "BACKEND_BULK_URL",
+            f"{self.backend_url.rstrip('/')}/bulk" if self.backend_url else ""
+        )
+        self.sink = DetectionSink(
+            self.backend_url,
+            bulk_url=self.backend_bulk_url or None,
+            batch_size=SINK_BATCH_SIZE,
+            flush_interval=SINK_FLUSH_INTERVAL,
+            max_concurrency=SINK_MAX_CONCURRENCY,
+            max_retries=SINK_MAX_RETRIES,
+            metrics=self.metrics,
+            spool=DetectionSpool(SPOOL_PATH, max_bytes=int(SPOOL_MAX_MB * 1024 * 1024))
+            if SPOOL_ENABLED and self.backend_url else None,
+            breaker=CircuitBreaker(BACKEND_BREAKER_THRESHOLD, BACKEND_BREAKER_RESET),
+            classify_fn=self.reclassify,
+            max_classify_attempts=SPOOL_CLASSIFY_ATTEMPTS
+        )
 
         # [Optional] COCO 포맷 키포인트 연결 (스켈레톤)
         self.SKELETON = [
@@ -126,7 +286,29 @@ class PersonTracker:
             (12, 14), (14, 16)
         ]
 
+    @staticmethod
+    def build_classifier():
+        if ATTR_CLASSIFIER.lower() == "onnx":
+            return create_classifier(
+                "onnx",
+                model_path=ONNX_ATTR_MODEL_PATH,
+                labels=[t.strip() for t in ONNX_ATTR_LABELS.split(",") if t.strip()],
+                input_size=ONNX_ATTR_INPUT_SIZE,
+                num_threads=ONNX_NUM_THREADS
+            )
+        return create_classifier(
+            "azure",
+            max_concurrency=AZURE_MAX_CONCURRENCY,
+            rate_limit=AZURE_RATE_LIMIT,
+            rate_burst=AZURE_RATE_BURST,
+            timeout=AZURE_TIMEOUT_SECONDS,
+            breaker_threshold=AZURE_BREAKER_THRESHOLD,
+            breaker_reset=AZURE_BREAKER_RESET
+        )
+
     def generate_color(self, obj_id):
+        if len(self.color_map) > 1000:
+            self.color_map.clear()
         if obj_id not in self.color_map:
             self.color_map[obj_id] = [random.randint(0, 255) for _ in range(3)]
         return self.color_map[obj_id]
@@ -151,114 +333,237 @@ class PersonTracker:
                 if c1 > conf_thr and c2 > conf_thr:
                     cv2.line(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
 
-    def estimate_face_area(self, keypoints, box):
-        face_indices = [0, 1, 2, 3, 4]  # nose, eyes, ears
-        face_kpts = keypoints[face_indices]
-
-        if face_kpts.shape[1] == 3:
-            face_kpts = face_kpts[face_kpts[:,2]>0.3][:, :2]
-
-        if len(face_kpts) == 0:
-            return None
-
-        x_min, y_min = np.min(face_kpts, axis=0).astype(int)
-        x_max, y_max = np.max(face_kpts, axis=0).astype(int)
-        # box 범위 안으로 clamp
-        x_min, y_min = np.maximum([x_min, y_min], [box[0], box[1]])
-        x_max, y_max = np.minimum([x_max, y_max], [box[2], box[3]])
-
-        if x_max<=x_min or y_max<=y_min:
-            return None
-
-        # (예) 위아래로 크게 확장
-        face_h = y_max-y_min
-        expand_up = int(face_h*3)
-        expand_down = int(face_h*3)
-        face_w = x_max-x_min
-        expand_side = int(face_w*0.2)
-
-        x_min -= expand_side
-        x_max += expand_side
-        y_min -= expand_up
-        y_max += expand_down
-
-        x_min = max(x_min, box[0])
-        y_min = max(y_min, box[1])
-        x_max = min(x_max, box[2])
-        y_max = min(y_max, box[3])
-        if x_max<=x_min or y_max<=y_min:
-            return None
-
-        return (x_min, y_min, x_max, y_max)
+    @staticmethod
+    def to_detections(result):
+        return to_detections(result)
 
-    def apply_face_blur(self, frame, face_area):
-        if not face_area:
-            return frame
-        x1, y1, x2, y2 = face_area
-        roi = frame[y1:y2, x1:x2]
-        blurred = cv2.GaussianBlur(roi, (45, 45), 0)
-        frame[y1:y2, x1:x2] = blurred
-        return frame
-
-    async def process_single_frame(self, frame_bgr, cctv_id):
-        results = self.model.predict(
-            frame_bgr,
+    def _predict_batch(self, frames):
+        """배치 predict (스레드에서 실행). frames와 같은 순서의 detections 리스트 반환"""
+        results = self.registry.predict(
+            self.model_name,
+            frames,
             conf=self.conf,
             iou=self.iou,
             device=self.device,
             classes=[0]  # 사람만
         )
-        if len(results) == 0:
+        return [self.to_detections(r) for r in results]
+
+    async def detect(self, frame_bgr, cctv_id=None):
+        # 배치 대기 + predict 시간
+        with self.metrics.stage("inference", cctv_id):
+            return await self.batcher.submit(frame_bgr)
+
+    async def process_single_frame(self, frame_bgr, cctv_id, draw=True, annotations=None):
+        # (0) 움직임이 없고 추적 중인 사람도 없으면 추론 생략
+        with self.metrics.stage("motion_gate", cctv_id):
+            run = self.motion_gate.should_run(cctv_id, frame_bgr, self.trackers.active_count(cctv_id) > 0)
+        if not run:
+            # 정지 화면이라도 원본을 내보내지 않도록 마지막 추론 프레임의 얼굴 영역을 그대로 가린다
+            last = self.motion_gate.last_faces(cctv_id)
+            if last is not None:
+                with self.metrics.stage("face_blur", cctv_id):
+                    self.anonymizer.apply(frame_bgr, *last)
             return frame_bgr
 
-        boxes = results[0].boxes
-        keypoints_data = []
-        if hasattr(results[0], 'keypoints') and results[0].keypoints is not None:
-            keypoints_data = results[0].keypoints.data.cpu().numpy()
+        detections = await self.detect(frame_bgr, cctv_id)
+        return await self.handle_detections(frame_bgr, detections, cctv_id, draw=draw, annotations=annotations)
+
+    async def handle_detections(self, frame_bgr, detections, cctv_id, trackers=None, now=None,
+                                draw=True, annotations=None, detected_at=None):
+        """
+        detections -> 추적 -> 얼굴 blur (+스켈레톤/박스) -> 분류/전송
+        trackers: 기본은 라이브용 self.trackers (영상 작업은 별도 TrackerPool 사용)
+        detected_at: 이 프레임의 촬영 시각 (영상 작업: 녹화 시작 + 영상 타임스탬프, 기본은 현재 시각)
+        draw=False: 오버레이 없이 blur만 적용 (headless 처리)
+        annotations: list를 넘기면 사람별 박스/키포인트/얼굴 영역/track_id를 채워준다
+        """
+        trackers = trackers if trackers is not None else self.trackers
+        boxes = detections["boxes"]
+        keypoints_data = detections["keypoints"]
+        with self.metrics.stage("tracking", cctv_id):
+            assignments, expired = trackers.update(cctv_id, boxes, now)
 
-        # Azure 세션
-        await self.azure_api.start()
+        # (A) 얼굴 익명화: 전체 사람의 얼굴 영역을 한 번에 계산 후 적용 (오버레이보다 먼저)
+        with self.metrics.stage("face_blur", cctv_id):
+            face_areas, face_valid = estimate_face_areas(keypoints_data, boxes, conf_thr=0.3)
+            self.anonymizer.apply(frame_bgr, face_areas, face_valid)
+        if trackers is self.trackers:
+            self.motion_gate.remember_faces(cctv_id, face_areas, face_valid)
 
-        tasks = []
+        people = []
         for i, box in enumerate(boxes):
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            obj_id = i
+            x1, y1, x2, y2 = map(int, box)
+            obj_id, confirmed, _ = assignments[i]
 
-            # (A) 스켈레톤
-            if i < len(keypoints_data):
-                self.draw_skeleton(frame_bgr, keypoints_data[i], conf_thr=0.3)
-                # (B) 얼굴 blur
-                face_area = self.estimate_face_area(keypoints_data[i], [x1,y1,x2,y2])
-                if face_area:
-                    frame_bgr = self.apply_face_blur(frame_bgr, face_area)
+            face_area = face_areas[i] if i < len(face_valid) and face_valid[i] else None
+            if annotations is not None:
+                annotations.append({
+                    "track_id": int(obj_id),
+                    "confirmed": bool(confirmed),
+                    "box": [x1, y1, x2, y2],
+                    "score": round(float(detections["scores"][i]), 3),
+                    "keypoints": np.round(keypoints_data[i], 2).tolist() if i < len(keypoints_data) else [],
+                    "face": [int(v) for v in face_area] if face_area is not None else None,
+                })
 
-            # (C) 사람 crop & Azure & 백엔드 전송
-            tasks.append(self.process_person_image(frame_bgr, x1, y1, x2, y2, obj_id, cctv_id))
+            # (B) 사람 crop & 분류 & 백엔드 전송 대상 (확정된 track만, track당 몇 번만 분류)
+            if confirmed:
+                people.append((x1, y1, x2, y2, obj_id, keypoints_data[i] if i < len(keypoints_data) else None))
 
-            # 디버그 bounding box
-            color_box = self.generate_color(obj_id)
-            cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), color_box, 2)
-            cv2.putText(frame_bgr, f"ID: {obj_id}", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color_box, 2)
+        tasks = [self.process_people(frame_bgr, people, cctv_id, detected_at)]
+        # 화면에서 사라진 track은 지금까지 모인 결과로 전송 (오래 멈춘 다른 카메라의 track일 수도 있음)
+        for track in expired:
+            tasks.append(self.flush_track(track["cctv_id"], track["id"]))
 
         await asyncio.gather(*tasks)
-        await self.azure_api.close()
+
+        # (C) 스켈레톤 + 디버그 bounding box: crop을 뜬 뒤에 그린다
+        # (선/테두리가 crop에 들어가면 선명도 점수가 부풀고 분류기 입력도 오염됨)
+        if draw:
+            with self.metrics.stage("draw", cctv_id):
+                for i, box in enumerate(boxes):
+                    x1, y1, x2, y2 = map(int, box)
+                    obj_id = assignments[i][0]
+                    if i < len(keypoints_data):
+                        self.draw_skeleton(frame_bgr, keypoints_data[i], conf_thr=0.3)
+                    color_box = self.generate_color(obj_id)
+                    cv2.rectangle(frame_bgr, (x1, y1), (x2, y2), color_box, 2)
+                    cv2.putText(frame_bgr, f"ID: {obj_id}", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color_box, 2)
 
         return frame_bgr
 
-    async def process_person_image(self, frame_bgr, x1, y1, x2, y2, obj_id, cctv_id):
+    async def process_people(self, frame_bgr, people, cctv_id, detected_at=None):
         """
-        사람 crop -> Azure 분석 -> gender/age -> 백엔드로 전송 (+감지시각)
+        확정된 track들의 crop -> (필요한 것만) 한 번의 배치로 성별/연령 분류 -> track 캐시에 누적
+        -> 결과가 확정된 track은 gender/age를 백엔드로 한 번 전송 (+감지시각)
+        분류는 별도 task(classify_samples)로 돌려 프레임 응답을 기다리게 하지 않는다
+        people: [(x1, y1, x2, y2, obj_id, keypoints), ...]
         """
+        samples = []
+        sampling = len(self.classify_tasks) < CLASSIFY_MAX_INFLIGHT
+        if not sampling and people:
+            self.classify_skipped += 1
+        for x1, y1, x2, y2, obj_id, keypoints in people:
+            if not sampling:
+                break
+            key = (cctv_id, obj_id)
+            quality = float(max(0, x2 - x1) * max(0, y2 - y1))
+            if not self.attribute_cache.wants_sample(key, quality):
+                continue
+            # 작거나/비율이 이상하거나/가려진 사람은 crop도 하지 않음
+            if self.quality_gate.check((x1, y1, x2, y2), keypoints):
+                continue
+
+            with self.metrics.stage("crop_encode", cctv_id):
+                crop_bgr = self.crop_person(frame_bgr, x1, y1, x2, y2)
+                if crop_bgr is None or self.quality_gate.check_sharpness(crop_bgr):
+                    continue
+                image = self.encode_crop(crop_bgr)
+            if image is None:
+                continue
+
+            entry = self.attribute_cache.get(key)
+            entry.setdefault("detected_at", detected_at or datetime.now())
+            self.attribute_cache.begin_sample(key)
+            samples.append((key, quality, {"image": image, "crop": crop_bgr}))
+
+        if samples:
+            task = asyncio.create_task(self.classify_samples(cctv_id, samples))
+            self.classify_tasks.add(task)
+            task.add_done_callback(self.classify_tasks.discard)
+
+        uploads = []
+        done = []
+        for _, _, _, _, obj_id, _ in people:
+            key = (cctv_id, obj_id)
+            entry = self.attribute_cache.get(key)
+            if self.attribute_cache.is_final(key) or entry.get("expired"):
+                uploads.append(self.upload_track(cctv_id, obj_id))
+                if entry.get("expired"):
+                    done.append(key)
+        await asyncio.gather(*uploads)
+        for key in done:
+            self.attribute_cache.pop(key)
+
+    async def classify_samples(self, cctv_id, samples):
+        """
+        (프레임과 분리된 task) samples 분류 -> track 캐시에 누적
+        -> 그 사이 확정됐거나 만료된 track은 여기서 전송 (만료된 track은 캐시에서 제거)
+        """
+        try:
+            with self.metrics.stage("classify", cctv_id):
+                preds_list = await self.classifier.classify_batch([item for _, _, item in samples])
+        except Exception as e:
+            print("[ERROR] classify_batch:", e)
+            preds_list = [{} for _ in samples]
+        for (key, quality, item), preds in zip(samples, preds_list):
+            self.attribute_cache.add_sample(key, preds, quality, item["image"])
+
+        for key, _, _ in samples:
+            entry = self.attribute_cache.get(key)
+            if entry["pending"]:
+                continue
+            if self.attribute_cache.is_final(key) or entry.get("expired"):
+                await self.upload_track(*key)
+                if entry.get("expired"):
+                    self.attribute_cache.pop(key)
+
+    @staticmethod
+    def crop_person(frame_bgr, x1, y1, x2, y2):
+        h, w = frame_bgr.shape[:2]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
         cropped_img = frame_bgr[y1:y2, x1:x2]
         if cropped_img.size == 0:
+            return None
+        return cropped_img.copy()
+
+    def encode_crop(self, crop_bgr):
+        """crop을 메모리에서 JPEG로 한 번만 인코딩 (디스크 I/O 없음)"""
+        ret, buf = cv2.imencode(".jpg", crop_bgr, [cv2.IMWRITE_JPEG_QUALITY, CROP_JPEG_QUALITY])
+        if not ret:
+            return None
+        return buf.tobytes()
+
+    async def flush_track(self, cctv_id, obj_id):
+        """만료된 track: 분류 중이면 끝난 뒤 전송되도록 표시, 아니면 바로 전송"""
+        key = (cctv_id, obj_id)
+        entry = self.attribute_cache.get(key)
+        if entry["pending"]:
+            entry["expired"] = True
+            return
+        await self.upload_track(cctv_id, obj_id)
+        self.attribute_cache.pop(key)
+
+    async def upload_track(self, cctv_id, obj_id):
+        key = (cctv_id, obj_id)
+        entry = self.attribute_cache.get(key)
+        if entry["uploaded"] or entry["best_crop"] is None:
             return
+        entry["uploaded"] = True
 
-        cropped_path = f"/tmp/cropped_{cctv_id}_{obj_id}.jpg"
-        cv2.imwrite(cropped_path, cropped_img)
+        preds = self.attribute_cache.result(key)
+        gender, age = self.labels_from_predictions(preds)
 
-        preds = await self.azure_api.analyze_image(cropped_path)
-        threshold = 30.0
+        # 감지 시간 = track이 처음 분류된 시각
+        detection_time = entry.get("detected_at") or datetime.now()
+        # 백엔드 전송 (분류가 한 번도 성공하지 못했으면 스풀에서 나중에 다시 분류)
+        await self.send_data_to_backend(cctv_id, detection_time, obj_id, gender, age, entry["best_crop"],
+                                        classify=not preds)
 
+    async def reclassify(self, images):
+        """스풀에 남은 crop(JPEG) 재분류. returns: [(gender, age) 또는 None(실패), ...]"""
+        items = []
+        for image in images:
+            crop = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+            items.append({"image": image, "crop": crop})
+        preds_list = await self.classifier.classify_batch(items)
+        return [self.labels_from_predictions(preds) if preds else None for preds in preds_list]
+
+    @staticmethod
+    def labels_from_predictions(preds, threshold=30.0):
+        """정규화된 예측 -> (gender, age) 라벨"""
         # 성별
         gender_candidates = [k for k in preds if k in ["Male","Female"] and preds[k]>=threshold]
         if gender_candidates:
@@ -288,73 +593,563 @@ class PersonTracker:
         else:
             age="Unknown"
 
-        # 감지 시간
-        detection_time = datetime.now()
-        # 백엔드 전송
-        await self.send_data_to_backend(cctv_id, detection_time, obj_id, gender, age, cropped_path)
+        return gender, age
 
-    async def send_data_to_backend(self, cctv_id, detection_time, obj_id, gender, age, cropped_path):
+    async def send_data_to_backend(self, cctv_id, detection_time, obj_id, gender, age, image_bytes,
+                                   classify=False):
         """
-        multipart/form-data로
-        (cctv_id, detected_time, person_label, gender, age, image_file) 전송
+        (cctv_id, detected_time, person_label, gender, age, image) 를
+        DetectionSink 큐에 넣는다. 실제 전송은 백그라운드에서 배치로 처리.
         """
         if not self.backend_url:
             return
 
-        data = {
+        item = {
             "cctv_id": cctv_id,
             "detected_time": detection_time.isoformat(),  # 예: 2025-05-01T12:34:56
             "person_label": str(obj_id),
             "gender": gender,
-            "age": age
+            "age": age,
+            "image": image_bytes
+        }
+        if classify:
+            item["classify"] = True
+        self.sink.submit(item)
+
+
+# ---------------------------------------------------------
+# (C) 앱 수명주기: 모델 로드/워밍업 + 공유 tracker
+# ---------------------------------------------------------
+model_registry = ModelRegistry(warmup_runs=WARMUP_RUNS)
+stage_metrics = StageTimer(enabled=METRICS_ENABLED, max_cameras=METRICS_MAX_CAMERAS)
+tracker = None
+video_jobs = None
+cameras = None
+scheduler = None
+
+
+def build_scheduler(t):
+    s = FrameScheduler(
+        t.process_single_frame,
+        concurrency=SCHEDULER_CONCURRENCY,
+        default_fps=SCHEDULER_DEFAULT_FPS,
+        queue_size=SCHEDULER_QUEUE_SIZE,
+        max_lag=SCHEDULER_MAX_LAG,
+        policy=SCHEDULER_POLICY
+    )
+    for cctv_id, fps in (json.loads(SCHEDULER_CAMERA_FPS) if SCHEDULER_CAMERA_FPS else {}).items():
+        s.configure(int(cctv_id), target_fps=fps)
+    for cctv_id, weight in (json.loads(SCHEDULER_CAMERA_WEIGHTS) if SCHEDULER_CAMERA_WEIGHTS else {}).items():
+        s.configure(int(cctv_id), weight=weight)
+    return s
+
+
+async def schedule_frame(t, frame_bgr, cctv_id, **kwargs):
+    """스케줄러를 거쳐 process_single_frame 실행. 부하로 버려진 프레임이면 None"""
+    if scheduler is None:
+        return await t.process_single_frame(frame_bgr, cctv_id, **kwargs)
+    return await scheduler.run(cctv_id, frame_bgr, **kwargs)
+
+
+@app.on_event("startup")
+async def on_startup():
+    global tracker, video_jobs, cameras, scheduler
+    model_registry.register(POSE_MODEL_NAME, POSE_MODEL_PATH)
+    tracker = PersonTracker(model_registry, metrics=stage_metrics)
+    # 로드/워밍업은 블로킹 작업이므로 스레드에서 실행
+    if tracker.inference_pool:
+        # 워커 프로세스가 각자 모델을 로드하므로 API 프로세스에는 올리지 않는다
+        await asyncio.to_thread(tracker.inference_pool.start)
+    else:
+        await asyncio.to_thread(model_registry.load, POSE_MODEL_NAME)
+    await tracker.batcher.start()
+    await tracker.sink.start()
+    await tracker.classifier.start()
+    video_jobs = VideoJobManager(tracker, max_concurrent_jobs=VIDEO_MAX_JOBS)
+    if SCHEDULER_ENABLED:
+        scheduler = build_scheduler(tracker)
+        await scheduler.start()
+    cameras = CameraIngestManager(
+        tracker,
+        target_fps=CAMERA_TARGET_FPS,
+        queue_size=CAMERA_QUEUE_SIZE,
+        reconnect_max=CAMERA_RECONNECT_MAX,
+        sync_urls=CAMERA_SYNC_URLS,
+        sync_interval=CAMERA_SYNC_INTERVAL,
+        scheduler=scheduler
+    )
+    await cameras.start(json.loads(CAMERA_SOURCES) if CAMERA_SOURCES else None)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if cameras:
+        await cameras.stop()
+    if scheduler:
+        await scheduler.stop()
+    if video_jobs:
+        for job in list(video_jobs.jobs.values()):
+            video_jobs.cancel(job.id)
+            if job.task:
+                await asyncio.gather(job.task, return_exceptions=True)
+    if tracker:
+        await tracker.batcher.stop()
+        # 진행 중인 분류가 끝나야 결과가 sink에 들어간다
+        await asyncio.gather(*tracker.classify_tasks, return_exceptions=True)
+        await tracker.sink.stop()
+        await tracker.classifier.close()
+        if tracker.inference_pool:
+            await asyncio.to_thread(tracker.inference_pool.stop)
+
+
+def get_tracker():
+    if tracker is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet")
+    return tracker
+
+
+@app.get("/models")
+async def list_models():
+    """모델별 로드/워밍업 상태"""
+    status = model_registry.status()
+    if tracker is not None and tracker.inference_pool and POSE_MODEL_NAME in status:
+        status[POSE_MODEL_NAME]["inference_pool"] = tracker.inference_pool.stats()
+    return JSONResponse(status)
+
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (ADMIN_TOKEN not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def resolve_model_path(model_path):
+    """MODEL_DIR 기준 상대 경로 -> 실제 경로 (절대 경로, '..', 디렉터리 밖, 허용하지 않는 확장자는 거부)"""
+    if not model_path:
+        return None
+    if os.path.isabs(model_path) or ".." in model_path.replace("\\", "/").split("/"):
+        raise HTTPException(status_code=400, detail="model_path must be a file name relative to MODEL_DIR")
+    root = os.path.realpath(MODEL_DIR)
+    path = os.path.realpath(os.path.join(root, model_path))
+    if os.path.commonpath([root, path]) != root or not path.endswith(MODEL_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="model_path is not an allowed model file")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {model_path}")
+    return path
+
+
+@app.post("/models/{name}/reload", dependencies=[Depends(require_admin)])
+async def reload_model(name: str, model_path: Optional[str] = Form(None)):
+    """
+    프로세스 재시작 없이 모델 재로드 (관리 토큰 필요).
+    model_path는 MODEL_DIR 안의 파일 이름 (생략하면 현재 모델 파일을 다시 로드).
+    새 모델을 로드/워밍업한 뒤 교체하므로 진행 중인 요청은 기존 모델로 끝난다.
+    워커 풀 모드에서는 새 워커 세트를 띄워 교체한다.
+    """
+    model_path = resolve_model_path(model_path)
+    pool = tracker.inference_pool if tracker is not None else None
+    try:
+        if pool and name == POSE_MODEL_NAME:
+            await asyncio.to_thread(pool.reload, model_path)
+            model_registry.register(name, pool.model_path)
+            return JSONResponse({**model_registry.status()[name], "inference_pool": pool.stats()})
+        await asyncio.to_thread(model_registry.reload, name, model_path)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(model_registry.status()[name])
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """SERVER_TIMING_ENABLED=1이면 요청에서 거친 stage 시간을 Server-Timing 헤더로 붙인다"""
+    if not (SERVER_TIMING_ENABLED and stage_metrics.enabled):
+        return await call_next(request)
+    timings = {}
+    token = request_timings.set(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        request_timings.reset(token)
+    if timings:
+        response.headers["Server-Timing"] = StageTimer.server_timing_header(timings)
+    return response
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """stage별 지연시간 히스토그램 + 주요 게이지 (Prometheus text format)"""
+    gauges = {}
+    if tracker is not None:
+        batcher = tracker.batcher.stats()
+        gate = tracker.motion_gate.stats()
+        sink = tracker.sink.stats()
+        gauges = {
+            "batcher_queue_depth": batcher["queue_depth"],
+            "batcher_avg_batch_size": batcher["avg_batch_size"],
+            "motion_gate_skip_ratio": {cid: c["skip_ratio"] for cid, c in gate["cameras"].items()},
+            "active_tracks": tracker.trackers.stats()["active_tracks"],
+            "sink_queue_depth": sink["queue_depth"],
+            "sink_failed_total": sink["failed"],
+            "sink_rejected_total": sink["rejected"],
+            "backend_breaker_open": int(bool(sink["breaker"]) and sink["breaker"]["state"] != "closed"),
+            "quality_gate_pass_ratio": tracker.quality_gate.stats()["pass_ratio"],
         }
+        if scheduler is not None:
+            cams = scheduler.stats()["cameras"]
+            gauges.update({
+                "scheduler_achieved_fps": {cid: c["achieved_fps"] for cid, c in cams.items()},
+                "scheduler_lag_seconds": {cid: (c["last_lag_ms"] or 0.0) / 1000.0 for cid, c in cams.items()},
+                "scheduler_queue_depth": {cid: c["queued"] for cid, c in cams.items()},
+                "scheduler_shed_ratio": {cid: c["shed_ratio"] for cid, c in cams.items()},
+            })
+    return PlainTextResponse(stage_metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def get_stats():
+    """파이프라인 구성요소별 런타임 지표"""
+    t = get_tracker()
+    return JSONResponse({
+        "batcher": t.batcher.stats(),
+        "inference_pool": t.inference_pool.stats() if t.inference_pool else None,
+        "motion_gate": t.motion_gate.stats(),
+        "tracking": t.trackers.stats(),
+        "attribute_cache": t.attribute_cache.stats(),
+        "quality_gate": t.quality_gate.stats(),
+        "sink": t.sink.stats(),
+        "classifier": {**t.classifier.stats(), "inflight_tasks": len(t.classify_tasks),
+                       "skipped_frames": t.classify_skipped},
+        "cameras": cameras.stats() if cameras else None,
+        "scheduler": scheduler.stats() if scheduler else None,
+        "streams": [{"cctv_id": c.cctv_id, "mode": c.mode, **c.stats()} for c in stream_connections.values()],
+    })
+
+
+# ---------------------------------------------------------
+# 카메라 직접 수집
+# ---------------------------------------------------------
+def get_cameras():
+    if cameras is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded yet")
+    return cameras
+
+
+@app.get("/cameras")
+async def list_cameras():
+    return JSONResponse(get_cameras().stats())
+
+
+@app.post("/cameras", dependencies=[Depends(require_admin)])
+async def add_camera(
+    cctv_id: int = Form(...),
+    url: str = Form(...),                      # rtsp(s)://, http(s)://, CAMERA_FILE_DIR 기준 파일 이름
+    target_fps: Optional[float] = Form(None),
+):
+    """cctv의 스트림을 서버에서 직접 읽어 분석 (같은 cctv_id면 교체)"""
+    try:
+        url = resolve_camera_source(url, CAMERA_FILE_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    source = get_cameras().add(cctv_id, url, target_fps)
+    return JSONResponse(source.stats())
+
+
+@app.delete("/cameras/{cctv_id}", dependencies=[Depends(require_admin)])
+async def remove_camera(cctv_id: int):
+    source = get_cameras().remove(cctv_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Camera not found")
+    return JSONResponse({"cctv_id": cctv_id, "state": "stopping"})
+
+
+# ---------------------------------------------------------
+# 서버 측 영상 분석 작업
+# ---------------------------------------------------------
+@app.post("/video_jobs", dependencies=[Depends(require_admin)])
+async def create_video_job(
+    source: str = Form(...),
+    cctv_id: int = Form(...),
+    recorded_at: datetime = Form(...),
+    sample_fps: float = Form(VIDEO_SAMPLE_FPS)
+):
+    """
+    source: VIDEO_BLOB_ACCOUNT/VIDEO_BLOB_CONTAINER의 Blob URL(SAS 포함) 또는 VIDEO_UPLOAD_DIR 기준 파일 이름
+    recorded_at: 녹화 시작 시각. 감지 시각 = recorded_at + 영상 타임스탬프 (처리 시각이 아님)
+    브라우저 재생 없이 서버에서 바로 디코딩/분석하고 결과는 일반 전송 경로로 보낸다.
+    """
+    get_tracker()
+    if sample_fps <= 0:
+        raise HTTPException(status_code=400, detail="sample_fps must be positive")
+    try:
+        source = resolve_video_source(source, VIDEO_BLOB_ACCOUNT, VIDEO_BLOB_CONTAINER, VIDEO_UPLOAD_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone().replace(tzinfo=None)  # 라이브 감지 시각과 같은 로컬 시각
+    job = video_jobs.submit(source, cctv_id, recorded_at, sample_fps=sample_fps, batch_size=BATCH_MAX_SIZE)
+    return JSONResponse(job.status(), status_code=202)
+
+
+@app.get("/video_jobs", dependencies=[Depends(require_admin)])
+async def list_video_jobs():
+    get_tracker()
+    return JSONResponse([j.status() for j in video_jobs.jobs.values()])
+
+
+@app.get("/video_jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def get_video_job(job_id: str):
+    get_tracker()
+    job = video_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(job.status())
+
 
-        files = {}
-        if cropped_path and os.path.exists(cropped_path):
-            files["image_file"] = open(cropped_path, "rb")
+@app.delete("/video_jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def cancel_video_job(job_id: str):
+    get_tracker()
+    job = video_jobs.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(job.status())
 
+
+# 응답 이미지 포맷: (확장자, media type, 품질 파라미터)
+IMAGE_FORMATS = {
+    "png": (".png", "image/png", None),
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def encode_frame(frame_bgr, fmt="png", quality=80):
+    """returns: (bytes, media_type)"""
+    ext, media_type, quality_flag = IMAGE_FORMATS[fmt]
+    params = [quality_flag, max(1, min(100, int(quality)))] if quality_flag is not None else []
+    ret, encoded_img = cv2.imencode(ext, frame_bgr, params)
+    if not ret:
+        raise ValueError("Failed to encode result image")
+    return encoded_img.tobytes(), media_type
+
+
+# ---------------------------------------------------------
+# WebSocket 라이브 스트림 (카메라당 연결 1개, 최신 프레임만 처리)
+# ---------------------------------------------------------
+class StreamConnection:
+    """
+    수신 루프는 바이너리 JPEG 프레임을 슬롯 하나에 덮어쓴다.
+    처리 루프는 항상 가장 최근 프레임만 꺼내 처리하고, 처리 전에 덮어쓰인 프레임은 dropped로 센다.
+    프레임 하나의 처리가 실패하면 {"error": ...}를 보내고 다음 프레임으로 넘어간다 (연결은 유지).
+    """
+
+    def __init__(self, websocket, cctv_id, mode="annotations", quality=80):
+        self.websocket = websocket
+        self.cctv_id = cctv_id
+        self.mode = mode
+        self.quality = quality
+        self.latest = None
+        self.event = asyncio.Event()
+        self.closed = False
+
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.started_at = time.time()
+        self._fps_window = []
+
+    async def receive_loop(self):
         try:
-            # requests 모듈 사용
-            response = requests.post(self.backend_url, data=data, files=files)
-            if response.status_code == 200 or response.status_code == 201:
-                print("[INFO] Upload success:", response.json())
-            else:
-                print("[WARN] Upload failed:", response.status_code, response.text)
-        except Exception as e:
-            print("[ERROR] send_data_to_backend:", e)
+            while True:
+                data = await self.websocket.receive_bytes()
+                self.received += 1
+                if self.latest is not None:
+                    self.dropped += 1
+                self.latest = data
+                self.event.set()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
         finally:
-            if "image_file" in files:
-                files["image_file"].close()
+            self.closed = True
+            self.event.set()
+
+    def _tick(self):
+        now = time.time()
+        self._fps_window.append(now)
+        while self._fps_window and now - self._fps_window[0] > 5.0:
+            self._fps_window.pop(0)
+
+    def fps(self):
+        if len(self._fps_window) < 2:
+            return 0.0
+        span = self._fps_window[-1] - self._fps_window[0]
+        return (len(self._fps_window) - 1) / span if span > 0 else 0.0
+
+    async def process_loop(self, t):
+        while True:
+            await self.event.wait()
+            self.event.clear()
+            if self.closed:
+                return
+            data, self.latest = self.latest, None
+            if data is None:
+                continue
+
+            try:
+                await self.process_frame(t, data)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # 추론 타임아웃 등 프레임 하나의 실패로 스트림 전체를 끊지 않는다
+                # (소켓이 이미 닫혔으면 여기서 보내기가 다시 실패해 루프가 끝난다)
+                self.errors += 1
+                print(f"[ERROR] stream {self.cctv_id} frame:", e)
+                await self.websocket.send_json({"error": str(e)})
+
+    async def process_frame(self, t, data):
+        frame_bgr = await asyncio.to_thread(cv2.imdecode, np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame_bgr is None:
+            await self.websocket.send_json({"error": "Failed to decode image"})
+            return
+
+        if self.mode == "annotations":
+            annotations = []
+            if await schedule_frame(t, frame_bgr, self.cctv_id, draw=False, annotations=annotations) is None:
+                self.dropped += 1
+                return
+            self.processed += 1
+            self._tick()
+            await self.websocket.send_json({
+                "frame": self.received,
+                "width": int(frame_bgr.shape[1]),
+                "height": int(frame_bgr.shape[0]),
+                "people": annotations,
+                **self.stats(),
+            })
+        else:
+            result_frame = await schedule_frame(t, frame_bgr, self.cctv_id)
+            if result_frame is None:
+                self.dropped += 1
+                return
+            content, _ = await asyncio.to_thread(encode_frame, result_frame, self.mode, self.quality)
+            self.processed += 1
+            self._tick()
+            await self.websocket.send_bytes(content)
+
+    async def close(self, code=1000, reason=""):
+        """처리 루프를 멈추고 소켓을 닫는다 (이미 닫혔으면 무시)"""
+        self.closed = True
+        self.event.set()
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except RuntimeError:
+            pass
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "fps": round(self.fps(), 2),
+        }
+
+
+stream_connections = {}  # cctv_id -> StreamConnection (카메라당 하나, 트래커 상태를 공유하므로)
+
+
+@app.websocket("/ws/stream/{cctv_id}")
+async def stream_frames(websocket: WebSocket, cctv_id: int, mode: str = "annotations", quality: int = 80):
+    """
+    클라이언트 -> 바이너리 JPEG 프레임
+    서버 -> mode=annotations: JSON(박스/키포인트/얼굴 영역/track_id + fps/dropped)
+            mode=jpeg|webp|png: 오버레이+blur가 적용된 이미지 바이너리
+    """
+    await websocket.accept()
+    if tracker is None or mode not in ("annotations",) + tuple(IMAGE_FORMATS):
+        await websocket.close(code=1011 if tracker is None else 1003)
+        return
+
+    conn = StreamConnection(websocket, cctv_id, mode=mode, quality=max(1, min(100, quality)))
+    previous = stream_connections.get(cctv_id)
+    stream_connections[cctv_id] = conn
+    if previous is not None:
+        # 같은 카메라의 예전 연결(재접속 전 끊기지 않은 소켓 등)은 닫고 새 연결로 교체
+        print(f"[WARN] stream {cctv_id}: replacing previous connection")
+        await previous.close(code=1008, reason="Replaced by a newer connection for this cctv_id")
+    receiver = asyncio.create_task(conn.receive_loop())
+    try:
+        await conn.process_loop(tracker)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        if stream_connections.get(cctv_id) is conn:
+            stream_connections.pop(cctv_id)
+        print(f"[INFO] stream {cctv_id} closed:", conn.stats())
 
 
 # ---------------------------------------------------------
-# (C) /yolo_mosaic 라우트:
+# (D) /yolo_mosaic 라우트:
 # ---------------------------------------------------------
 @app.post("/yolo_mosaic")
-async def yolo_mosaic(file: UploadFile = File(...), cctv_id: str = Form(...)):
+async def yolo_mosaic(
+    file: UploadFile = File(...),
+    cctv_id: str = Form(...),
+    response_format: str = Form("png"),
+    quality: int = Form(80)
+):
 
     """
-    브라우저 Canvas -> 스켈레톤 + 얼굴 모자이크 + 성별/연령 태깅 -> PNG
+    브라우저 Canvas -> 스켈레톤 + 얼굴 모자이크 + 성별/연령 태깅 -> 응답
+    response_format:
+      - png (기본, 기존 동작) / jpeg / webp: 서버에서 오버레이를 그린 이미지 (quality: 1~100, png 제외)
+      - json: 이미지 없이 사람별 박스/키포인트/얼굴 영역/track_id만 반환 (서버 그리기/인코딩 생략)
     """
+    response_format = response_format.lower()
+    if response_format == "jpg":
+        response_format = "jpeg"
+    if response_format not in ("json",) + tuple(IMAGE_FORMATS):
+        raise HTTPException(status_code=400, detail=f"Unsupported response_format: {response_format}")
+
     try:
+        print("Got cctv_id raw =>", cctv_id)
+        cctv_id_int = int(cctv_id)
+
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        frame_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with stage_metrics.stage("decode", cctv_id_int):
+            nparr = np.frombuffer(contents, np.uint8)
+            frame_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         if frame_bgr is None:
             raise ValueError("Failed to decode image")
 
-        tracker = PersonTracker()
-        print("Got cctv_id raw =>", cctv_id)
-        cctv_id_int = int(cctv_id)
-        
-        result_frame = await tracker.process_single_frame(frame_bgr, cctv_id=cctv_id_int)
+        if response_format == "json":
+            annotations = []
+            if await schedule_frame(get_tracker(), frame_bgr, cctv_id_int,
+                                    draw=False, annotations=annotations) is None:
+                raise HTTPException(status_code=429, detail="Frame dropped (camera over budget)",
+                                    headers={"Retry-After": "1"})
+            return JSONResponse({
+                "width": int(frame_bgr.shape[1]),
+                "height": int(frame_bgr.shape[0]),
+                "people": annotations,
+            })
 
-        ret, encoded_img = cv2.imencode(".png", result_frame)
-        if not ret:                                                                                                                                                                                                                                              
-            raise ValueError("Failed to encode result image")
+        result_frame = await schedule_frame(get_tracker(), frame_bgr, cctv_id_int)
+        if result_frame is None:
+            raise HTTPException(status_code=429, detail="Frame dropped (camera over budget)",
+                                headers={"Retry-After": "1"})
 
-        return Response(content=encoded_img.tobytes(), media_type="image/png")
+        with stage_metrics.stage("encode", cctv_id_int):
+            content, media_type = encode_frame(result_frame, response_format, quality)
+        return Response(content=content, media_type=media_type)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,150 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/metrics.py
+
+import bisect
+import contextvars
+import threading
+import time
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# max_cameras를 넘은 cctv_id들이 합쳐지는 라벨 값
+OTHER_LABEL = "other"
+
+# 요청 단위 stage 시간 (Server-Timing 헤더용). None이면 기록 안 함
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class _NoopStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopStage()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "cctv_id", "t0")
+
+    def __init__(self, timer, name, cctv_id):
+        self.timer = timer
+        self.name = name
+        self.cctv_id = cctv_id
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.observe(self.name, self.cctv_id, time.perf_counter() - self.t0)
+        return False
+
+
+# ---------------------------------------------------------
+# stage별 지연시간 히스토그램 (Prometheus text format)
+# ---------------------------------------------------------
+class StageTimer:
+    """
+    with timer.stage("inference", cctv_id): ...
+    - (stage, cctv_id)별 히스토그램을 누적하고 /metrics에서 Prometheus 형식으로 내보낸다
+    - 요청 컨텍스트에 request_timings가 있으면 Server-Timing용으로도 합산한다
+    - enabled=False면 stage()는 공유 no-op 객체를 돌려주므로 비용이 거의 없다
+    - cctv_id 라벨은 처음 본 max_cameras개까지만 따로 두고 나머지는 "other"로 합친다
+      (요청마다 임의의 cctv_id가 올 수 있으므로 시계열 수를 제한)
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, prefix="people_detection", max_cameras=64):
+        self.enabled = enabled
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.max_cameras = max_cameras
+        self._hist = {}
+        self._cameras = set()
+        self._lock = threading.Lock()
+
+    def stage(self, name, cctv_id=None):
+        if not self.enabled:
+            return _NOOP
+        return _Stage(self, name, cctv_id)
+
+    def observe(self, name, cctv_id, seconds):
+        if not self.enabled:
+            return
+        label = "" if cctv_id is None else str(cctv_id)
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            if label and label not in self._cameras:
+                if len(self._cameras) < self.max_cameras:
+                    self._cameras.add(label)
+                else:
+                    label = OTHER_LABEL
+            key = (name, label)
+            h = self._hist.get(key)
+            if h is None:
+                h = self._hist[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            h["counts"][idx] += 1
+            h["sum"] += seconds
+            h["count"] += 1
+
+        timings = request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+
+    def summary(self):
+        """stage별(cctv_id 합산) 횟수/평균 ms"""
+        out = {}
+        with self._lock:
+            for (stage, _), h in self._hist.items():
+                s = out.setdefault(stage, {"count": 0, "sum": 0.0})
+                s["count"] += h["count"]
+                s["sum"] += h["sum"]
+        return {
+            stage: {"count": s["count"], "avg_ms": (s["sum"] / s["count"] * 1000.0) if s["count"] else 0.0}
+            for stage, s in sorted(out.items())
+        }
+
+    @staticmethod
+    def server_timing_header(timings):
+        return ", ".join(f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in timings.items())
+
+    @staticmethod
+    def _labels(**labels):
+        parts = []
+        for k, v in labels.items():
+            v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            parts.append(f'{k}="{v}"')
+        return "{" + ",".join(parts) + "}"
+
+    def render(self, gauges=None):
+        """
+        Prometheus text exposition format
+        gauges: { metric_name: value 또는 {label_value(cctv_id): value} }
+        """
+        name = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {name} Per-stage latency of the people-detection pipeline.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            items = sorted((k, {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]})
+                           for k, v in self._hist.items())
+        for (stage, cctv_id), h in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, h["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._labels(stage=stage, cctv_id=cctv_id, le=repr(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{self._labels(stage=stage, cctv_id=cctv_id, le='+Inf')} {h['count']}")
+            lines.append(f"{name}_sum{self._labels(stage=stage, cctv_id=cctv_id)} {h['sum']}")
+            lines.append(f"{name}_count{self._labels(stage=stage, cctv_id=cctv_id)} {h['count']}")
+
+        for metric, value in (gauges or {}).items():
+            full = f"{self.prefix}_{metric}"
+            lines.append(f"# TYPE {full} gauge")
+            if isinstance(value, dict):
+                for label, v in value.items():
+                    lines.append(f"{full}{self._labels(cctv_id=label)} {float(v)}")
+            else:
+                lines.append(f"{full} {float(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,147 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/model_registry.py
+
+import threading
+import time
+
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+
+def to_detections(result):
+    """
+    ultralytics Result -> 가벼운 numpy dict
+    { 'boxes': (N,4) xyxy, 'scores': (N,), 'keypoints': (N,17,3) }
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return {
+            "boxes": np.zeros((0, 4), dtype=np.float32),
+            "scores": np.zeros((0,), dtype=np.float32),
+            "keypoints": np.zeros((0, 17, 3), dtype=np.float32),
+        }
+    keypoints = np.zeros((len(boxes), 17, 3), dtype=np.float32)
+    if getattr(result, 'keypoints', None) is not None:
+        keypoints = result.keypoints.data.cpu().numpy()
+    return {
+        "boxes": boxes.xyxy.cpu().numpy(),
+        "scores": boxes.conf.cpu().numpy(),
+        "keypoints": keypoints,
+    }
+
+
+# ---------------------------------------------------------
+# 모델 레지스트리: 워커(프로세스)당 한 번만 로드 + 워밍업
+# ---------------------------------------------------------
+class ModelRegistry:
+    """
+    이름 -> YOLO 모델을 보관한다.
+    - 앱 시작 시 load()로 한 번 로드하고 더미 프레임으로 워밍업
+    - predict()는 모델별 lock 안에서 실행 (요청 간 공유 안전)
+    - reload()는 새 모델을 lock 밖에서 로드/워밍업한 뒤 교체
+    """
+
+    def __init__(self, device=None, warmup_runs=2, warmup_size=640):
+        self.device = device if device else ('cuda:0' if torch.cuda.is_available() else 'cpu')
+        self.warmup_runs = warmup_runs
+        self.warmup_size = warmup_size
+        self._entries = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, model_path):
+        with self._registry_lock:
+            if name not in self._entries:
+                self._entries[name] = {
+                    "path": model_path,
+                    "model": None,
+                    "lock": threading.Lock(),
+                    "loaded": False,
+                    "warm": False,
+                    "load_seconds": None,
+                    "warmup_seconds": None,
+                    "loaded_at": None,
+                    "error": None,
+                }
+            else:
+                self._entries[name]["path"] = model_path
+        return self._entries[name]
+
+    def _build(self, model_path):
+        """
+        모델 로드 + 워밍업. (lock 밖에서 실행)
+        returns: (model, load_seconds, warmup_seconds)
+        """
+        t0 = time.perf_counter()
+        model = YOLO(model_path)
+        load_seconds = time.perf_counter() - t0
+
+        t1 = time.perf_counter()
+        dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+        for _ in range(self.warmup_runs):
+            model.predict(dummy, device=self.device, classes=[0], verbose=False)
+        warmup_seconds = time.perf_counter() - t1
+
+        return model, load_seconds, warmup_seconds
+
+    def load(self, name, model_path=None):
+        entry = self._entries.get(name)
+        if entry is None:
+            if model_path is None:
+                raise KeyError(f"Unknown model: {name}")
+            entry = self.register(name, model_path)
+        elif model_path is not None:
+            entry["path"] = model_path
+
+        try:
+            model, load_seconds, warmup_seconds = self._build(entry["path"])
+        except Exception as e:
+            entry["error"] = str(e)
+            print(f"[ERROR] model load failed ({name}):", e)
+            raise
+
+        # 교체는 lock 안에서 (진행 중인 추론이 끝난 뒤 스왑)
+        with entry["lock"]:
+            entry["model"] = model
+            entry["loaded"] = True
+            entry["warm"] = self.warmup_runs > 0
+            entry["load_seconds"] = load_seconds
+            entry["warmup_seconds"] = warmup_seconds
+            entry["loaded_at"] = time.time()
+            entry["error"] = None
+
+        print(f"[INFO] model '{name}' loaded ({load_seconds:.2f}s, warmup {warmup_seconds:.2f}s)")
+        return model
+
+    def reload(self, name, model_path=None):
+        """프로세스 재시작 없이 모델 재로드 (실패 시 기존 모델 유지)"""
+        return self.load(name, model_path)
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is None or entry["model"] is None:
+            raise RuntimeError(f"Model '{name}' is not loaded")
+        return entry["model"]
+
+    def predict(self, name, frames, **kwargs):
+        entry = self._entries.get(name)
+        if entry is None or entry["model"] is None:
+            raise RuntimeError(f"Model '{name}' is not loaded")
+        kwargs.setdefault("device", self.device)
+        kwargs.setdefault("verbose", False)
+        with entry["lock"]:
+            return entry["model"].predict(frames, **kwargs)
+
+    def status(self):
+        return {
+            name: {
+                "path": e["path"],
+                "device": self.device,
+                "loaded": e["loaded"],
+                "warm": e["warm"],
+                "load_seconds": e["load_seconds"],
+                "warmup_seconds": e["warmup_seconds"],
+                "loaded_at": e["loaded_at"],
+                "error": e["error"],
+            }
+            for name, e in self._entries.items()
+        }
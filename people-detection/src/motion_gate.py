@@ -0,0 +1,109 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/motion_gate.py
+
+import time
+
+import cv2
+import numpy as np
+
+
+# ---------------------------------------------------------
+# 모션 게이트: 정지 화면이면 YOLO 추론을 건너뛴다
+# ---------------------------------------------------------
+class MotionGate:
+    """
+    cctv_id별로 축소한 흑백 프레임을 직전 프레임과 비교(frame differencing)한다.
+    - 변화한 픽셀 비율 >= sensitivity 이면 추론 실행
+    - 활성 track이 있으면 항상 실행 (가만히 서 있는 사람의 얼굴 blur 유지)
+    - refresh_every 프레임마다 한 번은 강제로 실행
+    - 마지막으로 추론한 프레임의 얼굴 영역을 기억해 두고, 건너뛴 프레임에도 그대로 익명화에 쓴다
+    """
+
+    def __init__(self, sensitivity=0.005, pixel_threshold=25, downscale_width=160,
+                 refresh_every=30, enabled=True, camera_idle_seconds=300.0):
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.refresh_every = max(1, int(refresh_every))
+        self.enabled = enabled
+        self.camera_idle_seconds = camera_idle_seconds
+        self._cameras = {}
+
+    def _small_gray(self, frame_bgr):
+        h, w = frame_bgr.shape[:2]
+        scale = self.downscale_width / float(w) if w > self.downscale_width else 1.0
+        small = cv2.resize(frame_bgr, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_run(self, cctv_id, frame_bgr, has_active_tracks=False):
+        now = time.monotonic()
+        cam = self._cameras.get(cctv_id)
+        if cam is None:
+            cam = {"prev": None, "since_run": 0, "frames": 0, "skipped": 0,
+                   "last_change": 0.0, "last_seen": now, "faces": None}
+            self._cameras[cctv_id] = cam
+            self._prune(now)
+        cam["frames"] += 1
+        cam["last_seen"] = now
+
+        if not self.enabled:
+            return True
+
+        small = self._small_gray(frame_bgr)
+        prev = cam["prev"]
+        cam["prev"] = small
+
+        if prev is None or prev.shape != small.shape:
+            changed = 1.0
+        else:
+            diff = cv2.absdiff(small, prev)
+            changed = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        cam["last_change"] = changed
+
+        run = (
+            has_active_tracks
+            or changed >= self.sensitivity
+            or cam["since_run"] + 1 >= self.refresh_every
+        )
+        if run:
+            cam["since_run"] = 0
+        else:
+            cam["since_run"] += 1
+            cam["skipped"] += 1
+        return run
+
+    def remember_faces(self, cctv_id, areas, valid):
+        """추론한 프레임의 얼굴 영역 (should_run이 False인 프레임에 재사용)"""
+        cam = self._cameras.get(cctv_id)
+        if cam is not None:
+            cam["faces"] = (areas, valid)
+
+    def last_faces(self, cctv_id):
+        """(areas, valid) 또는 None"""
+        cam = self._cameras.get(cctv_id)
+        return cam["faces"] if cam is not None else None
+
+    def _prune(self, now):
+        for cid in [c for c, cam in self._cameras.items()
+                    if now - cam["last_seen"] > self.camera_idle_seconds]:
+            del self._cameras[cid]
+
+    def stats(self):
+        frames = sum(c["frames"] for c in self._cameras.values())
+        skipped = sum(c["skipped"] for c in self._cameras.values())
+        return {
+            "enabled": self.enabled,
+            "frames": frames,
+            "skipped": skipped,
+            "skip_ratio": (skipped / frames) if frames else 0.0,
+            "cameras": {
+                cid: {
+                    "frames": c["frames"],
+                    "skipped": c["skipped"],
+                    "skip_ratio": (c["skipped"] / c["frames"]) if c["frames"] else 0.0,
+                    "last_change": c["last_change"],
+                }
+                for cid, c in self._cameras.items()
+            },
+        }
@@ -0,0 +1,94 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/quality_gate.py
+
+import cv2
+import numpy as np
+
+
+# ---------------------------------------------------------
+# crop 품질 게이트: 분류/업로드할 가치가 없는 crop은 걸러낸다
+# ---------------------------------------------------------
+class CropQualityGate:
+    """
+    1) check(box, keypoints): crop 전에 싼 조건 검사
+       - 최소 크기 (min_width x min_height)
+       - 세로/가로 비율 (min_aspect ~ max_aspect, 서 있는 사람 기준)
+       - 보이는 keypoint 수 (conf > keypoint_conf 인 것이 min_visible_keypoints개 이상)
+    2) check_sharpness(crop): crop 후 선명도 검사
+       - sharpness_width 폭으로 줄인 흑백 crop의 Laplacian 분산 >= min_sharpness
+    통과 못 한 crop은 사유별로 세기만 하고 분류/업로드하지 않는다.
+    """
+
+    def __init__(self, min_width=24, min_height=48, min_aspect=1.0, max_aspect=5.0,
+                 min_visible_keypoints=5, keypoint_conf=0.3, min_sharpness=15.0,
+                 sharpness_width=64, enabled=True):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_aspect = min_aspect
+        self.max_aspect = max_aspect
+        self.min_visible_keypoints = min_visible_keypoints
+        self.keypoint_conf = keypoint_conf
+        self.min_sharpness = min_sharpness
+        self.sharpness_width = sharpness_width
+        self.enabled = enabled
+
+        # metrics
+        self.checked = 0
+        self.passed = 0
+        self.rejected = {"too_small": 0, "aspect_ratio": 0, "occluded": 0, "blurry": 0}
+        self.sharpness_total = 0.0
+        self.sharpness_count = 0
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        return reason
+
+    def check(self, box, keypoints=None):
+        """returns: 실패 사유 문자열 / 통과면 None"""
+        self.checked += 1
+        if not self.enabled:
+            return None
+        x1, y1, x2, y2 = box
+        w, h = x2 - x1, y2 - y1
+        if w < self.min_width or h < self.min_height:
+            return self._reject("too_small")
+        aspect = h / float(w)
+        if aspect < self.min_aspect or aspect > self.max_aspect:
+            return self._reject("aspect_ratio")
+        if keypoints is not None and self.min_visible_keypoints > 0:
+            keypoints = np.asarray(keypoints)
+            if keypoints.ndim == 2 and keypoints.shape[1] == 3:
+                visible = int(np.count_nonzero(keypoints[:, 2] > self.keypoint_conf))
+                if visible < self.min_visible_keypoints:
+                    return self._reject("occluded")
+        return None
+
+    def sharpness(self, crop_bgr):
+        h, w = crop_bgr.shape[:2]
+        if w > self.sharpness_width:
+            crop_bgr = cv2.resize(crop_bgr, (self.sharpness_width, max(1, int(h * self.sharpness_width / w))),
+                                  interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY)
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    def check_sharpness(self, crop_bgr):
+        """check()를 통과한 crop에 대해 호출. returns: 실패 사유 / 통과면 None"""
+        if not self.enabled or self.min_sharpness <= 0:
+            self.passed += 1
+            return None
+        score = self.sharpness(crop_bgr)
+        self.sharpness_total += score
+        self.sharpness_count += 1
+        if score < self.min_sharpness:
+            return self._reject("blurry")
+        self.passed += 1
+        return None
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "checked": self.checked,
+            "passed": self.passed,
+            "rejected": dict(self.rejected),
+            "pass_ratio": (self.passed / self.checked) if self.checked else 0.0,
+            "avg_sharpness": (self.sharpness_total / self.sharpness_count) if self.sharpness_count else 0.0,
+        }
@@ -0,0 +1,225 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/scheduler.py
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+
+
+# ---------------------------------------------------------
+# 멀티 카메라 공정 스케줄러
+# ---------------------------------------------------------
+class FrameScheduler:
+    """
+    cctv_id별 큐에 프레임을 받고, concurrency개의 워커가 카메라를 돌아가며 꺼내 처리한다.
+    (tracking 순서가 섞이지 않도록 한 카메라의 프레임은 한 번에 하나씩만 처리)
+    - policy='round_robin': 대기 프레임이 있는 카메라를 차례로 / 'weighted': weight 비율로 (stride scheduling)
+    - 카메라별 target_fps 예산 (토큰 버킷, burst 2) 초과분은 들어오는 즉시 버림 (over_budget)
+    - 카메라별 큐는 queue_size개까지, 넘치면 가장 오래된 프레임을 버림 (overflow)
+    - 꺼냈을 때 max_lag초보다 오래된 프레임은 버림 (stale)
+    전체 요청이 처리 용량을 넘으면 모든 카메라 큐가 차고, 서비스는 카메라별로 번갈아 주어지므로
+    버려지는 비율이 카메라 간에 고르게 나뉜다.
+
+    submit()은 Future를 돌려준다: 처리 결과 / 버려지면 None
+    process_fn은 submit()을 호출한 쪽의 context에서 실행된다 (요청별 ContextVar, 예: Server-Timing 유지)
+    captured_at은 time.time() 기준 (지연 = 처리 완료 시각 - captured_at)
+    """
+
+    def __init__(self, process_fn, concurrency=8, default_fps=5.0, queue_size=2, max_lag=2.0,
+                 policy="round_robin", camera_idle_seconds=300.0, fps_window=10.0):
+        if policy not in ("round_robin", "weighted"):
+            raise ValueError(f"Unknown scheduler policy: {policy}")
+        self.process_fn = process_fn
+        self.concurrency = max(1, int(concurrency))
+        self.default_fps = float(default_fps)
+        self.queue_size = max(1, int(queue_size))
+        self.max_lag = max_lag
+        self.policy = policy
+        self.camera_idle_seconds = camera_idle_seconds
+        self.fps_window = fps_window
+
+        self._cameras = {}
+        self._vtime = 0.0
+        self._ready = None
+        self._workers = []
+        self.inflight = 0
+
+    # ---- 카메라 설정 ----
+    def _camera(self, cctv_id, now=None):
+        cam = self._cameras.get(cctv_id)
+        if cam is None:
+            now = now if now is not None else time.monotonic()
+            cam = {
+                "target_fps": self.default_fps, "weight": 1.0, "pinned": False,
+                "queue": deque(), "pass": self._vtime, "busy": False,
+                "tokens": 2.0, "refilled": now, "last_seen": now,
+                "received": 0, "processed": 0, "errors": 0,
+                "shed": {"over_budget": 0, "overflow": 0, "stale": 0},
+                "done_times": deque(), "lag_total": 0.0, "last_lag": None,
+            }
+            self._cameras[cctv_id] = cam
+            self._prune(now)
+        return cam
+
+    def configure(self, cctv_id, target_fps=None, weight=None):
+        """카메라별 FPS 예산/가중치 지정 (지정한 카메라는 idle이어도 정리하지 않음)"""
+        cam = self._camera(cctv_id)
+        cam["pinned"] = True
+        if target_fps is not None:
+            cam["target_fps"] = float(target_fps)
+        if weight is not None:
+            cam["weight"] = max(0.01, float(weight))
+        return cam
+
+    def remove(self, cctv_id):
+        cam = self._cameras.pop(cctv_id, None)
+        if cam is not None:
+            while cam["queue"]:
+                self._resolve(cam["queue"].popleft()[2], None)
+
+    def _prune(self, now):
+        for cid in [c for c, cam in self._cameras.items()
+                    if not cam["pinned"] and not cam["queue"] and now - cam["last_seen"] > self.camera_idle_seconds]:
+            del self._cameras[cid]
+
+    # ---- 입력 ----
+    @staticmethod
+    def _resolve(fut, result):
+        if not fut.done():
+            fut.set_result(result)
+
+    def submit(self, cctv_id, frame, captured_at=None, **kwargs):
+        fut = asyncio.get_running_loop().create_future()
+        now = time.monotonic()
+        cam = self._camera(cctv_id, now)
+        cam["received"] += 1
+        cam["last_seen"] = now
+
+        # FPS 예산 (토큰 버킷)
+        if cam["target_fps"] > 0:
+            cam["tokens"] = min(2.0, cam["tokens"] + (now - cam["refilled"]) * cam["target_fps"])
+            cam["refilled"] = now
+            if cam["tokens"] < 1.0:
+                cam["shed"]["over_budget"] += 1
+                self._resolve(fut, None)
+                return fut
+            cam["tokens"] -= 1.0
+
+        if not cam["queue"]:
+            # 쉬던 카메라가 밀린 몫을 한꺼번에 가져가지 않도록 현재 가상 시간부터 시작
+            cam["pass"] = max(cam["pass"], self._vtime)
+        elif len(cam["queue"]) >= self.queue_size:
+            cam["shed"]["overflow"] += 1
+            self._resolve(cam["queue"].popleft()[2], None)
+        cam["queue"].append((frame, captured_at if captured_at is not None else time.time(), fut, kwargs,
+                             contextvars.copy_context()))
+        if self._ready is not None:
+            self._ready.set()
+        return fut
+
+    async def run(self, cctv_id, frame, **kwargs):
+        """submit 후 결과를 기다린다 (버려지면 None)"""
+        return await self.submit(cctv_id, frame, **kwargs)
+
+    # ---- 워커 ----
+    def _pick(self):
+        best_id, best = None, None
+        for cid, cam in self._cameras.items():
+            if cam["queue"] and not cam["busy"] and (best is None or cam["pass"] < best["pass"]):
+                best_id, best = cid, cam
+        if best is None:
+            return None, None
+        self._vtime = best["pass"]
+        best["pass"] += 1.0 / (best["weight"] if self.policy == "weighted" else 1.0)
+        return best_id, best
+
+    async def _worker(self):
+        while True:
+            cctv_id, cam = self._pick()
+            if cam is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            frame, captured_at, fut, kwargs, context = cam["queue"].popleft()
+            if fut.done():
+                continue  # 요청한 쪽이 취소함
+            now = time.time()
+            if self.max_lag and now - captured_at > self.max_lag:
+                cam["shed"]["stale"] += 1
+                self._resolve(fut, None)
+                continue
+
+            cam["busy"] = True
+            self.inflight += 1
+            try:
+                # 워커 태스크는 start() 시점의 context이므로 요청 context에서 따로 실행
+                result = await asyncio.create_task(self.process_fn(frame, cctv_id, **kwargs), context=context)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                cam["errors"] += 1
+                if not fut.done():
+                    fut.set_exception(e)
+                continue
+            finally:
+                cam["busy"] = False
+                self.inflight -= 1
+                if cam["queue"]:
+                    self._ready.set()
+
+            done = time.time()
+            cam["processed"] += 1
+            cam["last_lag"] = done - captured_at
+            cam["lag_total"] += cam["last_lag"]
+            cam["done_times"].append(done)
+            while cam["done_times"] and done - cam["done_times"][0] > self.fps_window:
+                cam["done_times"].popleft()
+            self._resolve(fut, result)
+
+    async def start(self):
+        if not self._workers:
+            self._ready = asyncio.Event()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for cam in self._cameras.values():
+            while cam["queue"]:
+                self._resolve(cam["queue"].popleft()[2], None)
+
+    # ---- 지표 ----
+    def _achieved_fps(self, cam, now):
+        times = [t for t in cam["done_times"] if now - t <= self.fps_window]
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / max(times[-1] - times[0], 1e-6)
+
+    def stats(self):
+        now = time.time()
+        cameras = {}
+        for cid, cam in self._cameras.items():
+            shed = sum(cam["shed"].values())
+            cameras[cid] = {
+                "target_fps": cam["target_fps"],
+                "weight": cam["weight"],
+                "achieved_fps": round(self._achieved_fps(cam, now), 2),
+                "queued": len(cam["queue"]),
+                "received": cam["received"],
+                "processed": cam["processed"],
+                "errors": cam["errors"],
+                "shed": dict(cam["shed"]),
+                "shed_ratio": (shed / cam["received"]) if cam["received"] else 0.0,
+                "last_lag_ms": cam["last_lag"] * 1000.0 if cam["last_lag"] is not None else None,
+                "avg_lag_ms": (cam["lag_total"] / cam["processed"] * 1000.0) if cam["processed"] else 0.0,
+            }
+        return {
+            "policy": self.policy,
+            "concurrency": self.concurrency,
+            "inflight": self.inflight,
+            "queued": sum(len(c["queue"]) for c in self._cameras.values()),
+            "cameras": cameras,
+        }
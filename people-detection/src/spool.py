@@ -0,0 +1,279 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/spool.py
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+# ---------------------------------------------------------
+# 서킷 브레이커: 하위 서비스가 계속 실패하면 잠시 호출을 멈춘다
+# ---------------------------------------------------------
+class CircuitBreaker:
+    """
+    closed    : 정상. 연속 실패가 failure_threshold번이면 open
+    open      : reset_timeout초 동안 호출하지 않음 (allow() == False)
+    half_open : reset_timeout이 지나면 시험 호출 1개만 허용 -> 성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+        # metrics
+        self.opens = 0
+        self.rejected = 0
+
+    def allow(self):
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open":
+            if self._trial:
+                self.rejected += 1
+                return False
+            self._trial = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+    def release_trial(self):
+        """half_open 시험 호출이 결과 없이 끝났으면 다음 호출이 시험할 수 있게 한다"""
+        if self.state == "half_open":
+            self._trial = False
+
+    def retry_after(self):
+        """open 상태에서 시험 호출까지 남은 시간(초)"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 2),
+        }
+
+
+# ---------------------------------------------------------
+# 디스크 스풀: 전송 전에 감지 결과 + crop을 SQLite에 기록
+# ---------------------------------------------------------
+class DetectionSpool:
+    """
+    SQLite(WAL) 파일 하나에 전송 대기 항목을 쌓는다 (프로세스가 죽어도 남음).
+    - append(item): 쓰기 스레드 큐에 넣고 바로 반환. 쓰기 스레드가 모아서 한 트랜잭션으로 INSERT
+    - lease(limit, lease_seconds): 재시도 시각이 된 항목을 오래된 순으로 가져오고
+      lease_seconds 동안은 다시 나가지 않게 한다 (그 안에 ack/nack이 없으면 다시 전송 = at-least-once)
+    - ack(ids): 전송 완료 -> 삭제 / nack(ids, delay): attempts+1, delay초 뒤 재시도
+    - max_bytes를 넘으면 가장 오래된 항목부터 버린다 (dropped)
+    item의 'image'(JPEG bytes)는 BLOB 컬럼, 나머지 필드는 JSON으로 저장한다.
+    """
+
+    def __init__(self, path, max_bytes=1 << 30, write_batch=200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.write_batch = max(1, int(write_batch))
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created_at REAL NOT NULL,"
+            " next_attempt REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " payload TEXT NOT NULL,"
+            " image BLOB,"
+            " size INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS spool_next_attempt ON spool (next_attempt, id)")
+        self._lock = threading.Lock()
+
+        self.pending, self.bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM spool"
+        ).fetchone()
+        if self.pending:
+            print(f"[INFO] spool {path}: {self.pending} items left from previous run")
+
+        # metrics
+        self.appended = 0
+        self.acked = 0
+        self.nacked = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="spool-writer", daemon=True)
+        self._writer.start()
+
+    # ---- 쓰기 스레드 ----
+    def append(self, item):
+        """논블로킹 (이벤트 루프에서 호출)"""
+        self._writes.put(item)
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            if item is None:
+                return
+            items = [item]
+            while len(items) < self.write_batch:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._insert(items)
+                    return
+                items.append(item)
+            self._insert(items)
+
+    def _insert(self, items):
+        now = time.time()
+        rows = []
+        for item in items:
+            image = item.get("image")
+            payload = json.dumps({k: v for k, v in item.items() if k != "image"})
+            rows.append((now, now, payload, image, len(payload) + (len(image) if image else 0)))
+        try:
+            with self._lock:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT INTO spool (created_at, next_attempt, payload, image, size) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                self._db.execute("COMMIT")
+                self.pending += len(rows)
+                self.bytes += sum(r[4] for r in rows)
+                self.appended += len(rows)
+                if self.max_bytes and self.bytes > self.max_bytes:
+                    self._evict()
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            print("[ERROR] spool write:", e)
+            try:
+                with self._lock:
+                    self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def _evict(self):
+        """(lock 보유 상태) 용량을 넘긴 만큼 오래된 항목부터 삭제"""
+        over = self.bytes - self.max_bytes
+        victims, freed = [], 0
+        for row_id, size in self._db.execute("SELECT id, size FROM spool ORDER BY id"):
+            if freed >= over:
+                break
+            victims.append((row_id,))
+            freed += size
+        self._db.executemany("DELETE FROM spool WHERE id = ?", victims)
+        self.pending -= len(victims)
+        self.bytes -= freed
+        self.dropped += len(victims)
+        print(f"[WARN] spool over {self.max_bytes} bytes, dropped {len(victims)} oldest items")
+
+    # ---- 드레이너 (asyncio.to_thread로 호출) ----
+    def lease(self, limit, lease_seconds=60.0):
+        """returns: [(id, attempts, item), ...] (item['image']에 JPEG bytes)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            rows = self._db.execute(
+                "SELECT id, attempts, payload, image FROM spool WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                (now, int(limit))
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE spool SET next_attempt = ? WHERE id = ?", [(now + lease_seconds, r[0]) for r in rows]
+            )
+            self._db.execute("COMMIT")
+        leased = []
+        for row_id, attempts, payload, image in rows:
+            item = json.loads(payload)
+            item["image"] = image
+            leased.append((row_id, attempts, item))
+        return leased
+
+    def ack(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute("BEGIN")
+            freed = 0
+            for row_id in ids:
+                row = self._db.execute("SELECT size FROM spool WHERE id = ?", (row_id,)).fetchone()
+                if row is None:
+                    continue  # 용량 초과로 이미 버려짐
+                self._db.execute("DELETE FROM spool WHERE id = ?", (row_id,))
+                freed += row[0]
+                self.pending -= 1
+                self.acked += 1
+            self._db.execute("COMMIT")
+            self.bytes -= freed
+
+    def nack(self, ids, delay):
+        if not ids:
+            return
+        with self._lock:
+            self._db.executemany(
+                "UPDATE spool SET attempts = attempts + 1, next_attempt = ? WHERE id = ?",
+                [(time.time() + delay, row_id) for row_id in ids]
+            )
+            self.nacked += len(ids)
+
+    def update(self, row_id, item):
+        """전송 전에 바뀐 필드(예: 재분류한 gender/age)를 저장"""
+        payload = json.dumps({k: v for k, v in item.items() if k != "image"})
+        with self._lock:
+            self._db.execute("UPDATE spool SET payload = ? WHERE id = ?", (payload, row_id))
+
+    def oldest_age(self):
+        with self._lock:
+            row = self._db.execute("SELECT MIN(created_at) FROM spool").fetchone()
+        return (time.time() - row[0]) if row and row[0] else None
+
+    def close(self):
+        """남은 쓰기를 마치고 닫는다 (블로킹)"""
+        self._writes.put(None)
+        self._writer.join()
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "pending": self.pending,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "write_queue": self._writes.qsize(),
+            "appended": self.appended,
+            "acked": self.acked,
+            "nacked": self.nacked,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+        }
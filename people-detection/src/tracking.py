@@ -0,0 +1,166 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/tracking.py
+
+import itertools
+import time
+
+import numpy as np
+
+# track_id는 프로세스 전체에서 유일 (여러 TrackerPool이 같은 cctv_id를 다뤄도 충돌 없음)
+_track_ids = itertools.count(1)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """(N,4) x (M,4) xyxy -> (N,M) IoU"""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :]
+    ix1 = np.maximum(a[..., 0], b[..., 0])
+    iy1 = np.maximum(a[..., 1], b[..., 1])
+    ix2 = np.minimum(a[..., 2], b[..., 2])
+    iy2 = np.minimum(a[..., 3], b[..., 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+# ---------------------------------------------------------
+# 카메라 1대의 IoU 기반 다중 객체 추적기
+# ---------------------------------------------------------
+class IoUTracker:
+    """
+    프레임 간 박스를 IoU(등속 예측 보정)로 매칭해 안정적인 track_id를 유지한다.
+    - min_hits 번 연속으로 잡히면 confirmed (그 프레임에서만 just_confirmed=True)
+    - max_idle_seconds 동안 안 보이면 만료
+    """
+
+    def __init__(self, iou_threshold=0.3, min_hits=3, max_idle_seconds=2.0):
+        self.iou_threshold = iou_threshold
+        self.min_hits = max(1, int(min_hits))
+        self.max_idle_seconds = max_idle_seconds
+        self.tracks = {}
+        self.last_update = time.monotonic()
+
+    def _predicted_box(self, track, now):
+        dt = now - track["last_seen"]
+        return track["box"] + track["velocity"] * dt
+
+    def update(self, boxes, now=None):
+        """
+        boxes: (N,4) xyxy
+        returns: 박스 순서대로 [(track_id, confirmed, just_confirmed), ...] 와 만료된 track 리스트
+        """
+        now = time.monotonic() if now is None else now
+        self.last_update = now
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+        # 1) 만료
+        expired = [t for t in self.tracks.values() if now - t["last_seen"] > self.max_idle_seconds]
+        for t in expired:
+            del self.tracks[t["id"]]
+
+        # 2) greedy IoU 매칭 (IoU 큰 쌍부터)
+        track_list = list(self.tracks.values())
+        predicted = [self._predicted_box(t, now) for t in track_list]
+        ious = iou_matrix(boxes, predicted)
+
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        if ious.size:
+            for flat in np.argsort(-ious, axis=None):
+                d, t = np.unravel_index(flat, ious.shape)
+                if ious[d, t] < self.iou_threshold:
+                    break
+                if assigned[d] is not None or t in used_tracks:
+                    continue
+                assigned[d] = track_list[t]
+                used_tracks.add(t)
+
+        # 3) 갱신 / 신규 생성
+        out = []
+        for d, box in enumerate(boxes):
+            track = assigned[d]
+            if track is None:
+                track = {
+                    "id": next(_track_ids),
+                    "box": box,
+                    "velocity": np.zeros(4, dtype=np.float32),
+                    "hits": 0,
+                    "confirmed": False,
+                    "created": now,
+                    "last_seen": now,
+                }
+                self.tracks[track["id"]] = track
+            else:
+                dt = now - track["last_seen"]
+                if dt > 0:
+                    # 속도는 지수평활로 완만하게
+                    track["velocity"] = 0.5 * track["velocity"] + 0.5 * (box - track["box"]) / dt
+                track["box"] = box
+                track["last_seen"] = now
+
+            track["hits"] += 1
+            just_confirmed = False
+            if not track["confirmed"] and track["hits"] >= self.min_hits:
+                track["confirmed"] = True
+                just_confirmed = True
+            out.append((track["id"], track["confirmed"], just_confirmed))
+
+        return out, expired
+
+
+# ---------------------------------------------------------
+# cctv_id별 추적기 모음
+# ---------------------------------------------------------
+class TrackerPool:
+    def __init__(self, iou_threshold=0.3, min_hits=3, max_idle_seconds=2.0, camera_idle_seconds=300.0):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_idle_seconds = max_idle_seconds
+        self.camera_idle_seconds = camera_idle_seconds
+        self.trackers = {}
+        self.total_tracks = 0
+        self.total_confirmed = 0
+
+    def get(self, cctv_id):
+        trk = self.trackers.get(cctv_id)
+        if trk is None:
+            trk = IoUTracker(self.iou_threshold, self.min_hits, self.max_idle_seconds)
+            self.trackers[cctv_id] = trk
+        return trk
+
+    def active_count(self, cctv_id):
+        trk = self.trackers.get(cctv_id)
+        return len(trk.tracks) if trk is not None else 0
+
+    def update(self, cctv_id, boxes, now=None):
+        """returns: (assignments, expired) - expired의 각 track에는 소속 카메라 'cctv_id'가 들어 있다"""
+        now = time.monotonic() if now is None else now
+        trk = self.get(cctv_id)
+        before = len(trk.tracks)
+        assignments, expired = trk.update(boxes, now)
+
+        self.total_tracks += max(0, len(trk.tracks) - before + len(expired))
+        self.total_confirmed += sum(1 for _, _, jc in assignments if jc)
+
+        for track in expired:
+            track["cctv_id"] = cctv_id
+
+        # 오랫동안 프레임이 없는 카메라 상태 정리 (남아 있던 track도 만료로 돌려줘 결과가 전송되게 한다)
+        for cid in [c for c, t in self.trackers.items()
+                    if c != cctv_id and now - t.last_update > self.camera_idle_seconds]:
+            for track in self.trackers.pop(cid).tracks.values():
+                track["cctv_id"] = cid
+                expired.append(track)
+
+        return assignments, expired
+
+    def stats(self):
+        return {
+            "cameras": len(self.trackers),
+            "active_tracks": {cid: len(t.tracks) for cid, t in self.trackers.items()},
+            "total_tracks": self.total_tracks,
+            "total_confirmed": self.total_confirmed,
+        }
@@ -0,0 +1,209 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/video_job.py
+
+import asyncio
+import os
+import time
+import uuid
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import cv2
+
+from .tracking import TrackerPool
+
+
+# ---------------------------------------------------------
+# 작업 source 검사 (임의 URL/호스트 파일을 열지 않도록)
+# ---------------------------------------------------------
+def resolve_video_source(source, blob_account="", blob_container="", upload_dir=""):
+    """
+    허용하는 source만 돌려준다 (아니면 ValueError)
+    - https://<blob_account>.blob.core.windows.net/<blob_container>/... (SAS 쿼리 허용)
+    - upload_dir 기준 상대 파일 이름 -> 실제 경로 (절대 경로, '..', 디렉터리 밖은 거부)
+    """
+    if "://" in source:
+        url = urlparse(source)
+        if not blob_account:
+            raise ValueError("Blob URL sources are disabled (VIDEO_BLOB_ACCOUNT not set)")
+        if (url.scheme != "https" or url.username or url.password or url.port
+                or url.hostname != f"{blob_account}.blob.core.windows.net".lower()
+                or not url.path.startswith(f"/{blob_container}/")):
+            raise ValueError("source must be a Blob URL in the configured storage container")
+        return source
+
+    if not upload_dir:
+        raise ValueError("Local file sources are disabled (VIDEO_UPLOAD_DIR not set)")
+    if os.path.isabs(source) or ".." in source.replace("\\", "/").split("/"):
+        raise ValueError("source must be a file name relative to VIDEO_UPLOAD_DIR")
+    root = os.path.realpath(upload_dir)
+    path = os.path.realpath(os.path.join(root, source))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError("source file not found in VIDEO_UPLOAD_DIR")
+    return path
+
+
+# ---------------------------------------------------------
+# 업로드된/로컬 영상 파일을 서버에서 직접 분석하는 작업
+# ---------------------------------------------------------
+class VideoJob:
+    def __init__(self, source, cctv_id, recorded_at, sample_fps=2.0, batch_size=8):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.cctv_id = cctv_id
+        self.recorded_at = recorded_at  # 녹화 시작 시각 (감지 시각 = recorded_at + 영상 타임스탬프)
+        self.sample_fps = float(sample_fps)
+        self.batch_size = max(1, int(batch_size))
+
+        self.state = "queued"  # queued -> running -> done | failed | cancelled
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.source_fps = None
+        self.total_frames = None
+        self.frames_decoded = 0
+        self.frames_processed = 0
+        self.people_detected = 0
+        self.video_seconds = 0.0
+        self.cancelled = False
+        self.task = None
+
+    def status(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        progress = None
+        if self.total_frames:
+            progress = min(1.0, self.frames_decoded / self.total_frames)
+        return {
+            "id": self.id,
+            "source": self.source.split("?")[0],  # SAS 토큰은 노출하지 않음
+            "cctv_id": self.cctv_id,
+            "recorded_at": self.recorded_at.isoformat(),
+            "state": self.state,
+            "error": self.error,
+            "sample_fps": self.sample_fps,
+            "source_fps": self.source_fps,
+            "total_frames": self.total_frames,
+            "frames_decoded": self.frames_decoded,
+            "frames_processed": self.frames_processed,
+            "people_detected": self.people_detected,
+            "progress": progress,
+            "elapsed_seconds": elapsed,
+            "processed_fps": (self.frames_processed / elapsed) if elapsed else 0.0,
+            # 1.0보다 크면 실시간보다 빠르게 처리 중
+            "realtime_factor": (self.video_seconds / elapsed) if elapsed else 0.0,
+        }
+
+
+class VideoJobManager:
+    """
+    영상을 OpenCV로 스트리밍 디코딩하면서 sample_fps로 프레임을 뽑고,
+    PersonTracker의 배치 추론 -> 추적 -> 분류/전송 경로로 흘려보낸다.
+    - 건너뛰는 프레임은 grab()만 하고 retrieve()하지 않아 변환 비용을 줄인다
+    - 작업마다 별도 TrackerPool을 쓰고 시간은 영상 타임스탬프 기준
+      (추적은 영상 시간, 전송하는 감지 시각은 recorded_at + 영상 시간)
+    """
+
+    def __init__(self, tracker, max_concurrent_jobs=1, max_jobs_kept=100):
+        self.tracker = tracker
+        self.jobs = {}
+        self.max_jobs_kept = max_jobs_kept
+        self._semaphore = asyncio.Semaphore(max(1, int(max_concurrent_jobs)))
+
+    def submit(self, source, cctv_id, recorded_at, sample_fps=2.0, batch_size=8):
+        job = VideoJob(source, cctv_id, recorded_at, sample_fps, batch_size)
+        self.jobs[job.id] = job
+        self._prune()
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None and job.state in ("queued", "running"):
+            job.cancelled = True
+        return job
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.state in ("done", "failed", "cancelled")]
+        finished.sort(key=lambda j: j.created_at)
+        while len(self.jobs) > self.max_jobs_kept and finished:
+            del self.jobs[finished.pop(0).id]
+
+    @staticmethod
+    def _read_batch(cap, job, step, state):
+        """
+        (스레드에서 실행) 다음 샘플 프레임들을 최대 batch_size개 디코딩
+        returns: [(frame, timestamp_seconds), ...] / 끝이면 빈 리스트
+        """
+        frames = []
+        while len(frames) < job.batch_size:
+            if not cap.grab():
+                break
+            index = state["index"]
+            state["index"] += 1
+            job.frames_decoded += 1
+            if index < state["next_sample"]:
+                continue
+            state["next_sample"] += step
+            ok, frame = cap.retrieve()
+            if not ok or frame is None:
+                continue
+            frames.append((frame, index / job.source_fps))
+        return frames
+
+    async def _run(self, job):
+        async with self._semaphore:
+            if job.cancelled:
+                job.state = "cancelled"
+                return
+            job.state = "running"
+            job.started_at = time.time()
+            cap = None
+            trk = self.tracker.trackers
+            trackers = TrackerPool(trk.iou_threshold, trk.min_hits, trk.max_idle_seconds)
+            try:
+                cap = await asyncio.to_thread(cv2.VideoCapture, job.source)
+                if not cap.isOpened():
+                    raise RuntimeError("Failed to open video source")
+
+                job.source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+                job.total_frames = total if total > 0 else None
+                step = max(1.0, job.source_fps / job.sample_fps) if job.sample_fps > 0 else 1.0
+                state = {"index": 0, "next_sample": 0.0}
+
+                while not job.cancelled:
+                    batch = await asyncio.to_thread(self._read_batch, cap, job, step, state)
+                    if not batch:
+                        break
+
+                    # 라이브 요청과 같은 배처로 보내 한 번의 predict로 묶는다
+                    detections = await asyncio.gather(*[self.tracker.detect(f) for f, _ in batch])
+                    for (frame, ts), det in zip(batch, detections):
+                        await self.tracker.handle_detections(
+                            frame, det, job.cctv_id, trackers=trackers, now=ts, draw=False,
+                            detected_at=job.recorded_at + timedelta(seconds=ts)
+                        )
+                        job.frames_processed += 1
+                        job.people_detected += len(det["boxes"])
+                        job.video_seconds = ts
+
+                # 끝까지 남아 있는 track도 전송
+                remaining = list(trackers.get(job.cctv_id).tracks)
+                await asyncio.gather(*[self.tracker.flush_track(job.cctv_id, tid) for tid in remaining])
+
+                job.state = "cancelled" if job.cancelled else "done"
+            except Exception as e:
+                print("[ERROR] video job:", e)
+                job.state = "failed"
+                job.error = str(e)
+            finally:
+                if cap is not None:
+                    cap.release()
+                job.finished_at = time.time()
+                print(f"[INFO] video job {job.id} {job.state}: {job.status()['processed_fps']:.1f} fps")
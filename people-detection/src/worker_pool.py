@@ -0,0 +1,362 @@
+# /home/azureuser/FootTrafficReport/people-detection/src/worker_pool.py
+
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _worker_main(worker_id, model_path, device, num_threads, conf, iou, warmup_runs,
+                 slot_names, task_queue, result_queue):
+    """
+    추론 워커 프로세스.
+    - 자기 YOLO 인스턴스와 torch 스레드 수를 가진다
+    - task: (task_id, [(slot, shape) 또는 ndarray, ...]) / None이면 종료
+    - result: ("result", task_id, detections 리스트, error 문자열)
+    - start: ("start", worker_id, task_id, None) 작업을 가져갈 때 (워커가 죽으면 그 작업의 슬롯을 회수하기 위해)
+    """
+    if num_threads:
+        # torch import 전에 설정해야 OpenMP 풀 크기에 반영된다
+        os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    import torch
+    from ultralytics import YOLO
+
+    from .model_registry import to_detections
+
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    try:
+        model = YOLO(model_path)
+        dummy = np.zeros((640, 640, 3), dtype=np.uint8)
+        for _ in range(warmup_runs):
+            model.predict(dummy, device=device, classes=[0], verbose=False)
+    except Exception as e:
+        result_queue.put(("error", worker_id, None, str(e)))
+        return
+    result_queue.put(("ready", worker_id, None, None))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, frames_meta = task
+        result_queue.put(("start", worker_id, task_id, None))
+        try:
+            frames = []
+            for meta in frames_meta:
+                if isinstance(meta, np.ndarray):
+                    frames.append(meta)  # 슬롯보다 큰 프레임은 pickle로 전달됨
+                else:
+                    slot, shape = meta
+                    frames.append(np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf))
+            results = model.predict(frames, device=device, conf=conf, iou=iou, classes=[0], verbose=False)
+            result_queue.put(("result", task_id, [to_detections(r) for r in results], None))
+        except Exception as e:
+            result_queue.put(("result", task_id, None, str(e)))
+        finally:
+            # Result.orig_img가 공유 메모리 view를 잡고 있으므로 바로 놓는다
+            frames = results = None
+
+    for shm in slots:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+
+
+# ---------------------------------------------------------
+# 멀티 프로세스 추론 워커 풀 (공유 메모리로 프레임 전달)
+# ---------------------------------------------------------
+class InferenceWorkerPool:
+    """
+    API 프로세스는 디코딩된 프레임을 공유 메모리 슬롯에 복사하고 (slot, shape)만 큐로 보낸다.
+    워커 N개가 같은 task 큐에서 배치를 가져가 각자의 YOLO로 추론하고,
+    결과(boxes/scores/keypoints numpy)는 result 큐로 돌아온다.
+    - predict_batch(frames)는 블로킹 (InferenceBatcher가 스레드에서 호출)
+    - reload()는 새 워커 세트를 띄워 워밍업한 뒤 교체 (기존 워커는 남은 작업 후 종료)
+    - 죽은 워커는 감시 스레드가 다시 띄운다
+    - 타임아웃으로 포기한 작업의 슬롯은 워커가 아직 읽고 있을 수 있으므로 바로 돌려놓지 않고 격리했다가,
+      늦은 결과가 오거나 그 작업을 가져간 워커가 죽은 것을 확인한 뒤에 회수한다
+    """
+
+    def __init__(self, model_path, workers=2, threads_per_worker=None, device="cpu",
+                 conf=0.5, iou=0.5, slots_per_worker=16, slot_bytes=1920 * 1080 * 3,
+                 warmup_runs=2, task_timeout=30.0, start_timeout=180.0):
+        self.model_path = model_path
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.device = device
+        self.conf = conf
+        self.iou = iou
+        self.slot_bytes = int(slot_bytes)
+        self.slot_count = self.workers * max(1, int(slots_per_worker))
+        self.warmup_runs = warmup_runs
+        self.task_timeout = task_timeout
+        self.start_timeout = start_timeout
+
+        self._ctx = mp.get_context("spawn")
+        self._slots = []
+        self._free_slots = queue.Queue()
+        self._result_queue = None
+        self._generation = None  # {"task_queue", "processes", "model_path"}
+        self._pending = {}
+        self._abandoned = {}  # task_id -> 격리된 슬롯 (타임아웃 후 결과 대기 중)
+        self._pending_lock = threading.Lock()
+        self._running = {}    # worker_id -> 마지막으로 가져간 task_id
+        self._ready = {}
+        self._ready_cond = threading.Condition()
+        self._reload_lock = threading.Lock()
+        self._task_ids = itertools.count(1)
+        self._worker_ids = itertools.count(1)
+        self._dispatcher = None
+        self._stopping = False
+
+        # metrics
+        self.tasks = 0
+        self.frames = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.pickled_frames = 0
+        self.restarts = 0
+        self.total_roundtrip = 0.0
+
+    # ---- lifecycle ----
+    def start(self):
+        if self._generation is not None:
+            return
+        self._stopping = False
+        self._slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                       for _ in range(self.slot_count)]
+        for i in range(self.slot_count):
+            self._free_slots.put(i)
+        self._result_queue = self._ctx.Queue()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="inference-pool-results", daemon=True)
+        self._dispatcher.start()
+        try:
+            self._generation = self._spawn_generation(self.model_path)
+        except Exception:
+            self._result_queue.put(None)
+            self._dispatcher.join(timeout=5)
+            self._free_shared_memory()
+            raise
+        print(f"[INFO] inference pool started: {self.workers} workers x {self.threads_per_worker} threads, "
+              f"{self.slot_count} shm slots")
+
+    def _spawn_process(self, task_queue, model_path, worker_id):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, model_path, self.device, self.threads_per_worker, self.conf, self.iou,
+                  self.warmup_runs, [s.name for s in self._slots],
+                  task_queue, self._result_queue),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    def _spawn_generation(self, model_path):
+        """워커 세트를 띄우고 모두 ready가 될 때까지 기다린다"""
+        task_queue = self._ctx.Queue()
+        ids = [next(self._worker_ids) for _ in range(self.workers)]
+        processes = {wid: self._spawn_process(task_queue, model_path, wid) for wid in ids}
+
+        deadline = time.monotonic() + self.start_timeout
+        with self._ready_cond:
+            while True:
+                states = [self._ready.get(w) for w in ids]
+                if all(s is True for s in states):
+                    break
+                failed = [s for s in states if isinstance(s, str)]
+                remaining = deadline - time.monotonic()
+                if failed or remaining <= 0:
+                    for p in processes.values():
+                        p.terminate()
+                    raise RuntimeError(f"inference workers failed to start: {failed or 'timeout'}")
+                self._ready_cond.wait(timeout=min(1.0, remaining))
+        return {"task_queue": task_queue, "processes": processes, "model_path": model_path}
+
+    def _stop_generation(self, gen, timeout=30.0):
+        for _ in gen["processes"]:
+            gen["task_queue"].put(None)
+        for wid, p in gen["processes"].items():
+            p.join(timeout=timeout)
+            if p.is_alive():
+                p.terminate()
+                self._fail_running_task(wid)  # 정상 종료한 워커는 결과를 모두 보냈다
+
+    def reload(self, model_path=None):
+        """새 모델로 워커 세트를 교체 (실패 시 기존 워커 유지)"""
+        with self._reload_lock:
+            model_path = model_path or self._generation["model_path"]
+            new_gen = self._spawn_generation(model_path)
+            old_gen, self._generation = self._generation, new_gen
+            self.model_path = model_path
+        threading.Thread(target=self._stop_generation, args=(old_gen,), daemon=True).start()
+
+    def stop(self):
+        if self._generation is None:
+            return
+        self._stopping = True
+        self._stop_generation(self._generation)
+        self._generation = None
+        self._result_queue.put(None)
+        self._dispatcher.join(timeout=5)
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._abandoned = {}
+            self._running = {}
+        for fut, _, _ in pending.values():
+            if not fut.done():
+                fut.set_exception(RuntimeError("Inference pool stopped"))
+        self._free_shared_memory()
+
+    def _free_shared_memory(self):
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots = []
+        self._free_slots = queue.Queue()
+
+    # ---- results ----
+    def _dispatch_loop(self):
+        while True:
+            try:
+                msg = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if msg is None:
+                return
+            kind, key, detections, error = msg
+            if kind == "start":
+                with self._pending_lock:
+                    self._running[key] = detections  # key=worker_id, 세 번째 값=task_id
+                continue
+            if kind in ("ready", "error"):
+                with self._ready_cond:
+                    self._ready[key] = True if kind == "ready" else error
+                    self._ready_cond.notify_all()
+                if kind == "error":
+                    print(f"[ERROR] inference worker {key}:", error)
+                continue
+
+            with self._pending_lock:
+                entry = self._pending.pop(key, None)
+                abandoned = self._abandoned.pop(key, None)
+            if entry is None:
+                # 타임아웃으로 이미 포기한 작업: 워커가 슬롯을 다 읽었으므로 이제 회수
+                if abandoned is not None:
+                    self._release(abandoned)
+                continue
+            fut, slots, t0 = entry
+            self._release(slots)
+            self.total_roundtrip += time.perf_counter() - t0
+            if error is not None:
+                self.errors += 1
+                fut.set_exception(RuntimeError(error))
+            else:
+                fut.set_result(detections)
+
+    def _check_workers(self):
+        gen = self._generation
+        if gen is None or self._stopping:
+            return
+        for wid, proc in list(gen["processes"].items()):
+            if proc.is_alive():
+                continue
+            print(f"[WARN] inference worker {wid} exited ({proc.exitcode}), restarting")
+            self.restarts += 1
+            self._fail_running_task(wid)
+            new_id = next(self._worker_ids)
+            gen["processes"].pop(wid)
+            gen["processes"][new_id] = self._spawn_process(gen["task_queue"], gen["model_path"], new_id)
+
+    def _fail_running_task(self, worker_id):
+        """죽은 워커가 처리하던 작업은 결과가 오지 않으므로 실패 처리하고 슬롯을 회수"""
+        with self._pending_lock:
+            task_id = self._running.pop(worker_id, None)
+            if task_id is None:
+                return
+            entry = self._pending.pop(task_id, None)
+            abandoned = self._abandoned.pop(task_id, None)
+        if entry is not None:
+            fut, abandoned, _ = entry
+            self.errors += 1
+            fut.set_exception(RuntimeError(f"Inference worker {worker_id} exited"))
+        if abandoned is not None:
+            self._release(abandoned)
+
+    def _release(self, slots):
+        for s in slots:
+            self._free_slots.put(s)
+
+    # ---- submit ----
+    def predict_batch(self, frames):
+        """frames(BGR uint8)와 같은 순서의 detections 리스트 (블로킹)"""
+        gen = self._generation
+        if gen is None:
+            raise RuntimeError("Inference pool is not started")
+
+        slots, meta = [], []
+        try:
+            for frame in frames:
+                frame = np.ascontiguousarray(frame, dtype=np.uint8)
+                if frame.nbytes > self.slot_bytes:
+                    self.pickled_frames += 1
+                    meta.append(frame)
+                    continue
+                slot = self._free_slots.get(timeout=self.task_timeout)
+                slots.append(slot)
+                np.ndarray(frame.shape, dtype=np.uint8, buffer=self._slots[slot].buf)[:] = frame
+                meta.append((slot, frame.shape))
+        except queue.Empty:
+            self._release(slots)
+            raise RuntimeError("No free shared-memory slot")
+
+        task_id = next(self._task_ids)
+        fut = Future()
+        with self._pending_lock:
+            self._pending[task_id] = (fut, slots, time.perf_counter())
+        gen["task_queue"].put((task_id, meta))
+        self.tasks += 1
+        self.frames += len(frames)
+
+        try:
+            return fut.result(timeout=self.task_timeout)
+        except FutureTimeout:
+            # 워커가 아직 슬롯을 읽고 있을 수 있으므로 돌려놓지 않고 늦은 결과가 올 때까지 격리
+            with self._pending_lock:
+                entry = self._pending.pop(task_id, None)
+                if entry is not None and entry[1]:
+                    self._abandoned[task_id] = entry[1]
+            self.timeouts += 1
+            raise RuntimeError(f"Inference task {task_id} timed out")
+
+    def stats(self):
+        gen = self._generation
+        done = self.tasks - self.timeouts - len(self._pending)
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "alive_workers": sum(p.is_alive() for p in gen["processes"].values()) if gen else 0,
+            "model_path": self.model_path,
+            "slot_count": self.slot_count,
+            "free_slots": self._free_slots.qsize(),
+            "quarantined_slots": sum(len(s) for s in list(self._abandoned.values())),
+            "pending_tasks": len(self._pending),
+            "tasks": self.tasks,
+            "frames": self.frames,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "pickled_frames": self.pickled_frames,
+            "restarts": self.restarts,
+            "avg_roundtrip_ms": (self.total_roundtrip / done * 1000.0) if done > 0 else 0.0,
+        }
@@ -0,0 +1,41 @@
+import asyncio
+
+from src.metrics import StageTimer, request_timings
+from src.scheduler import FrameScheduler
+
+
+async def _request(scheduler, timer, cctv_id):
+    """server_timing 미들웨어와 같은 방식으로 요청 context에 timings를 두고 스케줄러를 거친다"""
+    timings = {}
+    token = request_timings.set(timings)
+    try:
+        result = await scheduler.run(cctv_id, "frame")
+    finally:
+        request_timings.reset(token)
+    return result, timings, StageTimer.server_timing_header(timings)
+
+
+def test_server_timing_keeps_pipeline_stages_with_scheduler():
+    timer = StageTimer(enabled=True)
+
+    async def process(frame, cctv_id):
+        with timer.stage("inference", cctv_id):
+            await asyncio.sleep(0)
+        with timer.stage("tracking", cctv_id):
+            pass
+        return cctv_id
+
+    async def main():
+        # 워커는 요청 context 밖(여기)에서 시작된다
+        scheduler = FrameScheduler(process, concurrency=2, default_fps=0)
+        await scheduler.start()
+        try:
+            return await asyncio.gather(*[_request(scheduler, timer, cctv_id) for cctv_id in (1, 2, 3)])
+        finally:
+            await scheduler.stop()
+
+    for cctv_id, (result, timings, header) in zip((1, 2, 3), asyncio.run(main())):
+        assert result == cctv_id
+        assert set(timings) == {"inference", "tracking"}
+        assert "inference;dur=" in header and "tracking;dur=" in header
+    assert request_timings.get() is None
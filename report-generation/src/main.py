@@ -71,14 +71,15 @@ def report_generation(record_id: int):
     url = f"{base_url}/{record_id}"  # ex) .../api/person_count/1
  
     try:
-        response = requests.get(url, timeout=10)  # 10초 타임아웃
+        # 전체 기간은 NDJSON 스트리밍으로 받는다 (JSON 배열은 페이지 크기 제한이 있음)
+        response = requests.get(url, params={"format": "ndjson"}, timeout=10)  # 10초 타임아웃
         response.raise_for_status()  # HTTP 에러 시 예외 발생
     except requests.exceptions.RequestException as e:
         print("Error calling person_count API:", e)
         return None
    
-    # JSON 응답 파싱
-    data = response.json()
+    # NDJSON 응답 파싱 (한 줄에 레코드 하나)
+    data = [json.loads(line) for line in response.text.splitlines() if line.strip()]
     return data
 
 # HTML파일을 PDF로 변환. 이떄 import하는 과정땜에 실행하려면 설치해야하는 라이브러리 필요(설치만 했을 때 안되는 경우 환경변수 설정 필요)